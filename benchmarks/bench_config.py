@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# cold vs cached load times of large configurations:
+#   python benchmarks/bench_config.py [LISTS] [LOGINS_PER_LIST]
+
+import os
+import random
+import string
+import sys
+import tempfile
+import timeit
+
+import yaml
+
+from twitch_cli.config import Filter, Lists
+
+def login():
+    return "".join(random.choices(string.ascii_lowercase + string.digits, k=random.randint(4, 20)))
+
+def bench(what, f, n=5):
+    t = min(timeit.repeat(f, number=1, repeat=n))
+    print(f"{what:>32}: {t * 1000:10.3f}ms")
+
+def main():
+    lists = int(sys.argv[1]) if len(sys.argv) > 1 else 50
+    per_list = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+
+    with tempfile.TemporaryDirectory() as tmp:
+        lists_path = os.path.join(tmp, "lists.yaml")
+        with open(lists_path, "w") as f:
+            yaml.dump({ f"list{i}": [ login() for _ in range(per_list) ] for i in range(lists) }, f)
+
+        filter_path = os.path.join(tmp, "filter.yaml")
+        with open(filter_path, "w") as f:
+            yaml.dump({
+                k: {
+                    "user": [ login() for _ in range(per_list) ],
+                    "game": [ login() for _ in range(per_list) ],
+                    "title": [ "/" + login() for _ in range(per_list // 10) ],
+                } for k in [ "include", "exclude" ]
+            }, f)
+
+        print(f"lists.yaml: {lists} lists of {per_list} logins ({os.path.getsize(lists_path)} bytes)")
+
+        def parse(path, Loader):
+            with open(path) as f:
+                yaml.load(f, Loader=Loader)
+
+        for what, path, cls in [ ("lists", lists_path, Lists), ("filter", filter_path, Filter) ]:
+            bench(f"{what}: yaml.Loader", lambda: parse(path, yaml.Loader))
+            if hasattr(yaml, "CSafeLoader"):
+                bench(f"{what}: yaml.CSafeLoader", lambda: parse(path, yaml.CSafeLoader))
+
+            def cold():
+                os.unlink(cls(path=path).cache_path)
+            bench(f"{what}: {cls.__name__} (cold)", cold)
+
+            cls(path=path)
+            bench(f"{what}: {cls.__name__} (cached)", lambda: cls(path=path))
+
+if __name__ == "__main__":
+    main()
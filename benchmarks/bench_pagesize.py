@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+# requests made and videos decoded by videos_by_user, with pages of 10 and
+# with pages sized after each channel's publication rate, over channels
+# publishing at a range of rates, for several consecutive runs:
+#   python benchmarks/bench_pagesize.py [CHANNELS [RUNS]]
+
+import collections
+import os
+import random
+import sys
+import tempfile
+import urllib.parse
+from datetime import datetime, timedelta, UTC
+
+from twitch_cli.transport import MemoryTransport
+
+# videos a day
+RATES = [ 0, 0, 0.05, 0.2, 0.5, 1, 1, 2, 3, 6 ]
+PERIODS = { "day": timedelta(days=1), "week": timedelta(days=7), "month": timedelta(days=30) }
+SINCE = timedelta(days=3)
+
+def channels(n, now):
+    rng = random.Random(0)
+    cs = {}
+    for i in range(n):
+        r = rng.choice(RATES)
+        t, ts = now, []
+        while len(ts) < 500 and r > 0:
+            t -= timedelta(days=rng.expovariate(r))
+            ts.append(t)
+        cs[str(i)] = ts
+    return cs
+
+def video(u, i, t):
+    return {
+        "id": f"{u}-{i}", "title": f"video {i}", "url": f"https://www.twitch.tv/videos/{u}{i}",
+        "user_id": u, "user_login": f"u{u}", "user_name": f"U{u}", "duration": "1h2m3s",
+        "created_at": t.isoformat(), "published_at": t.isoformat(),
+    }
+
+def handler(cs, now, counts):
+    def h(preq):
+        qs = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(preq.url).query))
+        u, first, after = qs["user_id"], int(qs["first"]), int(qs.get("after", 0))
+        ts = cs[u]
+        if "period" in qs:
+            ts = [ t for t in ts if t >= now - PERIODS[qs["period"]] ]
+        page = ts[after:after + first]
+        counts["requests"] += 1
+        counts["videos"] += len(page)
+        j = { "data": [ video(u, after + i, t) for i, t in enumerate(page) ], "pagination": {} }
+        if after + first < len(ts):
+            j["pagination"]["cursor"] = str(after + first)
+        return j
+    return h
+
+def fixed(app, u, since):
+    # what videos_by_user used to do
+    for j in app.helix.paginate("/videos", params={ "user_id": u.id, "sort": "time" }, page_size=10):
+        if datetime.fromisoformat(j["published_at"]) < since:
+            break
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 300
+    runs = int(sys.argv[2]) if len(sys.argv) > 2 else 3
+
+    tmp = tempfile.TemporaryDirectory()
+    for k in [ "STATE_HOME", "CACHE_HOME", "CONFIG_HOME" ]:
+        os.environ[f"XDG_{k}"] = os.path.join(tmp.name, k.lower())
+    from twitch_cli.app import App
+    from twitch_cli.helix import Helix
+    from twitch_cli.model import User
+    from twitch_cli.oauth import Token
+
+    now = datetime.now(UTC)
+    cs = channels(n, now)
+    token = Token(value="token", expires=now + timedelta(hours=1), meta={ "user_id": "0", "login": "me" })
+    print(f"{n} channels, {sum(len([ t for t in ts if t >= now - SINCE ]) for ts in cs.values())} videos within {SINCE.days}d")
+    for what, f in [ ("pages of 10", fixed), ("learned page sizes", lambda app, u, since: app.videos_by_user(u, since=since)) ]:
+        counts = collections.Counter()
+        app = App(Helix(token=token, transport=MemoryTransport(handler(cs, now, counts))))
+        for r in range(runs):
+            counts.clear()
+            for u in cs:
+                f(app, User(id=u), now - SINCE)
+            print(f"{what:>20} run {r + 1}: {counts['requests']:6} requests {counts['videos']:7} videos")
+        app.flush()
+    tmp.cleanup()
+
+if __name__ == "__main__":
+    main()
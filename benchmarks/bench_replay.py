@@ -0,0 +1,47 @@
+#!/usr/bin/env python3
+# commands answering from a cassette recorded with --record, in isolated
+# state directories:
+#   python benchmarks/bench_replay.py CASSETTE [SCALE [COMMAND...]]
+#   (SCALE multiplies the recorded latencies: 0 measures only our side)
+# e.g. a cassette recorded by: twitch videos-file --record vf.gz FILE
+# is replayed by: python benchmarks/bench_replay.py vf.gz 0 videos-file FILE
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+EXE = shutil.which("twitch")
+assert EXE is not None
+
+COMMANDS = [
+    [ "live" ],
+    [ "videos", "--since", "30d" ],
+]
+
+def bench(what, f, n=3):
+    ts = []
+    for _ in range(n):
+        t0 = time.perf_counter()
+        f()
+        ts.append(time.perf_counter() - t0)
+    print(f"{what:>40}: {min(ts) * 1000:10.3f}ms")
+
+def run(cassette, scale, cmd):
+    with tempfile.TemporaryDirectory() as tmp:
+        env = os.environ | { f"XDG_{k}": os.path.join(tmp, k.lower()) for k in [ "STATE_HOME", "CACHE_HOME", "CONFIG_HOME" ] }
+        env["TWITCH_CLI_NO_SERVER"] = "1"
+        subprocess.run(
+            [ EXE, *cmd, "--replay", cassette, "--replay-latency", scale ],
+            env = env, check = True, stdout = subprocess.DEVNULL,
+        )
+
+def main():
+    cassette, scale = sys.argv[1], sys.argv[2] if len(sys.argv) > 2 else "1"
+    for cmd in [ sys.argv[3:] ] if len(sys.argv) > 3 else COMMANDS:
+        bench(" ".join(cmd), lambda: run(cassette, scale, cmd))
+
+if __name__ == "__main__":
+    main()
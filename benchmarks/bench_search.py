@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# index build, load and query times over many titles:
+#   python benchmarks/bench_search.py [TITLES]
+
+import json
+import os
+import random
+import sys
+import tempfile
+import timeit
+from datetime import datetime, timedelta, UTC
+
+from twitch_cli.search import Doc, Index
+
+WORDS = [
+    "speedrun", "any%", "chill", "stream", "marathon", "practice", "day", "ranked", "co-op", "blind",
+    "playthrough", "finale", "first", "time", "hardcore", "modded", "race", "weekly", "late", "night",
+    "!drops", "100%", "world", "record", "attempts", "viewer", "games", "charity", "event", "vod",
+]
+
+def bench(what, f, n=5):
+    t = min(timeit.repeat(f, number=1, repeat=n))
+    print(f"{what:>32}: {t * 1000:10.3f}ms")
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    t0 = datetime.now(UTC)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, "titles.ndjson")
+        snapshot = os.path.join(tmp, "titles.index.pickle")
+        with open(path, "w") as f:
+            for i in range(n):
+                d = Doc(
+                    kind = "video", id = str(i),
+                    title = " ".join(random.choices(WORDS, k=random.randint(3, 10))) + f" #{i}",
+                    user = f"user{i % 500}",
+                    at = t0 - timedelta(minutes=i),
+                    url = f"https://www.twitch.tv/videos/{i}",
+                )
+                f.write(json.dumps(d.to_dict()) + "\n")
+
+        print(f"{n} titles")
+
+        def cold():
+            if os.path.exists(snapshot):
+                os.unlink(snapshot)
+            Index(path, snapshot_path=snapshot)
+        bench("build (cold)", cold, n=1)
+
+        Index(path, snapshot_path=snapshot)
+        bench("load (snapshot)", lambda: Index(path, snapshot_path=snapshot))
+
+        ix = Index(path, snapshot_path=snapshot)
+        for q in [ "speedrun", "world record", "#4242", "charity marathon finale" ]:
+            bench(f"query: {q}", lambda: ix.search(q, limit=20), n=20)
+
+if __name__ == "__main__":
+    main()
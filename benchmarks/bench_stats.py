@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# columnar store vs. aggregating Video dataclasses:
+#   python benchmarks/bench_stats.py [VIDEOS]
+
+import os
+import random
+import statistics
+import sys
+import tempfile
+import timeit
+import tracemalloc
+from datetime import datetime, timedelta, UTC
+
+from twitch_cli.model import User, Video
+from twitch_cli.stats import Store
+
+def bench(what, f, n=3):
+    t = min(timeit.repeat(f, number=1, repeat=n))
+    print(f"{what:>32}: {t * 1000:10.3f}ms")
+
+def peak(f):
+    tracemalloc.start()
+    f()
+    _, p = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return p
+
+def main():
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    t0 = datetime.now(UTC)
+    users = [ User(id=str(i), login=f"user{i}", name=f"User{i}") for i in range(500) ]
+
+    def videos():
+        for i in range(n):
+            t = t0 - timedelta(minutes=i)
+            yield Video(id=str(i), title="", user=random.choice(users), url="",
+                        duration=timedelta(seconds=random.randint(60, 36000)), created_at=t, published_at=t)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        store = Store(os.path.join(tmp, "stats"))
+        store.add((v, t0) for v in videos())
+        vs = list(videos())
+        print(f"{n} videos")
+
+        def dataclasses():
+            gs = {}
+            for v in vs:
+                gs.setdefault(v.user.id, []).append(v.duration.total_seconds())
+            return { k: statistics.median(d) for k, d in gs.items() }
+
+        bench("median per channel (dataclasses)", dataclasses)
+        bench("median per channel (columns)", lambda: store.aggregate("videos", by=[ "channel" ]))
+        bench("append 1000 (columns)", lambda: store.add((v, t0) for v in vs[:1000]))
+
+        print(f"{'dataclasses peak':>32}: {peak(lambda: list(videos())) / 2**20:10.3f}MiB")
+        print(f"{'columns peak':>32}: {peak(lambda: store.aggregate('videos', by=[ 'channel' ])) / 2**20:10.3f}MiB")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+# rendering tables of videos with PrettyTable and with our renderer:
+#   python benchmarks/bench_table.py [ROWS...]
+
+import random
+import string
+import sys
+import timeit
+
+from prettytable import PrettyTable
+
+from twitch_cli import util
+from twitch_cli.table import Table, printable
+
+WORDS = [ "speedrun", "any%", "chill", "stream", "marathon", "日本語", "Pokémon", "!drops", "🎉", "world", "record" ]
+
+def bench(what, f, n=3):
+    t = min(timeit.repeat(f, number=1, repeat=n))
+    print(f"{what:>40}: {t * 1000:10.3f}ms")
+
+def rows(n):
+    rng = random.Random(0)
+    for i in range(n):
+        yield (
+            rng.randint(0, 86400 * 30),
+            f"User{i % 500}",
+            " ".join(rng.choices(WORDS, k=rng.randint(3, 12))) + f" #{i}",
+            rng.randint(600, 36000),
+            f"https://twitch.tv/videos/{i}",
+        )
+
+def old_clean(s):
+    return "".join(filter(lambda x: x in string.printable, s.strip()))
+
+def new_clean(s):
+    return s.strip().translate(printable)
+
+def old(rs):
+    t = PrettyTable()
+    t.field_names = [ "When", "User", "Title", "Duration", "URL" ]
+    t.align = "l"
+    for age, user, title, duration, url in rs:
+        t.add_row([ util._render_duration.__wrapped__(age, False), user, old_clean(title), util._render_duration.__wrapped__(duration, False), url ])
+    return t.get_string()
+
+def new(rs):
+    t = Table([ "When", "User", "Title", "Duration", "URL" ])
+    for age, user, title, duration, url in rs:
+        t.add_row([ util.render_duration(age), user, new_clean(title), util.render_duration(duration), url ])
+    return t.get_string()
+
+def main():
+    for n in [ int(a) for a in sys.argv[1:] ] or [ 10000, 100000 ]:
+        rs = list(rows(n))
+        assert old(rs[:1000]) == new(rs[:1000])
+        print(f"{n} rows")
+        bench("PrettyTable, filter clean, durations", lambda: old(rs), n=1 if n > 10000 else 3)
+        bench("Table, translate clean, cached durations", lambda: new(rs))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+# runs the refresh cycles of a runner against a fake Helix, in throwaway
+# state directories, sampling the RSS and the traced allocations, then
+# reports what grew after the warm up and fails when it grew by more than
+# the threshold:
+#   python benchmarks/soak.py [--cycles N] [--channels N] [--max-growth MIB]
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import textwrap
+import time
+import tracemalloc
+import urllib.parse
+from datetime import datetime, timedelta, UTC
+
+from twitch_cli.transport import MemoryTransport
+
+WORDS = [ "speedrun", "any%", "chill", "stream", "marathon", "日本語", "Pokémon", "!drops", "🎉", "world", "record" ]
+
+# a followed population where streams come and go, and titles change
+class FakeHelix:
+    def __init__(self, channels: int, seed=0):
+        self.rng = random.Random(seed)
+        self.logins = [ f"u{i}" for i in range(channels) ]
+        self.cycle = 0
+        self.live: dict[str, dict] = {}
+        self.videos: dict[str, list[dict]] = { l: [] for l in self.logins }
+
+    def tick(self):
+        self.cycle += 1
+        now = datetime.now(UTC)
+        for l in self.rng.sample(self.logins, k=max(1, len(self.logins) // 20)):
+            if l in self.live:
+                del self.live[l]
+            else:
+                self.live[l] = self.stream(l, now)
+        for s in self.live.values():
+            if self.rng.random() < 0.1:
+                s["title"] = self.title()
+        # a new video every so often, while the old ones drop out of the
+        # first page
+        for l in self.rng.sample(self.logins, k=max(1, len(self.logins) // 300)):
+            self.videos[l] = [ self.video(l, self.cycle, now), *self.videos[l][:4] ]
+
+    def title(self):
+        return " ".join(self.rng.choices(WORDS, k=self.rng.randint(3, 12))) + f" #{self.cycle}"
+
+    def user(self, l):
+        return { "user_id": l[1:], "user_login": l, "user_name": l.upper() }
+
+    def stream(self, l, now):
+        return { "id": f"s{l}-{self.cycle}", "title": self.title(), "started_at": now.isoformat(), "game_id": "1", "game_name": "Game", **self.user(l) }
+
+    def video(self, l, i, t):
+        return { "id": f"v{l}-{i}", "title": self.title(), "url": f"https://www.twitch.tv/videos/{l}{i}", "duration": "1h2m3s", "created_at": t.isoformat(), "published_at": t.isoformat(), **self.user(l) }
+
+    def page(self, xs, qs):
+        first, after = int(qs.get("first", [ 20 ])[0]), int(qs.get("after", [ 0 ])[0])
+        j = { "data": xs[after:after + first], "pagination": {} }
+        if after + first < len(xs):
+            j["pagination"]["cursor"] = str(after + first)
+        return j
+
+    def __call__(self, preq):
+        u = urllib.parse.urlsplit(preq.url)
+        qs = urllib.parse.parse_qs(u.query)
+        match u.path.removeprefix("/helix"):
+            case "/channels/followed":
+                return self.page([ { "broadcaster_id": l[1:], "broadcaster_login": l, "broadcaster_name": l.upper() } for l in self.logins ], qs)
+            case "/streams/followed":
+                return self.page(list(self.live.values()), qs)
+            case "/streams":
+                return { "data": [ self.live[l] for l in qs.get("user_login", []) if l in self.live ], "pagination": {} }
+            case "/users":
+                return { "data": [ { "id": l[1:], "login": l, "display_name": l.upper() } for l in qs.get("login", []) ], "pagination": {} }
+            case "/videos":
+                return self.page(self.videos.get("u" + qs["user_id"][0], []), qs)
+            case p:
+                raise AssertionError(p)
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cycles", type=int, default=2000)
+    parser.add_argument("--channels", type=int, default=300)
+    parser.add_argument("--videos-every", metavar="N", type=int, default=15, help="refresh the videos every N cycles")
+    parser.add_argument("--samples", type=int, default=10)
+    parser.add_argument("--warm-up", metavar="FRACTION", type=float, default=0.25, help="the share of the cycles to run before the baseline snapshot")
+    parser.add_argument("--max-growth", metavar="MIB", type=float, default=2, help="fail if the traced memory grew by more than MIB after the warm up")
+    args = parser.parse_args()
+
+    tmp = tempfile.TemporaryDirectory()
+    for k in [ "STATE_HOME", "CACHE_HOME", "CONFIG_HOME", "RUNTIME_DIR" ]:
+        os.environ[f"XDG_{k}"] = os.path.join(tmp.name, k.lower())
+    os.makedirs(os.environ["XDG_CONFIG_HOME"])
+    profiles = os.path.join(tmp.name, "profiles.yaml")
+    lists = os.path.join(tmp.name, "lists.yaml")
+    with open(lists, "w") as f:
+        f.write("some: [ u1, u2, u3, u500, u501 ]\n")
+    with open(profiles, "w") as f:
+        f.write(textwrap.dedent(f"""
+            following:
+              output: {tmp.name}/following
+            some:
+              output: {tmp.name}/some
+              lists: {lists}
+              list: [ some ]
+        """))
+
+    from twitch_cli import memstats
+    from twitch_cli.app import App
+    from twitch_cli.helix import Helix
+    from twitch_cli.oauth import Token
+    from twitch_cli.runner import Runner, load_profiles
+
+    fake = FakeHelix(args.channels)
+    token = Token(value="token", expires=datetime.now(UTC) + timedelta(days=1), meta={ "user_id": "0", "login": "me" })
+    transport = MemoryTransport(fake)
+    runner = Runner(App(Helix(token=token, transport=transport)), load_profiles(profiles))
+
+    ms = memstats.MemStats()
+    # what the fake Helix holds isn't ours
+    ours = lambda s: s.filter_traces([ tracemalloc.Filter(False, __file__) ])
+    warm_up = int(args.cycles * args.warm_up)
+    every = max(1, args.cycles // args.samples)
+    baseline = None
+    t0 = time.monotonic()
+    for i in range(1, args.cycles + 1):
+        fake.tick()
+        runner.live()
+        if i % args.videos_every == 0:
+            runner.videos()
+        # the transport keeps the requests for the tests to look at
+        transport.requests.clear()
+
+        if i == warm_up:
+            baseline = ours(ms.snapshot())
+        if i % every == 0:
+            print(f"cycle {i:6}: rss {memstats.mib(memstats.rss()):>9} traced {memstats.mib(tracemalloc.get_traced_memory()[0]):>9} ({(time.monotonic() - t0) / i * 1000:.1f}ms/cycle)")
+
+    snapshot = ours(ms.snapshot())
+    growth = sum(d.size_diff for d in ms.growth(snapshot, baseline))
+    print(ms.report(snapshot=snapshot, baseline=baseline))
+    tmp.cleanup()
+    if growth > args.max_growth * 1024 * 1024:
+        print(f"traced memory grew by {memstats.mib(growth)} after the warm up (more than {args.max_growth}MiB)")
+        sys.exit(1)
+    print(f"traced memory grew by {memstats.mib(growth)} after the warm up")
+
+if __name__ == "__main__":
+    main()
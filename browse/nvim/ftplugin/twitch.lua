@@ -16,25 +16,64 @@ vim.wo.spell = false
 vim.o.laststatus = 0
 vim.o.cmdheight = 0
 
-if vim.bo.readonly then
+local function checktime()
+    vim.schedule(function()
+        vim.api.nvim_command("checktime")
+    end)
+end
+
+local function poll()
     local period = 60*1000
-    vim.uv.new_timer():start(period, period, function()
-        vim.schedule(function()
-            vim.api.nvim_command("checktime")
+    vim.uv.new_timer():start(period, period, checktime)
+end
+
+-- keep in sync with twitch_cli.client.socket_path
+local function socket_path()
+    local p = os.getenv("TWITCH_CLI_SOCKET")
+    if p then
+        return p
+    end
+    local d = os.getenv("XDG_RUNTIME_DIR")
+    if d then
+        return d .. "/twitch-cli.sock"
+    end
+    return (os.getenv("XDG_STATE_HOME") or vim.fn.expand("~/.local/state")) .. "/twitch-cli/socket"
+end
+
+-- reload when a running `twitch serve` says so, otherwise fall back to polling
+local function subscribe()
+    local pipe = vim.uv.new_pipe(false)
+    pipe:connect(socket_path(), function(err)
+        if err then
+            pipe:close()
+            poll()
+            return
+        end
+
+        pipe:write(vim.json.encode({ method = "subscribe" }) .. "\n")
+        pipe:read_start(function(err, chunk)
+            if err or not chunk then
+                pipe:close()
+                poll()
+                return
+            end
+            checktime()
         end)
     end)
+end
+
+if vim.bo.readonly then
+    subscribe()
 else
     vim.api.nvim_create_autocmd({ "BufWritePost", "FileWritePost" }, {
         buffer = 0,
         callback = function()
             local path = vim.api.nvim_buf_get_name(0)
-            vim.system({"twitch", "videos-file", "--in-place", path }, {
+            vim.system({"twitch", "videos-file", "--in-place", "--stale-while-revalidate", "1d", path }, {
                 stdio = { nil, nil, 2 },
                 detached = true,
             }, function()
-                vim.schedule(function()
-                    vim.api.nvim_command("checktime")
-                end)
+                checktime()
             end)
         end,
     })
@@ -1,5 +1,7 @@
 #!/usr/bin/env python3
 
+import atexit
+import math
 import os
 import shutil
 import subprocess
@@ -33,15 +35,24 @@ def run_and_copy_stdout(cmdline, target, env=None):
         with open(out, "x") as f:
             subprocess.check_call(cmdline, env=env, stdout=f)
         subprocess.check_call(["install", "--mode=0444", out, target])
+    subprocess.check_call([EXE, "notify", target], env=env)
+
+# leave some slack before the task's timeout kills the worker, so that the
+# command has time to render what it managed to fetch
+def deadline(period: timedelta) -> str:
+    return f"{math.floor(period.total_seconds() * 0.8)}s"
+
+LIVE_PERIOD = timedelta(minutes=1)
+VIDEOS_PERIOD = timedelta(minutes=15)
 
 def live():
     target = os.path.join(STATE_DIR, "live.twitch")
-    cmdline = [EXE, "live"]
+    cmdline = [EXE, "live", "--deadline", deadline(LIVE_PERIOD)]
     run_and_copy_stdout(cmdline, target, env=env())
 
 def videos():
     target = os.path.join(STATE_DIR, "videos.twitch")
-    cmdline = [EXE, "videos"]
+    cmdline = [EXE, "videos", "--deadline", deadline(VIDEOS_PERIOD)]
     run_and_copy_stdout(cmdline, target, env=env())
 
 def _run_with_timeout_harness(q, f):
@@ -111,8 +122,13 @@ def poor_mans_scheduler(*tasks: Task, on_exc: Callable[[Exception]] | None = Non
 
 def main():
     os.makedirs(STATE_DIR, exist_ok=True)
-    a = Task("live", timedelta(minutes=5), live)
-    b = Task("videos", timedelta(minutes=15), videos)
+
+    # the tasks (and interactive use) transparently ask the server
+    server = subprocess.Popen([EXE, "serve", "--period", "1m"], env=env())
+    atexit.register(server.terminate)
+
+    a = Task("live", LIVE_PERIOD, live)
+    b = Task("videos", VIDEOS_PERIOD, videos)
     poor_mans_scheduler(a, b, on_exc=traceback.print_exception)
 
 if __name__ == "__main__":
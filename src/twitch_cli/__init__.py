@@ -1,17 +1,21 @@
 import os
 
-import importlib.metadata
-import importlib.resources
-import importlib.resources.abc
+# importlib.metadata and importlib.resources are slow to import, which is
+# noticeable on every shell completion: only pay for them when needed
 
 package_name = __name__
-package_version = importlib.metadata.version(package_name)
 
-def package_data(*f) -> importlib.resources.abc.Traversable:
+def __getattr__(name):
+    if name == "package_version":
+        import importlib.metadata
+        return importlib.metadata.version(package_name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+def package_data(*f):
+    import importlib.resources
     return importlib.resources.files(package_name).joinpath(*f)
 
-whoami = importlib.metadata.metadata(__name__).get("name")
-assert whoami is not None
+whoami = "twitch-cli"
 env_prefix = whoami.upper().replace("-", "_").replace(".", "_") + "_"
 def env(var, default=None):
     return os.environ.get(env_prefix + var, default)
@@ -1,22 +1,39 @@
+import atexit
 import logging
+import math
 import os
 import re
-import string
 import sys
+import threading
+from dataclasses import dataclass
 from datetime import UTC, datetime, timedelta
-from typing import Generator, Iterable
+from typing import Callable, Generator, Iterable
 
-from prettytable import PrettyTable
+import requests
 
-from . import util
+from . import pagesize, util
+from .client import DEFAULT_TIMEOUT, Client, ServerError, notify
+from .completion import cached_following, remember_following
+from .cassette import ReplayTransport
 from .config import Filter, Lists
-from .helix import Helix
+from .helix import Deadline, DeadlineExceeded, Helix, RetryPolicy
+from .history import History, Scheduler
+from .lastknown import LastKnown, last_known, revalidating, staleness
+from .loader import Loader
+from .priority import Priority
+from .search import Index, Indexer
+from .seen import Seen
+from .shared import SharedState
+from .stats import Recorder, Store
+from .table import Table, printable
+from .tracing import span, traced
+from .watchlater import Gone, Revalidator
 from .model import *
 
 logger = logging.getLogger(__name__)
 
 def do_oauth(args):
-    helix = Helix().authenticate(
+    helix = Helix(shared=SharedState()).authenticate(
         fetch_new_tokens = not args.dont_fetch_new_token,
         force = args.force_fetch_new_token,
     )
@@ -25,8 +42,26 @@ def do_oauth(args):
     print(helix.token.value)
 
 class App:
-    def __init__(self):
-        self.helix = Helix().authenticate()
+    def __init__(self, helix: Helix | None = None):
+        self.helix = (helix or Helix()).authenticate()
+        atexit.register(self.helix.log_stats)
+        # users whose data could not be fetched before the deadline
+        self.missing: set[User] = set()
+
+        # called with every decoded stream and video
+        self.sinks: list[Callable[[Stream | Video], None]] = []
+        self.indexer = Indexer()
+        self.recorder = Recorder()
+        self.known_videos = LastKnown("videos")
+        self.sinks += [ self.indexer, self.recorder, self.known_videos ]
+        # how many videos a day each channel publishes
+        self.video_rates = LastKnown("video-rates", max_age=timedelta(days=90))
+        # the server's handler threads flush after every request
+        self.flush_lock = threading.Lock()
+        atexit.register(self.flush)
+
+        self.user_loader = Loader(self._users_batch, name="users")
+        self.video_loader = Loader(self._videos_batch, name="videos")
         meta = self.helix.token.meta
         assert meta is not None
         self.me = User(
@@ -34,106 +69,251 @@ class App:
             login = meta["login"],
         )
 
+    def flush(self):
+        with self.flush_lock:
+            self.indexer.flush()
+            self.recorder.flush()
+            self.known_videos.save()
+            self.video_rates.save()
+
+    @classmethod
+    def from_args(cls, args, priority=Priority.INTERACTIVE):
+        if revalidating():
+            priority = Priority.BACKGROUND
+        token, transport, shared = None, args.transport, SharedState()
+        if args.replay:
+            # a replay must not spend (or be throttled by) the real budget
+            transport = ReplayTransport(args.replay, scale=args.replay_latency)
+            token, shared = transport.token(), None
+        return cls(Helix(
+            token = token,
+            deadline = Deadline(args.deadline) if getattr(args, "deadline", None) else None,
+            retry = RetryPolicy(attempts=1 + args.retries),
+            hedge = args.hedge,
+            shared = shared,
+            transport = transport,
+            pool_size = args.pool_size,
+            record = args.record,
+            priority = priority,
+        ))
+
+    def decoded[A: (Stream, Video)](self, x: A) -> A:
+        for f in self.sinks:
+            f(x)
+        return x
+
     # which users is user following
+    @traced("app")
     def following(self, user: User) -> set[User]:
         user = user or self.me
 
         us = set()
         params = { "user_id": user.id }
-        for j in self.helix.paginate("/channels/followed", params=params, page_size=100):
-            us.add(User(
-                id = j["broadcaster_id"],
-                name = j["broadcaster_name"],
-                login = j["broadcaster_login"],
-            ))
+        try:
+            for j in self.helix.paginate("/channels/followed", params=params, page_size=100):
+                us.add(User(
+                    id = j["broadcaster_id"],
+                    name = j["broadcaster_name"],
+                    login = j["broadcaster_login"],
+                ))
+        except DeadlineExceeded:
+            logger.warning("deadline exceeded: incomplete list of followed channels (%d)", len(us))
+            # the channels last known to be followed that weren't reached
+            if user == self.me:
+                fetched = { u.login for u in us }
+                self.missing.update(User(id=l, login=l) for l in cached_following() if l not in fetched)
+            return us
+
+        if user == self.me:
+            remember_following(u.login for u in us if u.login)
 
         return us
 
+    @traced("app")
     def streams(self, users: Iterable[User]) -> set[Stream]:
-        us = [ ("user_id", u.id) for u in users ]
+        users = list(users)
         ss = set()
         PS = 100
-        while len(us) > 0:
-            for j in self.helix.paginate("/streams", params=us[:PS], page_size=PS):
-                ss.add(Stream(
-                    id = j["id"],
-                    title = j["title"],
-                    user = User(
-                        id = j["user_id"],
-                        login = j["user_login"],
-                        name = j["user_name"],
-                    ),
-                    started_at = datetime.fromisoformat(j["started_at"]),
-                    game = Game(
-                        id = j["game_id"],
-                        name = j["game_name"],
-                    ),
-                ))
-            us = us[PS:]
+        for i in range(0, len(users), PS):
+            chunk = users[i:i+PS]
+            try:
+                for j in self.helix.paginate("/streams", params=[ ("user_id", u.id) for u in chunk ], page_size=PS):
+                    ss.add(self.decoded(Stream.from_twitch_json(j)))
+            except DeadlineExceeded:
+                live = { s.user for s in ss }
+                self.missing.update(u for u in users[i:] if u not in live)
+                break
         return ss
 
-    def videos_by_vid(self, *vid: str) -> dict[str, Video]:
-        logger.debug("fetching videos by id: %s", vid)
+    @traced("app")
+    def streams_by_login(self, logins: Iterable[str], game_ids: Iterable[str] = []) -> set[Stream]:
+        logins = sorted(logins)
+        gs = [ ("game_id", g) for g in game_ids ]
+        ss = set()
+        PS = 100
+        for i in range(0, len(logins), PS):
+            chunk = logins[i:i+PS]
+            try:
+                for j in self.helix.paginate("/streams", params=[ ("user_login", l) for l in chunk ] + gs, page_size=PS):
+                    ss.add(self.decoded(Stream.from_twitch_json(j)))
+            except DeadlineExceeded:
+                live = { s.user.login for s in ss }
+                self.missing.update(User(id=l, login=l) for l in logins[i:] if l not in live)
+                break
+        return ss
 
-        if len(vid) == 0:
-            return {}
+    # live streams of channels user is following
+    @traced("app")
+    def streams_followed(self, user: User | None = None) -> set[Stream]:
+        user = user or self.me
+        ss = set()
+        try:
+            for j in self.helix.paginate("/streams/followed", params={ "user_id": user.id }, page_size=100):
+                ss.add(self.decoded(Stream.from_twitch_json(j)))
+        except DeadlineExceeded:
+            logger.warning("deadline exceeded: incomplete list of followed streams (%d)", len(ss))
+        return ss
+
+    # live streams in any of the games, or None if there are more than limit
+    @traced("app")
+    def streams_by_game(self, game_ids: Iterable[str], limit: int | None = None) -> set[Stream] | None:
+        ss = set()
+        for j in self.helix.paginate("/streams", params=[ ("game_id", g) for g in game_ids ], page_size=100):
+            ss.add(self.decoded(Stream.from_twitch_json(j)))
+            if limit is not None and len(ss) > limit:
+                return None
+        return ss
 
-        if len(vid) > 100:
-            raise NotImplementedError()
+    @traced("app")
+    def games(self, names: Iterable[str]) -> set[Game]:
+        ps = [ ("name", n) for n in names ]
+        gs = set()
+        PS = 100
+        for i in range(0, len(ps), PS):
+            for j in self.helix.req("GET", "/games", params=ps[i:i+PS])["data"]:
+                gs.add(Game(id=j["id"], name=j["name"]))
+        return gs
+
+    def _videos_batch(self, vids: list[str]) -> dict[str, Video]:
+        vs = {}
+        try:
+            for j in self.helix.paginate("/videos", params=[ ("id", i) for i in vids ], page_size=100):
+                v = self.decoded(Video.from_twitch_json(j))
+                vs[v.id] = v
+        except requests.exceptions.HTTPError as e:
+            # Helix answers 404 when none of the videos exist (anymore)
+            if e.response is None or e.response.status_code != 404:
+                raise
+            logger.debug("none of the videos found: %s", vids)
+        return vs
+
+    @traced("app")
+    def videos_by_vid(self, *vid: str) -> dict[str, Video]:
+        logger.debug("fetching videos by id: %s", vid)
 
-        params = [ ("id", i) for i in set(vid) ]
         vs = util.LastUpdatedOrderedDict()
-        for j in self.helix.paginate("/videos", params=params, page_size=100):
-            v = Video.from_twitch_json(j)
-            vs[v.id] = v
+        for i, f in self.video_loader.load_many(vid).items():
+            if f.exception() is not None:
+                if not isinstance(f.exception(), DeadlineExceeded):
+                    raise f.exception()
+                continue
+            v = f.result()
+            if v is not None:
+                vs[i] = v
+
+        if len(vs) < len(set(vid)) and self.helix.deadline is not None and self.helix.deadline.expired:
+            logger.warning("deadline exceeded: fetched %d/%d videos", len(vs), len(set(vid)))
 
         return vs
 
+    # pages are sized after how many videos the channel usually publishes
+    # within the window, so that most channels take a single request
+    @traced("app")
     def videos_by_user(self, user: User, since: datetime | None = None) -> set[Video]:
         logger.debug("listing videos by user (%s) since: %s", user, since)
         params = {"user_id": user.id, "sort": "time"}
+        page_size = pagesize.DEFAULT_PAGE_SIZE
+        if since is not None:
+            window = datetime.now(UTC) - since
+            p = pagesize.period(window)
+            if p is not None:
+                params["period"] = p
+            known = self.video_rates.get(user.id)
+            page_size = pagesize.page_size(known[0] if known else None, window)
+
         vs = set()
-        for j in self.helix.paginate("/videos", params=params, page_size=10):
-            published_at = datetime.fromisoformat(j["published_at"])
-            if since and published_at < since:
-                break
-            vs.add(Video.from_twitch_json(j))
+        try:
+            for j in self.helix.paginate("/videos", params=params, page_size=page_size):
+                published_at = datetime.fromisoformat(j["published_at"])
+                if since and published_at < since:
+                    break
+                vs.add(self.decoded(Video.from_twitch_json(j)))
+        except DeadlineExceeded:
+            self.missing.add(user)
+            return vs
+
+        if since is not None:
+            self.video_rates.put(user.id, pagesize.rate(known[0] if known else None, len(vs), window))
         return vs
 
+    def _users_batch(self, ks: list[tuple[str, str]]) -> dict[tuple[str, str], User]:
+        us = {}
+        for j in self.helix.paginate("/users", params=ks, page_size=len(ks)):
+            u = User(
+                id = j["id"],
+                login = j["login"],
+                name = j["display_name"],
+            )
+            us[("id", u.id)] = u
+            us[("login", j["login"].lower())] = u
+        return us
+
+    @traced("app")
     def users(self, logins: Iterable[str] = [], ids: Iterable[str] = []) -> set[User]:
-        us = set()
-        ps = [ ("login", l) for l in logins ] + [ ("id", i) for i in ids ]
-        PS = 100
-        while len(ps) > 0:
-            for j in self.helix.paginate("/users", params=ps[:PS], page_size=PS):
-                us.add(User(
-                    id = j["id"],
-                    login = j["login"],
-                    name = j["display_name"],
-                ))
-            ps = ps[PS:]
+        ks = [ ("login", l.lower()) for l in logins ] + [ ("id", i) for i in ids ]
+        us, unresolved = set(), []
+        for k, f in self.user_loader.load_many(ks).items():
+            if f.exception() is not None:
+                if not isinstance(f.exception(), DeadlineExceeded):
+                    raise f.exception()
+                unresolved.append(k)
+            elif f.result() is not None:
+                us.add(f.result())
+        if unresolved:
+            logger.warning("deadline exceeded: unable to resolve: %s", [ v for _, v in unresolved ])
+            self.missing.update(User(id=v, login=v if k == "login" else None) for k, v in unresolved)
         return us
 
 def clean(s: str) -> str:
     s = s.strip()
     if s.startswith("http"):
         return s.replace(f"www.{CNAME}", CNAME)
-    return "".join(filter(lambda x: x in string.printable, s))
+    return s.translate(printable)
+
+# ask a running server, or return None to fall back to asking Helix directly
+def call_server(args, method: str, **params):
+    if args.no_server or args.replay:
+        return None
+
+    deadline = getattr(args, "deadline", None)
+    c = Client.connect(timeout=deadline.total_seconds() if deadline else DEFAULT_TIMEOUT)
+    if c is None:
+        return None
+
+    try:
+        with c:
+            return c.call(method, **params)
+    except (ServerError, OSError) as e:
+        logger.warning("server request failed; falling back to Helix: %s", e)
+        return None
 
 def do_following(args):
-    app = App()
+    app = App.from_args(args)
     for u in app.following(app.me):
         print(u)
 
 def resolve_channels(app: App, args, f=None) -> Iterable[User]:
-    us = set()
-    if args.list:
-        ls = Lists(path=args.lists)
-        for l in args.list:
-            us |= ls[l]
-    for c in args.channel:
-        us.add(c)
-
+    us = explicit_channels(args)
     if us:
         us = app.users(logins=us)
     else:
@@ -145,27 +325,172 @@ def resolve_channels(app: App, args, f=None) -> Iterable[User]:
 
     return us
 
+def explicit_channels(args) -> set[str]:
+    us = set()
+    if args.list:
+        ls = Lists(path=args.lists)
+        for l in args.list:
+            us |= ls[l]
+    for c in args.channel:
+        us.add(c)
+    return us
+
+@dataclass
+class Plan:
+    shape: str
+    cost: int
+    # returns the live streams and the users whose state they reflect
+    fetch: Callable[[], tuple[set[Stream], Iterable[User]]]
+
+    def __str__(self):
+        return f"{self.shape} (~{self.cost} requests)"
+
+# the Helix query shapes that can answer live: only the adaptive one when
+# asked to poll adaptively
+def live_plans(app: App, args, f: Filter, history: History, now: datetime) -> list[Plan]:
+    PS = 100
+    logins = { l.lower() for l in explicit_channels(args) }
+    # only to estimate costs: it may be stale, or missing
+    following = cached_following()
+    user = (lambda u: True) if args.no_filter else f.user
+    ps = []
+
+    if logins:
+        def by_login():
+            ss = app.streams_by_login(logins)
+            return ss, [ s.user for s in ss ] + [ u for u in history.open_users() if u.login in logins ]
+        ps.append(Plan("streams?user_login", math.ceil(len(logins) / PS), by_login))
+    else:
+        def followed():
+            ss = set(filter(lambda s: user(s.user), app.streams_followed()))
+            return ss, [ s.user for s in ss ] + history.open_users()
+        ps.append(Plan("streams/followed", max(1, math.ceil(len(history.open_users()) / PS)), followed))
+
+        if args.adaptive:
+            def due():
+                us = list(filter(user, app.following(app.me)))
+                ds = Scheduler(history, max_period=args.max_period).due(us, now)
+                logger.info("adaptive polling: %d/%d channels due", len(ds), len(us))
+                return app.streams(ds), ds
+            return [ Plan("channels/followed+streams?user_id", math.ceil((len(following) or PS) / PS) + 1, due) ]
+
+    if args.game:
+        fallback = min(ps, key=lambda p: p.cost)
+        def by_game():
+            gs = app.games(args.game)
+            logger.debug("resolved games: %s", gs)
+            ss = app.streams_by_game([ g.id for g in gs ], limit=fallback.cost * PS) if gs else set()
+            if ss is None:
+                logger.info("too many streams in games %s: falling back to: %s", args.game, fallback)
+                return fallback.fetch()
+            if logins:
+                ss = { s for s in ss if s.user.login in logins }
+            elif ss:
+                followed = { u.login for u in app.following(app.me) }
+                ss = { s for s in ss if s.user.login in followed and user(s.user) }
+            return ss, [ s.user for s in ss ]
+        # the followed channels are paged through to intersect with
+        cost = 1 + math.ceil(len(args.game) / PS)
+        if not logins:
+            cost += math.ceil((len(following) or PS) / PS)
+        ps.append(Plan("streams?game_id", cost, by_game))
+
+    return ps
+
+# pick the query shape expected to need the fewest requests
+def plan_live(app: App, args, f: Filter, history: History, now: datetime) -> Plan:
+    ps = live_plans(app, args, f, history, now)
+    for p in ps:
+        logger.debug("candidate plan: %s", p)
+    return min(ps, key=lambda p: p.cost)
+
 def do_live(args):
-    app = App()
+    if args.views:
+        return do_live_views(args)
+
     f = Filter(args.filter)
+    now = datetime.now(UTC)
 
-    us = resolve_channels(app, args, f=f)
-    ss = app.streams(us)
+    logins = explicit_channels(args)
+    def fetch() -> tuple[set[Stream], set[User]]:
+        r = call_server(args, "live", channels=sorted(logins) or None)
+        if r is not None:
+            ss = { Stream.from_twitch_json(j) for j in r["streams"] }
+            if not logins and not args.no_filter:
+                ss = { s for s in ss if f.user(s.user) }
+            return ss, set()
+
+        app = App.from_args(args)
+        history = History()
+
+        plan = plan_live(app, args, f, history, now)
+        logger.info("plan: %s", plan)
+        n = app.helix.stats["requests"]
+        ss, polled = plan.fetch()
+        logger.info("plan %s: %d requests", plan.shape, app.helix.stats["requests"] - n)
+        history.observe(polled, ss, now)
+        return ss, app.missing
+
+    known = LastKnown("live")
+    key = ",".join(sorted(l.lower() for l in logins)) or "following"
+    def remember(x):
+        known.put(key, x)
+        known.save()
+    r, at = last_known(args, known.get(key), fetch, remember)
+    if revalidating():
+        return
+    ss, missing = r or (set(), set())
+
+    if args.game:
+        gs = { g.lower() for g in args.game }
+        ss = filter(lambda s: (s.game.name or "").lower() in gs, ss)
 
     if not args.no_filter:
         ss = filter(f.stream, ss)
 
     ss = sorted(ss, key=lambda s: s.started_at, reverse=True)
 
-    now = datetime.now(UTC)
-
-    table = PrettyTable()
-    table.field_names = ["Channel", "Title", "Game", "Since", "URL"]
-    table.align = "l"
+    with span("live", "render"):
+        render_table_of_streams(ss, missing, width=args.title_width, now=now).write(sys.stdout)
+
+    note = staleness(args, at, now)
+    if note:
+        print(note)
+
+# the live streams of the followed channels, of the channels of each list,
+# and of the channels given, from one sweep over all of them
+def do_live_views(args):
+    from .runner import Profile, Runner
+
+    f = None if args.no_filter else Filter(args.filter)
+    ls = Lists(path=args.lists)
+    ps = [ Profile(name="following", output=args.views, lists=ls, filter=f, title_width=args.title_width) ]
+    for l in args.list or ls.keys():
+        ps.append(Profile(
+            name = l,
+            output = args.views,
+            lists = ls,
+            filter = f,
+            selected = [ l ],
+            title_width = args.title_width,
+            suffix = "-" + l.replace(os.sep, "_"),
+        ))
+    if args.channel:
+        ps.append(Profile(name="channels", output=args.views, lists=ls, filter=f, channels=args.channel, title_width=args.title_width, suffix="-channels"))
+    Runner(App.from_args(args), ps).live()
+
+MISSING = "(missing: deadline exceeded)"
+EXPIRED = "(expired)"
+MIN_DURATION = timedelta(minutes=10)
+
+def render_table_of_streams(ss: Iterable[Stream], missing: Iterable[User] = (), width=None, now=None) -> Table:
+    now = now or datetime.now(UTC)
+
+    table = Table(["Channel", "Title", "Game", "Since", "URL"])
     for s in ss:
         title = clean(s.title)
-        if args.title_width:
-            title = title[:args.title_width]
+        if width:
+            title = title[:width]
 
         table.add_row([
             str(s.user),
@@ -174,20 +499,38 @@ def do_live(args):
             util.render_duration(now - s.started_at),
             clean(s.url),
         ])
-    print(table.get_string())
+    for u in sorted(missing, key=str):
+        table.add_row([ str(u), MISSING, "", "", f"{HUMAN_URL}/{u.login}" if u.login else "" ])
+    return table
 
-def render_table_of_videos(vs: Iterable[Video | str], width=None, now=None) -> PrettyTable:
+def render_table_of_videos(vs: Iterable[Video | Gone | User | str], width=None, now=None) -> Table:
     now = now or datetime.now().astimezone()
 
-    table = PrettyTable()
-    table.field_names = ["When", "User", "Title", "Duration", "URL"]
-    table.align = "l"
+    table = Table(["When", "User", "Title", "Duration", "URL"])
     for v in vs:
         if isinstance(v, str):
             table.add_row([ "" ] * (len(table.field_names) - 1) + [v])
             continue
 
-        if v.duration < timedelta(minutes=10):
+        if isinstance(v, User):
+            table.add_row([ "", str(v), MISSING, "", f"{HUMAN_URL}/{v.login}/videos" if v.login else "" ])
+            continue
+
+        if isinstance(v, Gone):
+            w = v.video
+            title = EXPIRED + (" " + clean(w.title) if w else "")
+            if width:
+                title = title[:width]
+            table.add_row([
+                util.render_duration(now - w.published_at) if w else "",
+                w.user.name if w else "",
+                title,
+                util.render_duration(w.duration) if w else "",
+                clean(w.url) if w else f"{HUMAN_URL}/videos/{v.id}",
+            ])
+            continue
+
+        if v.duration < MIN_DURATION:
             continue
         age = util.render_duration(now - v.published_at)
         title = clean(v.title)
@@ -204,26 +547,59 @@ def render_table_of_videos(vs: Iterable[Video | str], width=None, now=None) -> P
     return table
 
 def do_videos(args):
-    app = App()
     f = Filter(args.filter)
 
     now = datetime.now(UTC)
     since = now - args.since
 
-    vs = set()
-    for u in resolve_channels(app, args, f=f):
-        logger.info("fetching videos from: %s", u)
-        ws = app.videos_by_user(u, since=since)
-        if args.no_filter:
-            vs |= set(ws)
-        else:
-            vs |= set(filter(f.video, ws))
+    logins = explicit_channels(args)
+    def fetch() -> tuple[datetime, set[Video], set[User]]:
+        r = call_server(args, "videos", since=args.since.total_seconds(), channels=sorted(logins) or None)
+        if r is not None:
+            return since, { Video.from_twitch_json(j) for j in r }, set()
+
+        app = App.from_args(args)
+        vs = set()
+        for u in resolve_channels(app, args, f=f):
+            logger.info("fetching videos from: %s", u)
+            vs |= set(app.videos_by_user(u, since=since))
+        return since, vs, app.missing
+
+    known = LastKnown("videos-by-channels")
+    key = ",".join(sorted(l.lower() for l in logins)) or "following"
+    def remember(x):
+        # don't forget older videos when asked about a shorter period
+        k = known.get(key)
+        if k is not None and k[0][0] < x[0]:
+            x = (k[0][0], x[1] | { v for v in k[0][1] if v.published_at < x[0] }, x[2])
+        known.put(key, x)
+        known.save()
+    r, at = last_known(args, known.get(key), fetch, remember)
+    if revalidating():
+        return
+    _, vs, missing = r or (since, set(), set())
+
+    vs = { v for v in vs if v.published_at >= since }
+    if not args.no_filter:
+        vs = { v for v in vs if (logins or f.user(v.user)) and f.video(v) }
+
+    if args.unseen or args.mark_seen:
+        seen = Seen()
+        if args.unseen:
+            vs = { v for v in vs if v.id not in seen }
+        # only videos that are rendered count as shown
+        seen.add(v.id for v in vs if v.duration >= MIN_DURATION)
 
     vs = sorted(vs, key=lambda v: v.published_at, reverse=True)
+    vs += sorted(missing, key=str)
 
+    note = staleness(args, at, now)
     def render(o):
-        o.write(render_table_of_videos(vs, width=args.title_width).get_string())
+        with span("videos", "render"):
+            o.write(render_table_of_videos(vs, width=args.title_width).get_string())
         o.write("\n")
+        if note:
+            o.write(note + "\n")
 
     if args.output:
         with open(args.output, "w") as o:
@@ -245,8 +621,6 @@ def do_videos(args):
         render(sys.stdout)
 
 def do_videos_file(args):
-    app = App()
-
     if args.file is None or args.file == "-":
         ls = sys.stdin.readlines()
     else:
@@ -260,9 +634,41 @@ def do_videos_file(args):
             if m:
                 yield m.group("vid")
     vs = list(g())
-    ws = app.videos_by_vid(*vs)
+
+    # only the videos that could have changed since they were last checked
+    # are fetched (by the App, which remembers them by id as it decodes them)
+    rv = Revalidator()
+    ds = rv.due(vs, datetime.now(UTC))
+    logger.info("revalidating %d/%d videos", len(ds), len(set(vs)))
+
+    def fetch() -> dict[str, Video]:
+        r = call_server(args, "videos_by_id", ids=ds)
+        if r is not None:
+            ws = { k: Video.from_twitch_json(j) for k, j in r.items() }
+            for v in ws.values():
+                rv.known(v)
+            rv.known.save()
+            rv.checked(ds, ws)
+            return ws
+
+        app = App.from_args(args)
+        ws = app.videos_by_vid(*ds)
+        if app.helix.deadline is None or not app.helix.deadline.expired:
+            rv.checked(ds, ws)
+        return ws
+
+    ws, at = {}, None
+    if ds:
+        es = [ rv.known.get(i) for i in ds ]
+        k = ({}, min(e[1] for e in es if e)) if any(es) and (all(es) or args.offline) else None
+        ws, at = last_known(args, k, fetch, lambda _: None)
+    # a background revalidation of a file rewrites it
+    if revalidating() and not args.in_place:
+        return
+    ws = rv.lookup(vs) | (ws or {})
     vs = [ ws.get(v, f'{HUMAN_URL}/videos/{v}') for v in vs ]
-    s = render_table_of_videos(vs, width=args.title_width).get_string()
+    with span("videos-file", "render"):
+        s = render_table_of_videos(vs, width=args.title_width).get_string()
 
     if args.file is None or args.file == "-" or not args.in_place:
         o = sys.stdout
@@ -273,11 +679,91 @@ def do_videos_file(args):
     with o:
         o.write(s)
         o.write('\n')
+        note = staleness(args, at, datetime.now(UTC))
+        if note:
+            o.write(note + '\n')
+
+    if o is not sys.stdout:
+        notify(args.file)
 
 def do_channels(args):
-    app = App()
-    for u in resolve_channels(app, args):
+    logins = explicit_channels(args)
+    r = call_server(args, "channels", channels=sorted(logins) or None)
+    if r is not None:
+        us = [ User(id=j["id"], login=j["login"], name=j["display_name"]) for j in r ]
+        if not logins and not args.no_filter:
+            us = filter(Filter(path=args.filter).user, us)
+    else:
+        us = resolve_channels(App.from_args(args), args)
+
+    for u in us:
         print(u)
 
+def do_backfill(args):
+    from .backfill import Backfill
+    app = App.from_args(args, priority=Priority.BACKGROUND)
+    b = Backfill(
+        app.helix,
+        path = args.output,
+        jobs = args.jobs,
+        shard_size = args.shard_size * 1024 * 1024,
+    )
+    n = b.run(resolve_channels(app, args))
+    ps = b.checkpoint.channels.values()
+    util.eprint(f"backfilled {n} videos: {sum(p.done for p in ps)}/{len(ps)} channels complete: {b.path}")
+
+def do_serve(args):
+    from .server import Server
+    Server(App.from_args(args, priority=Priority.BACKGROUND), path=args.socket, period=args.period).serve_forever()
+
+def do_run(args):
+    from .runner import Runner, load_profiles
+    Runner(App.from_args(args, priority=Priority.BACKGROUND), load_profiles(args.profiles)).run_forever(args.live_period, args.videos_period)
+
+def do_notify(args):
+    notify(*args.path)
+
+def do_search(args):
+    now = datetime.now(UTC)
+    ds = Index().search(" ".join(args.query), limit=args.limit)
+
+    table = Table(["When", "User", "Title", "URL"])
+    for d in ds:
+        title = clean(d.title)
+        if args.title_width:
+            title = title[:args.title_width]
+        table.add_row([
+            util.render_duration(now - d.at),
+            d.user,
+            title,
+            clean(d.url),
+        ])
+    table.write(sys.stdout)
+
+def do_stats(args):
+    now = datetime.now(UTC)
+    logins = explicit_channels(args)
+    gs = Store().aggregate(
+        args.table,
+        by = args.by or [ "channel" ],
+        since = now - args.since if args.since else None,
+        logins = logins or None,
+    )
+    gs.sort(key=lambda g: g.total, reverse=True)
+    if args.limit:
+        gs = gs[:args.limit]
+
+    table = Table([ b.capitalize() for b in args.by or [ "channel" ] ] + ["Count", "Total", "Mean", "Median", "Max"])
+    for g in gs:
+        table.add_row([
+            *g.key,
+            g.count,
+            util.render_duration(g.total, short=True),
+            util.render_duration(round(g.mean), short=True),
+            util.render_duration(round(g.median), short=True),
+            util.render_duration(g.max, short=True),
+        ])
+    table.write(sys.stdout)
+
 def do_sandbox(args):
     logger.info("hello")
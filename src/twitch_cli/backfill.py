@@ -0,0 +1,193 @@
+import gzip
+import json
+import os
+import queue
+import threading
+from dataclasses import asdict, dataclass
+from typing import Iterable
+
+from . import util
+from .helix import Helix
+from .model import *
+
+import logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_SHARD_SIZE = 16 * 1024 * 1024
+
+# how far the backfill of a channel got: the cursor of the next page to
+# fetch, or done
+@dataclass
+class Progress:
+    login: str | None = None
+    cursor: str | None = None
+    done: bool = False
+    videos: int = 0
+
+def drain[A](q: queue.Queue[A]) -> list[A]:
+    xs = []
+    while True:
+        try:
+            xs.append(q.get_nowait())
+        except queue.Empty:
+            return xs
+
+# what has been committed to a backfill directory: the progress of each
+# channel, and how much of the current shard holds the videos fetched
+# until then (anything past that was written after the last checkpoint)
+class Checkpoint:
+    def __init__(self, path: str):
+        self.path = path
+        self.shard = 0
+        self.size = 0
+        self.channels: dict[str, Progress] = {}
+        try:
+            with open(path) as f:
+                j = json.load(f)
+        except FileNotFoundError:
+            return
+        self.shard, self.size = j["shard"], j["size"]
+        self.channels = { k: Progress(**v) for k, v in j["channels"].items() }
+
+    def progress(self, u: User) -> Progress:
+        p = self.channels.get(u.id)
+        if p is None:
+            p = self.channels[u.id] = Progress(login=u.login)
+        return p
+
+    def save(self):
+        j = {
+            "shard": self.shard,
+            "size": self.size,
+            "channels": { k: asdict(v) for k, v in self.channels.items() },
+        }
+        with util.write_atomically(self.path) as f:
+            json.dump(j, f)
+
+# the videos are appended to gzipped NDJSON shards, one gzip member per
+# commit: a shard is a valid gzip file as long as it ends on a member
+class Shards:
+    def __init__(self, path: str, checkpoint: Checkpoint, shard_size=DEFAULT_SHARD_SIZE):
+        self.path = path
+        self.checkpoint = checkpoint
+        self.shard_size = shard_size
+        self.f = None
+
+    def shard_path(self, n: int) -> str:
+        return os.path.join(self.path, f"videos-{n:05d}.ndjson.gz")
+
+    def open(self):
+        c = self.checkpoint
+        self.truncate(c.shard, c.size)
+        if c.size >= self.shard_size:
+            c.shard, c.size = c.shard + 1, 0
+            self.truncate(c.shard, 0)
+        self.f = open(self.shard_path(c.shard), "ab")
+
+    def truncate(self, n: int, size: int):
+        p = self.shard_path(n)
+        if not os.path.exists(p):
+            if size > 0:
+                raise RuntimeError(f"shard missing: {p}")
+            return
+        if os.path.getsize(p) > size:
+            logger.info("discarding what was written after the last checkpoint: %s", p)
+            os.truncate(p, size)
+
+    def write(self, vs: Iterable[Video]):
+        if self.f is None:
+            self.open()
+        assert self.f is not None
+        bs = b"".join(json.dumps(v.to_twitch_json()).encode("UTF-8") + b"\n" for v in vs)
+        if not bs:
+            return
+        self.f.write(gzip.compress(bs))
+        self.f.flush()
+        os.fsync(self.f.fileno())
+        self.checkpoint.size = self.f.tell()
+        if self.checkpoint.size >= self.shard_size:
+            self.close()
+
+    def close(self):
+        if self.f is not None:
+            self.f.close()
+            self.f = None
+
+# walks the videos of channels concurrently: the workers fetch pages, the
+# calling thread appends them to the shards and checkpoints the cursors of
+# the next pages, so that an interrupted backfill resumes where it stopped
+# (pages fetched but not yet committed are fetched again).
+#
+# jobs only needs to be large enough for the rate limit, which Helix
+# enforces, to become the bottleneck
+class Backfill:
+    def __init__(self, helix: Helix, path: str, jobs=8, shard_size=DEFAULT_SHARD_SIZE):
+        self.helix = helix
+        self.path = path
+        self.jobs = jobs
+        self.checkpoint = Checkpoint(os.path.join(path, "checkpoint.json"))
+        self.shards = Shards(path, self.checkpoint, shard_size=shard_size)
+        self.todo: queue.Queue[User] = queue.Queue()
+        self.pages: queue.Queue[tuple[User, list[Video], str | None] | None] = queue.Queue(maxsize=4 * jobs)
+        self.stopped = threading.Event()
+
+    def worker(self):
+        try:
+            while not self.stopped.is_set():
+                try:
+                    u = self.todo.get_nowait()
+                except queue.Empty:
+                    return
+                try:
+                    self.fetch(u)
+                except Exception as e:
+                    logger.warning("unable to backfill %s; will resume on the next run: %s", u, e)
+        finally:
+            self.pages.put(None)
+
+    def fetch(self, u: User):
+        after = self.checkpoint.channels[u.id].cursor
+        params = { "user_id": u.id, "sort": "time" }
+        for ds, after in self.helix.pages("/videos", params, page_size=100, after=after):
+            if self.stopped.is_set():
+                return
+            self.pages.put((u, [ Video.from_twitch_json(d) for d in ds ], after))
+
+    # commits everything fetched so far in one write
+    def commit(self, ps: list[tuple[User, list[Video], str | None]]):
+        self.shards.write(v for _, vs, _ in ps for v in vs)
+        for u, vs, after in ps:
+            p = self.checkpoint.channels[u.id]
+            p.cursor, p.done = after, after is None
+            p.videos += len(vs)
+            if p.done:
+                logger.info("backfilled %s: %d videos", u, p.videos)
+        self.checkpoint.save()
+
+    def run(self, users: Iterable[User]) -> int:
+        os.makedirs(self.path, exist_ok=True)
+        us = [ u for u in users if not self.checkpoint.progress(u).done ]
+        logger.info("backfilling %d channels into: %s", len(us), self.path)
+        for u in us:
+            self.todo.put(u)
+
+        running = min(self.jobs, len(us))
+        for i in range(running):
+            threading.Thread(target=self.worker, name=f"backfill {i}", daemon=True).start()
+
+        n = 0
+        try:
+            while running:
+                ps = []
+                for x in [ self.pages.get() ] + drain(self.pages):
+                    if x is None:
+                        running -= 1
+                    else:
+                        ps.append(x)
+                if ps:
+                    self.commit(ps)
+                    n += sum(len(vs) for _, vs, _ in ps)
+        finally:
+            self.stopped.set()
+            self.shards.close()
+        return n
@@ -0,0 +1,140 @@
+import base64
+import collections
+import gzip
+import json
+import time
+import urllib.parse
+from datetime import datetime, timedelta, UTC
+from typing import Callable
+
+import requests
+import requests.structures
+
+from . import oauth, util
+from .transport import Transport
+
+import logging
+logger = logging.getLogger(__name__)
+
+# a cassette is a gzipped NDJSON file: a header with who the requests were
+# sent as, then one line per request with the response and its latency
+
+# never written to a cassette
+SECRET_PARAMS = frozenset({ "access_token", "refresh_token", "client_secret", "code", "token" })
+SECRET_HEADERS = frozenset({ "authorization", "client-id", "set-cookie", "cookie" })
+
+def scrub_url(url: str) -> str:
+    u = urllib.parse.urlsplit(url)
+    qs = [ (k, v) for k, v in urllib.parse.parse_qsl(u.query, keep_blank_values=True) if k not in SECRET_PARAMS ]
+    return urllib.parse.urlunsplit(u._replace(query=urllib.parse.urlencode(qs)))
+
+def scrub_json(j):
+    match j:
+        case dict():
+            return { k: "" if k in SECRET_PARAMS else scrub_json(v) for k, v in j.items() }
+        case list():
+            return [ scrub_json(x) for x in j ]
+        case _:
+            return j
+
+def scrub_body(body: bytes) -> bytes:
+    try:
+        j = json.loads(body)
+    except ValueError:
+        return body
+    return json.dumps(scrub_json(j)).encode("UTF-8")
+
+# requests match regardless of the order of their parameters
+def key(method: str, url: str) -> tuple[str, str]:
+    u = urllib.parse.urlsplit(scrub_url(url))
+    qs = sorted(urllib.parse.parse_qsl(u.query, keep_blank_values=True))
+    return method, urllib.parse.urlunsplit(u._replace(query=urllib.parse.urlencode(qs)))
+
+# sends requests through another transport, and records what was sent and
+# received: the cassette is written when closed
+class RecordingTransport(Transport):
+    def __init__(self, inner: Transport, path: str, meta: Callable[[], dict | None] = lambda: None):
+        super().__init__()
+        self.inner = inner
+        self.path = path
+        self.meta = meta
+        self.interactions: list[dict] = []
+
+    def send(self, preq, timeout):
+        self.count("requests")
+        t0 = time.monotonic()
+        rsp = self.inner.send(preq, timeout)
+        latency = time.monotonic() - t0
+        i = {
+            "method": preq.method,
+            "url": scrub_url(preq.url or ""),
+            "status": rsp.status_code,
+            "headers": { k: v for k, v in rsp.headers.items() if k.lower() not in SECRET_HEADERS },
+            "body": base64.b64encode(scrub_body(rsp.content)).decode("ASCII"),
+            "latency": latency,
+        }
+        with self.lock:
+            self.interactions.append(i)
+        return rsp
+
+    def stats(self):
+        return self.inner.stats()
+
+    def close(self):
+        self.inner.close()
+        with self.lock:
+            xs = list(self.interactions)
+        meta = { k: v for k, v in (self.meta() or {}).items() if k in ("user_id", "login") }
+        with util.write_atomically(self.path, "wb") as f:
+            with gzip.open(f, "wt", encoding="UTF-8") as g:
+                g.write(json.dumps({ "meta": meta, "recorded_at": datetime.now(UTC).isoformat() }) + "\n")
+                for i in xs:
+                    g.write(json.dumps(i) + "\n")
+        logger.info("recorded %d requests: %s", len(xs), self.path)
+
+# answers requests from a cassette, after the recorded latency multiplied
+# by scale: requests sent several times get the recorded responses in
+# order, and the last one once they run out
+class ReplayTransport(Transport):
+    def __init__(self, path: str, scale=1.0, sleep=time.sleep):
+        super().__init__()
+        self.path = path
+        self.scale = scale
+        self.sleep = sleep
+        self.responses: dict[tuple[str, str], collections.deque[dict]] = collections.defaultdict(collections.deque)
+        with gzip.open(path, "rt", encoding="UTF-8") as f:
+            self.meta = json.loads(f.readline())["meta"]
+            for l in f:
+                i = json.loads(l)
+                self.responses[key(i["method"], i["url"])].append(i)
+        logger.debug("loaded %d requests: %s", sum(len(q) for q in self.responses.values()), path)
+
+    # a token for the user the requests were recorded as
+    def token(self) -> oauth.Token:
+        now = datetime.now(UTC)
+        return oauth.Token(value="replay", expires=now + timedelta(days=1), created=now, meta=self.meta)
+
+    def send(self, preq, timeout):
+        self.count("requests")
+        k = key(preq.method or "GET", preq.url or "")
+        with self.lock:
+            q = self.responses.get(k)
+            i = (q.popleft() if len(q) > 1 else q[0]) if q else None
+        if i is None:
+            self.count("misses")
+            raise requests.exceptions.ConnectionError(f"not in cassette: {k[0]} {k[1]}")
+
+        if self.scale:
+            latency = i["latency"] * self.scale
+            if latency > timeout:
+                self.sleep(timeout)
+                raise requests.exceptions.Timeout(f"replayed latency: {latency:.3f}s")
+            self.sleep(latency)
+
+        rsp = requests.Response()
+        rsp.status_code = i["status"]
+        rsp.headers = requests.structures.CaseInsensitiveDict(i["headers"])
+        rsp._content = base64.b64decode(i["body"])
+        rsp.url = i["url"]
+        rsp.request = preq
+        return rsp
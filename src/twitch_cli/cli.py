@@ -1,16 +1,32 @@
 import argparse
 import os
+import re
 import sys
 from typing import Callable
 
-from . import util, app
-from . import env, package_version
+from . import util
+from . import env
+from .completion import complete_channels, complete_lists
 
 import argcomplete
 
 import logging
 logger = logging.getLogger(__name__)
 
+# argcomplete de-duplicates completions with a list membership test and
+# escapes every character of every completion, which with thousands of
+# followed channels takes longer than everything else put together
+class CompletionFinder(argcomplete.CompletionFinder):
+    PLAIN = re.compile(r"[\w.-]*")
+
+    def filter_completions(self, completions):
+        return [ c for c in dict.fromkeys(completions) if self.exclude is None or c not in self.exclude ]
+
+    def quote_completions(self, completions, cword_prequote, last_wordbreak_pos):
+        if cword_prequote or last_wordbreak_pos is not None or len(completions) <= 1 or not all(self.PLAIN.fullmatch(c) for c in completions):
+            return super().quote_completions(completions, cword_prequote, last_wordbreak_pos)
+        return completions
+
 class ArgumentParser(argparse.ArgumentParser):
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
@@ -24,13 +40,24 @@ def parse_args(build: Callable[[], argparse.ArgumentParser]) -> argparse.Namespa
         p.add_argument("-v", "--version", action="store_true", help="print program version, then exit")
         p.add_argument("--completion-script", action="store_true", help="print script that when sourced configures shell completion, then exit")
         p.add_argument("--log", default=env("LOG_LEVEL", "WARN"), help="set log level")
+        p.add_argument("--trace", metavar="FILE", default=env("TRACE"), help="write a Chrome trace (viewable in Perfetto) of requests, fetches, filtering and rendering to FILE")
+        p.add_argument("--memstats", default=env("MEMSTATS") is not None, action="store_true", help="trace allocations, and write the RSS and the top growing allocation sites to a file in the state directory on SIGUSR2")
 
     args, _ = early.parse_known_args()
 
     util.setup_logger(args.log)
     logger.debug("early args: %s", args)
 
+    if args.trace:
+        from . import tracing
+        tracing.enable(args.trace)
+
+    if args.memstats:
+        from . import memstats
+        memstats.enable()
+
     if args.version:
+        from . import package_version
         prog = os.path.basename(sys.argv[0])
         print(f"{prog} {package_version}")
         sys.exit(0)
@@ -40,8 +67,24 @@ def parse_args(build: Callable[[], argparse.ArgumentParser]) -> argparse.Namespa
         sys.stdout.write(argcomplete.shellcode([ prog ]))
         sys.exit(0)
 
-    argcomplete.autocomplete(main_parser)
-    return main_parser.parse_args()
+    CompletionFinder()(main_parser)
+    args = main_parser.parse_args()
+    check_args(main_parser, args)
+    return args
+
+# combinations of arguments argparse can't express
+def check_args(parser: argparse.ArgumentParser, args: argparse.Namespace):
+    match args.cmd:
+        case "live":
+            if args.adaptive and (args.channel or args.list):
+                parser.error("live: --adaptive polls the followed channels, and can't be combined with channels or lists")
+            if args.views:
+                ignored = { "--game": args.game, "--adaptive": args.adaptive, "--offline": args.offline, "--stale-while-revalidate": args.stale_while_revalidate }
+                if any(ignored.values()):
+                    parser.error(f"live: --views renders every view from one sweep, and can't be combined with {', '.join(k for k, v in ignored.items() if v)}")
+        case "stats":
+            if args.table == "videos" and "game" in (args.by or []):
+                parser.error("stats: videos have no game, only streams can be grouped by game")
 
 def main_parser():
     parser = ArgumentParser(
@@ -66,46 +109,115 @@ def main_parser():
     def add_list_args(p):
         g = p.add_argument_group("Lists")
         g.add_argument("--lists", metavar="PATH", help="load lists configuration from PATH")
-        g.add_argument("-l", "--list", metavar="LIST", action="append", help="select channels from LIST")
+        g.add_argument("-l", "--list", metavar="LIST", action="append", help="select channels from LIST").completer = complete_lists
+
+    def add_helix_args(p, deadline=True):
+        g = p.add_argument_group("Helix")
+        if deadline:
+            g.add_argument("--deadline", metavar="DURATION", default=env("DEADLINE"), type="duration", help="render what has been fetched after DURATION")
+            g.add_argument("--no-server", default=env("NO_SERVER") is not None, action="store_true", help="don't ask a running server, talk to Helix directly")
+        g.add_argument("--retries", metavar="N", default=env("RETRIES", 2), type=int, help="retry failed idempotent requests N times")
+        g.add_argument("--hedge", default=env("HEDGE") is not None, action="store_true", help="send a duplicate request when a request is slower than the observed p95")
+        g.add_argument("--transport", choices=["requests", "http2"], default=env("TRANSPORT", "requests"), help="send requests using requests, or multiplexed over HTTP/2 (needs httpx[http2])")
+        g.add_argument("--pool-size", metavar="N", default=env("POOL_SIZE", 32), type=int, help="keep at most N connections per host")
+        e = g.add_mutually_exclusive_group()
+        e.add_argument("--record", metavar="CASSETTE", default=env("RECORD"), help="record the responses, without credentials, to CASSETTE")
+        e.add_argument("--replay", metavar="CASSETTE", default=env("REPLAY"), help="answer requests from CASSETTE instead of Helix")
+        g.add_argument("--replay-latency", metavar="SCALE", default=env("REPLAY_LATENCY", 1.0), type=float, help="replay responses after their recorded latency multiplied by SCALE")
+
+    def add_last_known_args(p):
+        g = p.add_argument_group("Last known data")
+        g.add_argument("--offline", default=env("OFFLINE") is not None, action="store_true", help="answer from the last known data, never talk to Helix")
+        g.add_argument("--stale-while-revalidate", metavar="DURATION", default=env("STALE_WHILE_REVALIDATE"), type="duration", help="answer from last known data younger than DURATION, and refresh it in the background")
 
     def add_channel_args(p):
         add_filter_args(p)
         add_list_args(p)
-        p.add_argument("channel", metavar="CHANNEL", nargs="*")
+        p.add_argument("channel", metavar="CHANNEL", nargs="*").completer = complete_channels
 
     sandbox_cmd = add_subcommand("sandbox")
     add_channel_args(sandbox_cmd)
 
     following_cmd = add_subcommand("following")
+    add_helix_args(following_cmd)
 
     def add_title_width_argmunent(p):
         p.add_argument("-w", "--title-width", metavar="WIDTH", type=int, default=env("TITLE_WIDTH"), help="truncate titles to WIDTH")
 
     live_cmd = add_subcommand("live")
     add_title_width_argmunent(live_cmd)
+    add_helix_args(live_cmd)
+    add_last_known_args(live_cmd)
+    live_cmd.add_argument("-a", "--adaptive", action="store_true", help="only poll the followed channels that are due according to their streaming history, even when that takes more requests")
+    live_cmd.add_argument("-g", "--game", metavar="GAME", action="append", help="only list streams in GAME")
+    live_cmd.add_argument("--max-period", metavar="DURATION", default="1h", type="duration", help="poll channels that rarely stream at least every DURATION")
+    live_cmd.add_argument("--views", metavar="DIR", help="write the live streams of the followed channels to DIR/live.twitch, of each list (all, or the ones selected) to DIR/live-LIST.twitch, and of the channels given to DIR/live-channels.twitch, from one sweep")
     add_channel_args(live_cmd)
 
     videos_cmd = add_subcommand("videos")
     add_title_width_argmunent(videos_cmd)
+    add_helix_args(videos_cmd)
+    add_last_known_args(videos_cmd)
     videos_cmd.add_argument("-s", "--since", metavar="SINCE", default="3d", help="list videos published since SINCE ago", type="duration")
+    videos_cmd.add_argument("-u", "--unseen", action="store_true", help="only list videos that have not been listed or marked as seen before, and mark them as seen")
+    videos_cmd.add_argument("-m", "--mark-seen", action="store_true", help="mark the listed videos as seen")
     videos_cmd.add_argument("-o", "--output", metavar="FILE")
     videos_cmd.add_argument("-e", "--edit", action="store_true")
     add_channel_args(videos_cmd)
 
     videos_file_cmd = add_subcommand("videos-file")
     add_title_width_argmunent(videos_file_cmd)
+    add_helix_args(videos_file_cmd)
+    add_last_known_args(videos_file_cmd)
     videos_file_cmd.add_argument("-i", "--in-place", action="store_true")
     videos_file_cmd.add_argument("file", metavar="FILE", nargs="?")
 
     channels_cmd = add_subcommand("channels")
+    add_helix_args(channels_cmd)
     add_channel_args(channels_cmd)
 
+    backfill_cmd = add_subcommand("backfill")
+    add_helix_args(backfill_cmd, deadline=False)
+    backfill_cmd.add_argument("-o", "--output", metavar="DIR", default=util.state_path("backfill"), help="write the videos and the checkpoint to DIR, and resume the backfill checkpointed there")
+    backfill_cmd.add_argument("-j", "--jobs", metavar="N", default=env("BACKFILL_JOBS", 8), type=int, help="walk N channels at a time")
+    backfill_cmd.add_argument("--shard-size", metavar="MIB", default=16, type=int, help="start a new shard when the current one reaches MIB MiB")
+    add_channel_args(backfill_cmd)
+
+    serve_cmd = add_subcommand("serve")
+    add_helix_args(serve_cmd, deadline=False)
+    serve_cmd.add_argument("--socket", metavar="PATH", help="listen on PATH")
+    serve_cmd.add_argument("--period", metavar="DURATION", default="1m", type="duration", help="refresh the live snapshot every DURATION")
+
+    run_cmd = add_subcommand("run")
+    add_helix_args(run_cmd, deadline=False)
+    run_cmd.add_argument("--profiles", metavar="PATH", help="load profiles configuration from PATH")
+    run_cmd.add_argument("--live-period", metavar="DURATION", default="1m", type="duration", help="render the live streams of every profile every DURATION")
+    run_cmd.add_argument("--videos-period", metavar="DURATION", default="15m", type="duration", help="render the recent videos of every profile every DURATION")
+
+    notify_cmd = add_subcommand("notify")
+    notify_cmd.add_argument("path", metavar="PATH", nargs="+", help="tell subscribers of a running server that PATH has been updated")
+
+    search_cmd = add_subcommand("search")
+    add_title_width_argmunent(search_cmd)
+    search_cmd.add_argument("-n", "--limit", metavar="N", type=int, help="list at most N matches")
+    search_cmd.add_argument("query", metavar="QUERY", nargs="+")
+
+    stats_cmd = add_subcommand("stats")
+    stats_cmd.add_argument("-b", "--by", metavar="DIMENSION", choices=["channel", "game"], action="append", help="group by DIMENSION (channel or game)")
+    stats_cmd.add_argument("-s", "--since", metavar="SINCE", type="duration", help="only count what started or was published since SINCE ago")
+    stats_cmd.add_argument("-n", "--limit", metavar="N", type=int, help="list at most N groups")
+    add_list_args(stats_cmd)
+    stats_cmd.add_argument("table", metavar="TABLE", choices=["streams", "videos"], help="aggregate the durations of streams or videos")
+    stats_cmd.add_argument("channel", metavar="CHANNEL", nargs="*").completer = complete_channels
+
     return parser
 
 def main():
     args = parse_args(main_parser)
     logger.debug("args: %s", args)
 
+    from . import app
+
     match args.cmd:
         case "oauth":
             app.do_oauth(args)
@@ -121,5 +233,17 @@ def main():
             app.do_videos_file(args)
         case "channels":
             app.do_channels(args)
+        case "search":
+            app.do_search(args)
+        case "stats":
+            app.do_stats(args)
+        case "backfill":
+            app.do_backfill(args)
+        case "serve":
+            app.do_serve(args)
+        case "run":
+            app.do_run(args)
+        case "notify":
+            app.do_notify(args)
         case cmd:
             raise NotImplementedError(cmd)
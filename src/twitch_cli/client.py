@@ -0,0 +1,96 @@
+import json
+import os
+import socket
+from typing import Generator
+
+import xdg_base_dirs
+
+from . import env, util, whoami
+
+import logging
+logger = logging.getLogger(__name__)
+
+def socket_path() -> str:
+    p = env("SOCKET")
+    if p is not None:
+        return p
+    d = xdg_base_dirs.xdg_runtime_dir()
+    if d is not None:
+        return os.path.join(d, f"{whoami}.sock")
+    return util.state_path("socket")
+
+# how long to wait for an answer before giving up on a (wedged) server
+DEFAULT_TIMEOUT = 30
+
+class ServerError(Exception):
+    pass
+
+# json lines over the unix socket of a running `twitch serve`
+class Client:
+    def __init__(self, sock: socket.socket):
+        self.sock = sock
+        self.f = sock.makefile("rwb")
+
+    @classmethod
+    def connect(cls, path=None, timeout: float | None = DEFAULT_TIMEOUT) -> "Client | None":
+        if env("NO_SERVER") is not None:
+            return None
+
+        path = path or socket_path()
+        s = cls.open(path, timeout)
+        if s is None:
+            return None
+        logger.debug("connected to server: %s", path)
+        return cls(s)
+
+    # a socket connected to path, or None if nothing is listening there
+    @staticmethod
+    def open(path: str, timeout: float | None = DEFAULT_TIMEOUT) -> socket.socket | None:
+        s = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        s.settimeout(timeout)
+        try:
+            s.connect(path)
+        except OSError as e:
+            logger.debug("unable to connect to server (%s): %s", e, path)
+            s.close()
+            return None
+        return s
+
+    def close(self):
+        self.f.close()
+        self.sock.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def _read(self):
+        l = self.f.readline()
+        if not l:
+            raise ServerError("connection closed")
+        return json.loads(l)
+
+    def call(self, method: str, **params):
+        logger.debug("calling server: %s %s", method, params)
+        self.f.write(json.dumps({ "method": method, "params": params }).encode("UTF-8") + b"\n")
+        self.f.flush()
+        r = self._read()
+        if "error" in r:
+            raise ServerError(r["error"])
+        return r["result"]
+
+    def events(self) -> Generator[dict]:
+        self.call("subscribe")
+        # events come whenever they happen
+        self.sock.settimeout(None)
+        while True:
+            yield self._read()
+
+def notify(*paths: str):
+    c = Client.connect()
+    if c is None:
+        return
+    with c:
+        c.call("notify", paths=[ os.path.abspath(p) for p in paths ])
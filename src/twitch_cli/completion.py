@@ -0,0 +1,33 @@
+# shell completion runs on every <TAB>: keep this module (and what it
+# imports) free of the heavy dependencies the rest of the application needs
+
+import os
+from typing import Iterable
+
+from . import util
+
+def following_path():
+    return util.cache_path("following.txt")
+
+def remember_following(logins: Iterable[str]):
+    with util.write_atomically(following_path()) as f:
+        for l in sorted(logins):
+            f.write(l + "\n")
+
+def cached_following() -> list[str]:
+    try:
+        with open(following_path()) as f:
+            return f.read().splitlines()
+    except FileNotFoundError:
+        return []
+
+def complete_channels(prefix, **kwargs):
+    prefix = prefix.lower()
+    return [ l for l in cached_following() if l.startswith(prefix) ]
+
+def complete_lists(prefix, parsed_args, **kwargs):
+    from .config import Lists
+    path = getattr(parsed_args, "lists", None)
+    if path is None and not os.path.exists(Lists.default_path()):
+        return []
+    return [ k for k in Lists(path=path).keys() if k.startswith(prefix) ]
@@ -1,45 +1,166 @@
 import os
+import pickle
 import re
 
 from abc import ABC, abstractmethod
-from typing import Any, Iterable
+from typing import Any, Callable, Iterable
 
 import xdg_base_dirs
 import yaml
 
 from .model import *
-from . import whoami
+from . import util, whoami
+from .tracing import traced
+from .watch import Watcher
 
 import logging
 logger = logging.getLogger(__name__)
 
+# prefer the libyaml bindings when available
+Loader = getattr(yaml, "CSafeLoader", yaml.SafeLoader)
+Dumper = getattr(yaml, "CSafeDumper", yaml.SafeDumper)
+
+# bump when the compiled representation changes
+CACHE_FORMAT = 1
+
 class Configurable(ABC):
     def __init__(self, path=None, thing=None, filename=None):
-        thing = thing or self.__class__.__name__.lower()
-        filename = filename or f"{thing}.yaml"
+        self.thing = thing or self.__class__.__name__.lower()
+        filename = filename or f"{self.thing}.yaml"
         self.path = path or os.path.join(xdg_base_dirs.xdg_config_home(), whoami, filename)
+        self.watcher: Watcher | None = None
+        self.listeners: list[Callable[[Configurable], None]] = []
 
-        logger.debug("attempting to load %s from: %s", thing, self.path)
-        try:
-            with open(self.path, "r") as f:
-                self._raw = yaml.load(f, Loader=yaml.Loader)
-            if logger.isEnabledFor(logging.DEBUG):
-                logger.debug("loaded %s from; %s: %s", thing, self.path, self._raw)
-            else:
-                logger.info("loaded %s from: %s", thing, self.path)
-        except FileNotFoundError:
-            logger.info("populating an empty %s at: %s", thing, self.path)
+        logger.debug("attempting to load %s from: %s", self.thing, self.path)
+        if not os.path.exists(self.path):
+            logger.info("populating an empty %s at: %s", self.thing, self.path)
             os.makedirs(os.path.dirname(self.path), exist_ok=True)
             with open(self.path, "x") as f:
-                yaml.dump(self.empty(), f, Dumper=yaml.Dumper)
-            with open(self.path, "r") as f:
-                self._raw = yaml.load(f, Loader=yaml.Loader)
+                yaml.dump(self.empty(), f, Dumper=Dumper)
+
+        self._state = self._load()
+
+    # readers pick up a reloaded configuration with a single attribute read
+    @property
+    def _raw(self):
+        return self._state[0]
+
+    @property
+    def _compiled(self):
+        return self._state[1]
+
+    def _load(self) -> tuple[Any, Any]:
+        st = os.stat(self.path)
+        key = (self.__class__.__name__, CACHE_FORMAT, os.path.abspath(self.path), st.st_mtime_ns, st.st_size)
+        cached = self._read_cache(key)
+        if cached is not None:
+            logger.debug("loaded cached %s from: %s", self.thing, self.cache_path)
+            return cached
+
+        with open(self.path, "r") as f:
+            raw = yaml.load(f, Loader=Loader)
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug("loaded %s from; %s: %s", self.thing, self.path, raw)
+        else:
+            logger.info("loaded %s from: %s", self.thing, self.path)
+
+        compiled = self.compile(raw if raw is not None else self.empty())
+        self._write_cache(key, raw, compiled)
+        return raw, compiled
+
+    # re-parse and re-compile in the background when the file changes: the
+    # previous configuration stays in place until the new one has compiled,
+    # and when it doesn't
+    def watch(self, period=1.0, inotify=True):
+        if self.watcher is None:
+            self.watcher = Watcher(self.path, self.reload, period=period, inotify=inotify)
+            self.watcher.start()
+        return self
+
+    def reload(self):
+        try:
+            state = self._load()
+        except FileNotFoundError:
+            logger.warning("%s removed; keeping the previous one: %s", self.thing, self.path)
+            return
+        except Exception as e:
+            logger.warning("unable to load %s; keeping the previous one: %s: %s", self.thing, self.path, e)
+            return
+        if state[0] == self._raw:
+            return
+        logger.info("reloaded %s from: %s", self.thing, self.path)
+        self._state = state
+        for f in self.listeners:
+            f(self)
+
+    @property
+    def cache_path(self):
+        hd, tl = os.path.split(self.path)
+        return os.path.join(hd, f".{tl}.pickle")
+
+    def _read_cache(self, key):
+        try:
+            with open(self.cache_path, "rb") as f:
+                k, raw, compiled = pickle.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            logger.debug("ignoring unreadable cache (%s): %s", e, self.cache_path)
+            return None
+        if k != key:
+            return None
+        return raw, compiled
+
+    def _write_cache(self, key, raw, compiled):
+        try:
+            with util.write_atomically(self.cache_path, "wb") as f:
+                pickle.dump((key, raw, compiled), f, protocol=pickle.HIGHEST_PROTOCOL)
+        except OSError as e:
+            logger.debug("unable to write cache (%s): %s", e, self.cache_path)
 
     @classmethod
     @abstractmethod
     def empty(cls) -> Any:
         ...
 
+    # pre-process the parsed configuration into the representation kept in
+    # the cache
+    def compile(self, raw) -> Any:
+        return raw
+
+# the patterns of one of the include or exclude lists, indexed by kind
+class Rules:
+    def __init__(self, xs: Iterable[int | str] | None):
+        self.exact: set[str] = set()
+        self.ints: set[int] = set()
+        self.patterns: list[re.Pattern] = []
+        for x in xs or []:
+            match x:
+                case int():
+                    self.ints.add(x)
+                case str() if x.startswith("/"):
+                    self.patterns.append(re.compile(x[1:]))
+                case str():
+                    self.exact.add(x)
+
+    # equivalent to any(Filter._match(x, s) for x in xs for s in subjects)
+    def match(self, *subjects: str | None) -> bool:
+        for s in subjects:
+            if s is None:
+                continue
+            if s in self.exact:
+                return True
+            if self.ints:
+                try:
+                    if int(s) in self.ints:
+                        return True
+                except ValueError:
+                    pass
+            for p in self.patterns:
+                if p.search(s):
+                    return True
+        return False
+
 class Filter(Configurable):
     @classmethod
     def empty(cls):
@@ -63,45 +184,47 @@ class Filter(Configurable):
     def default_path(cls):
         return os.path.join(xdg_base_dirs.xdg_config_home(), whoami, "filter.yaml")
 
+    @traced("filter")
     def stream(self, s: Stream) -> bool:
         for b in [self._user(s.user), self._game(s.game), self._title(s.title)]:
             if b is not None:
                 return b
         return True
 
+    @traced("filter")
     def video(self, v: Video) -> bool:
         for b in [self._user(v.user), self._title(v.title)]:
             if b is not None:
                 return b
         return True
 
+    @traced("filter")
     def user(self, u: User) -> bool:
         b = self._user(u)
         return b if b is not None else True
 
+    def compile(self, raw):
+        return {
+            (k, t): Rules((raw.get(k) or {}).get(t))
+            for k in [ "include", "exclude" ]
+            for t in [ "user", "game", "title" ]
+        }
+
+    def _check(self, t: str, id: str | None, *subjects: str | None) -> bool | None:
+        c = self._compiled
+        for k, b in [ ("include", True), ("exclude", False) ]:
+            r = c[(k, t)]
+            if id in r.exact or r.match(*subjects):
+                return b
+
     def _user(self, u: User) -> bool | None:
-        for x in self._raw.get("include", {}).get("user", []):
-            if x == u.id or self._match(x, u.login) or self._match(x, u.name):
-                return True
-        for x in self._raw.get("exclude", {}).get("user", []):
-            if x == u.id or self._match(x, u.login) or self._match(x, u.name):
-                return False
+        return self._check("user", u.id, u.login, u.name)
 
     def _game(self, g: Game) -> bool | None:
-        for x in self._raw.get("include", {}).get("game", []):
-            if x == g.id or self._match(x, g.name):
-                return True
-        for x in self._raw.get("exclude", {}).get("game", []):
-            if x == g.id or self._match(x, g.name):
-                return False
+        return self._check("game", g.id, g.name)
 
     def _title(self, t: str) -> bool | None:
-        for p in self._raw.get("include", {}).get("title", []):
-            if self._match(p, t):
-                return True
-        for p in self._raw.get("exclude", {}).get("title", []):
-            if self._match(p, t):
-                return False
+        return self._check("title", None, t)
 
     @staticmethod
     def _match(test: int | str | None, subject: str | None) -> bool | None:
@@ -124,12 +247,20 @@ class Lists(Configurable):
     def __init__(self, path=None):
         super().__init__(path=path)
 
+    @classmethod
+    def default_path(cls):
+        return os.path.join(xdg_base_dirs.xdg_config_home(), whoami, "lists.yaml")
+
     @classmethod
     def empty(cls):
         return {}
 
+    # logins that look like numbers are parsed as such
+    def compile(self, raw):
+        return { k: frozenset(str(c) for c in v or []) for k, v in raw.items() }
+
     def __getitem__(self, k: str) -> set[str]:
-        return set(self._raw[k])
+        return set(self._compiled[k])
 
     def keys(self) -> Iterable[str]:
         return self._raw.keys()
@@ -139,3 +270,18 @@ class Lists(Configurable):
 
     def __len__(self) -> int:
         return len(self._raw)
+
+# the configurations served by a runner, by name
+class Profiles(Configurable):
+    def __init__(self, path=None):
+        super().__init__(path=path)
+
+    @classmethod
+    def empty(cls):
+        return { "default": {} }
+
+    def compile(self, raw):
+        return { k: v or {} for k, v in raw.items() }
+
+    def items(self) -> Iterable[tuple[str, dict]]:
+        return self._compiled.items()
@@ -1,13 +1,26 @@
+import atexit
+import collections
+import concurrent.futures
 import email.utils
+import random
+import statistics
+import threading
+import time
 import urllib.parse
 import uuid
 
+from dataclasses import dataclass
 from datetime import datetime, timedelta, UTC
 
 import requests
 
 from . import oauth
 from . import package_version, whoami
+from .cassette import RecordingTransport
+from .priority import Admission, Priority, Waits, current as current_priority
+from .shared import RateLimit, SharedState
+from .tracing import span, traced
+from .transport import DEFAULT_POOL_SIZE, Transport, build as build_transport
 
 import logging
 logger = logging.getLogger(__name__)
@@ -15,16 +28,86 @@ logger = logging.getLogger(__name__)
 # https://docs.python-requests.org/en/latest/user/advanced/#timeouts
 DEFAULT_TIMEOUT = 10
 
+class DeadlineExceeded(Exception):
+    pass
+
+class Deadline:
+    def __init__(self, budget: timedelta):
+        self.budget = budget
+        self.at = time.monotonic() + budget.total_seconds()
+
+    def remaining(self) -> float:
+        return self.at - time.monotonic()
+
+    @property
+    def expired(self) -> bool:
+        return self.remaining() <= 0
+
+    def timeout(self, timeout: float) -> float:
+        r = self.remaining()
+        if r <= 0:
+            raise DeadlineExceeded(self.budget)
+        return min(timeout, r)
+
+@dataclass
+class RetryPolicy:
+    attempts: int = 3
+    base: float = 0.5
+    cap: float = 8.0
+    statuses: frozenset[int] = frozenset({ 500, 502, 503, 504 })
+
+    # "full jitter": https://aws.amazon.com/blogs/architecture/exponential-backoff-and-jitter/
+    def backoff(self, attempt: int) -> float:
+        return random.uniform(0, min(self.cap, self.base * 2 ** attempt))
+
+def _spawn[A](f) -> concurrent.futures.Future[A]:
+    fut = concurrent.futures.Future()
+    def run():
+        if not fut.set_running_or_notify_cancel():
+            return
+        try:
+            fut.set_result(f())
+        except BaseException as e:
+            fut.set_exception(e)
+    threading.Thread(target=run, daemon=True).start()
+    return fut
+
 class Helix:
     base_url = "https://api.twitch.tv/helix"
     client_id = "dqfe0to2kp1pj0yvs3rpvuupdn1u6d"
     authorize_url = "https://id.twitch.tv/oauth2/authorize"
     validate_url = "https://id.twitch.tv/oauth2/validate"
 
-    def __init__(self, token=None, timeout=DEFAULT_TIMEOUT):
+    def __init__(self, token=None, timeout=DEFAULT_TIMEOUT, deadline: Deadline | None = None, retry: RetryPolicy | None = None, hedge=False, shared: SharedState | None = None, transport: Transport | str | None = None, pool_size=DEFAULT_POOL_SIZE, record: str | None = None, priority=Priority.INTERACTIVE):
         self._token = token
+        self.shared = shared
+        self.ratelimit: RateLimit | None = None
+        # the rate limit of the last response, shared with the next acquire
+        self.observed: RateLimit | None = None
+        if shared is not None:
+            atexit.register(self.share_ratelimit)
+        # prepares requests (and sends them, unless another transport is given)
         self.session = requests.Session()
+        if not isinstance(transport, Transport):
+            transport = build_transport(transport, self.session, pool_size=pool_size)
+        self.transport = transport
+        if record is not None:
+            # the token itself is never recorded, only who it belongs to
+            self.transport = RecordingTransport(transport, record, meta=lambda: self._token and self._token.meta)
+            atexit.register(self.transport.close)
         self.timeout = timeout
+        self.deadline = deadline
+        self.retry = retry or RetryPolicy()
+        self.hedge = hedge
+
+        self.stats = collections.Counter()
+        self.latencies = collections.deque(maxlen=200)
+
+        # requests are sent by priority when more are ready than there are
+        # connections (see priority.prioritized)
+        self.default_priority = priority
+        self.admission = Admission(pool_size)
+        self.waits = Waits()
 
         self.scopes = [ "user:read:follows" ]
 
@@ -73,8 +156,7 @@ class Helix:
                 hdr["Accept"] = "application/json"
 
                 req = requests.Request("GET", this.validate_url, headers=hdr)
-                preq = this.session.prepare_request(req)
-                rsp = this.session.send(preq, timeout=this.timeout)
+                rsp = this.send(req)
                 if rsp.status_code == requests.codes.unauthorized:
                     return False
                 rsp.raise_for_status()
@@ -94,13 +176,170 @@ class Helix:
                     },
                 )
 
-        self._token = OAuth().get_token(force=force)
+        if self.shared is not None and force is not True:
+            self._token = self.shared.token()
+        if self._token is None:
+            self._token = OAuth().get_token(force=force)
+            if self.shared is not None:
+                self.shared.set_token(self._token)
         self.session.headers.update(self.build_headers(token=self._token.value))
         return self
 
     def log_request(self, req):
         logger.debug("request: %s %s %s", req.method, req.url, req.params)
 
+    def log_stats(self):
+        if self.stats:
+            logger.info("helix stats: %s", dict(self.stats))
+            logger.info("transport stats: %s", self.transport.stats())
+            logger.info("queue waits: %s", self.waits.summary())
+
+    @property
+    def priority(self) -> Priority:
+        p = current_priority.get()
+        return p if p is not None else self.default_priority
+
+    def hedge_after(self) -> float | None:
+        if not self.hedge or len(self.latencies) < 20:
+            return None
+        return statistics.quantiles(self.latencies, n=20)[-1]
+
+    def _send_once(self, preq: requests.PreparedRequest, timeout: float) -> requests.Response:
+        def go():
+            with span(preq.path_url, "http", method=preq.method) as sargs:
+                t0 = time.monotonic()
+                rsp = self.transport.send(preq, timeout)
+                self.latencies.append(time.monotonic() - t0)
+                sargs["status"] = rsp.status_code
+            return rsp
+
+        self.stats["requests"] += 1
+        p95 = self.hedge_after() if preq.method == "GET" else None
+        if p95 is None or p95 >= timeout:
+            return go()
+
+        first = _spawn(go)
+        try:
+            return first.result(timeout=p95)
+        except concurrent.futures.TimeoutError:
+            pass
+
+        logger.debug("hedging request (p95=%.3fs): %s", p95, preq.url)
+        self.stats["requests"] += 1
+        self.stats["hedges"] += 1
+        second = _spawn(go)
+
+        pending = { first, second }
+        while pending:
+            done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+            for d in done:
+                if d.exception() is None:
+                    if d is second:
+                        self.stats["hedge_wins"] += 1
+                    for p in pending:
+                        p.add_done_callback(lambda p: p.exception() is None and p.result().close())
+                    return d.result()
+        return first.result()
+
+    def sleep(self, secs: float):
+        if self.deadline is not None and secs >= self.deadline.remaining():
+            raise DeadlineExceeded(self.deadline.budget)
+        time.sleep(secs)
+
+    def acquire(self, p=Priority.INTERACTIVE):
+        while True:
+            now = time.time()
+            if self.shared is not None:
+                observed, self.observed = self.observed, None
+                wait = self.shared.acquire(now, p, observed)
+            elif self.ratelimit is not None:
+                wait = self.ratelimit.acquire(now, p)
+            else:
+                return
+
+            if wait <= 0:
+                return
+
+            logger.info("rate limit budget exhausted (%s); waiting %.3fs", p, wait)
+            self.stats["throttled"] += 1
+            with span("throttled", "helix"):
+                self.sleep(wait)
+
+    # wait for one of the connections
+    def admit(self, p: Priority):
+        if self.admission.acquire(p, timeout=0):
+            return
+        self.stats[f"queued_{p}"] += 1
+        with span("queued", "helix", priority=str(p)):
+            timeout = self.deadline.remaining() if self.deadline is not None else None
+            if not self.admission.acquire(p, timeout=timeout):
+                assert self.deadline is not None
+                raise DeadlineExceeded(self.deadline.budget)
+
+    def update_ratelimit(self, rsp: requests.Response):
+        r = RateLimit.from_headers(rsp.headers)
+        if r is None:
+            return
+        if rsp.status_code == 429:
+            r.remaining = 0
+        self.ratelimit = r
+        if self.shared is not None:
+            self.observed = r
+
+    def share_ratelimit(self):
+        observed, self.observed = self.observed, None
+        if self.shared is not None and observed is not None:
+            self.shared.set_ratelimit(observed)
+
+    @traced("helix")
+    def send(self, req: requests.Request) -> requests.Response:
+        preq = self.session.prepare_request(req)
+        attempts = self.retry.attempts if preq.method == "GET" else 1
+
+        p, attempt = self.priority, 0
+        while True:
+            # retries queue (and wait for the budget) like any request
+            t0 = time.monotonic()
+            self.acquire(p)
+            self.admit(p)
+            self.waits.add(p, time.monotonic() - t0)
+
+            try:
+                timeout = self.timeout
+                if self.deadline is not None:
+                    timeout = self.deadline.timeout(timeout)
+
+                rsp = self._send_once(preq, timeout)
+                self.update_ratelimit(rsp)
+                throttled = rsp.status_code == 429 and self.ratelimit is not None and self.ratelimit.reset > time.time()
+                if not throttled and rsp.status_code not in self.retry.statuses:
+                    return rsp
+                err = None
+            except requests.exceptions.Timeout as e:
+                if self.deadline is not None and self.deadline.expired:
+                    raise DeadlineExceeded(self.deadline.budget) from e
+                rsp, err, throttled = None, e, False
+            except requests.exceptions.ConnectionError as e:
+                rsp, err, throttled = None, e, False
+            finally:
+                self.admission.release()
+
+            # throttled requests weren't processed, whatever their method,
+            # and are sent again once acquire() has waited for the reset
+            attempt += 1
+            limit = self.retry.attempts if throttled else attempts
+            delay = 0 if throttled else self.retry.backoff(attempt)
+            if attempt >= limit or (self.deadline is not None and delay >= self.deadline.remaining()):
+                if err is not None:
+                    raise err
+                assert rsp is not None
+                return rsp
+
+            logger.debug("retrying (%d/%d) in %.3fs: %s: %s", attempt, limit - 1, delay, preq.url, err or rsp.status_code)
+            self.stats["retries"] += 1
+            with span("backoff", "helix", attempt=attempt):
+                self.sleep(delay)
+
     def req(self, method, path, params=None, body=None):
         hdr = {
             "Accept": "application/json",
@@ -108,14 +347,17 @@ class Helix:
         req = requests.Request(method, self.base_url + path, headers=hdr, params=params, json=body)
         self.log_request(req)
 
-        preq = self.session.prepare_request(req)
-        rsp = self.session.send(preq, timeout=self.timeout)
-        if rsp.status_code == 429:
-            raise NotImplementedError(rsp)
+        rsp = self.send(req)
         rsp.raise_for_status()
         return rsp.json()
 
     def paginate(self, path, params, page_size=None):
+        for ds, _ in self.pages(path, params, page_size=page_size):
+            yield from ds
+
+    # the data of each page along with the cursor of the next one (None
+    # after the last page), starting after the cursor after
+    def pages(self, path, params, page_size=None, after=None):
         hdr = {
             "Accept": "application/json",
         }
@@ -137,21 +379,19 @@ class Helix:
 
             return requests.Request("GET", self.base_url + path, headers=hdr, params=qs)
 
-        after = None
+        page = 0
         while True:
             req = build(after)
             self.log_request(req)
-            preq = self.session.prepare_request(req)
-            rsp = self.session.send(preq, timeout=self.timeout)
-            rsp.raise_for_status()
-            j = rsp.json()
-
-            for d in j["data"]:
-                yield d
+            with span(path, "page", page=page) as sargs:
+                rsp = self.send(req)
+                rsp.raise_for_status()
+                j = rsp.json()
+                sargs["items"] = len(j["data"])
+            page += 1
 
-            p = j.get("pagination")
-            if p is None:
-                break
-            after = p.get("cursor")
+            # an empty page sometimes comes with a cursor
+            after = (j.get("pagination") or {}).get("cursor") if j["data"] else None
+            yield j["data"], after
             if after is None:
                 break
@@ -0,0 +1,229 @@
+import contextlib
+import fcntl
+import json
+import math
+import os
+from dataclasses import dataclass
+from datetime import datetime, timedelta, UTC
+from typing import Iterable
+
+from . import util
+from .model import *
+
+import logging
+logger = logging.getLogger(__name__)
+
+# how far back likelihood looks: sessions that ended before then are dropped
+DAYS = 28
+
+@dataclass
+class Session:
+    stream_id: str
+    started_at: datetime
+    ended_at: datetime | None = None
+
+# append-only log of observed stream start/stop events, and the (mutable)
+# last time each user was polled. The log is rewritten without the sessions
+# that ended too long ago to matter once they make up a good part of it.
+class History:
+    def __init__(self, path=None, polled_path=None, now: datetime | None = None):
+        self.path = path or util.state_path("history.ndjson")
+        self.polled_path = polled_path or util.state_path("polled.json")
+
+        self.sessions: dict[str, list[Session]] = {}
+        self.logins: dict[str, str] = {}
+        self.polled: dict[str, datetime] = {}
+        # which log was loaded, and up to where
+        self.inode: int | None = None
+        self.offset = 0
+
+        # the events in the log, and how many of them belong to dropped sessions
+        self.events = self._load()
+        self.dropped = 0
+        self.expire(now or datetime.now(UTC))
+
+        try:
+            with open(self.polled_path) as f:
+                self.polled = { k: datetime.fromisoformat(v) for k, v in json.load(f).items() }
+        except FileNotFoundError:
+            pass
+
+    @contextlib.contextmanager
+    def _locked(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path + ".lock", "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    # the number of events read
+    def _load(self) -> int:
+        self.sessions, self.logins = {}, {}
+        logger.debug("loading history from: %s", self.path)
+        n = 0
+        try:
+            with open(self.path, "rb") as f:
+                self.inode = os.fstat(f.fileno()).st_ino
+                for l in f:
+                    self._apply(json.loads(l))
+                    n += 1
+                self.offset = f.tell()
+        except FileNotFoundError:
+            self.inode, self.offset = None, 0
+        return n
+
+    # apply what concurrent invocations have appended since the log was
+    # loaded, or load it again if one of them rewrote it; a long-lived
+    # instance only reads what's new
+    def _catch_up(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return
+        if st.st_ino != self.inode or st.st_size < self.offset:
+            self.events, self.dropped = self._load(), 0
+            return
+        if st.st_size == self.offset:
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self.offset)
+            for l in f:
+                self._apply(json.loads(l))
+                self.events += 1
+            self.offset = f.tell()
+
+    # forget the sessions that ended more than DAYS ago, returning how many
+    def _forget(self, now: datetime) -> int:
+        n = 0
+        for k, ss in list(self.sessions.items()):
+            keep = [ s for s in ss if s.ended_at is None or now - s.ended_at < timedelta(days=DAYS) ]
+            n += len(ss) - len(keep)
+            if keep:
+                self.sessions[k] = keep
+            else:
+                del self.sessions[k]
+                self.logins.pop(k, None)
+        return n
+
+    # forget old sessions, and compact the log once their (start and stop)
+    # events make up a quarter of it
+    def expire(self, now: datetime):
+        self.dropped += 2 * self._forget(now)
+        if self.dropped and self.dropped * 4 >= self.events:
+            self.compact(now)
+
+    def _events(self) -> Iterable[dict]:
+        for k, ss in self.sessions.items():
+            for s in ss:
+                e = { "event": "start", "user_id": k, "stream_id": s.stream_id, "at": s.started_at.isoformat() }
+                if k in self.logins:
+                    e["user_login"] = self.logins[k]
+                yield e
+                if s.ended_at is not None:
+                    yield { "event": "stop", "user_id": k, "stream_id": s.stream_id, "at": s.ended_at.isoformat() }
+
+    # rewrite the log without the sessions that ended too long ago, including
+    # what concurrent invocations have appended since it was loaded
+    def compact(self, now: datetime):
+        with self._locked():
+            n, self.dropped = self._load(), 0
+            self._forget(now)
+            es = list(self._events())
+            with util.write_atomically(self.path) as f:
+                for e in es:
+                    f.write(json.dumps(e) + "\n")
+            st = os.stat(self.path)
+            self.events, self.inode, self.offset = len(es), st.st_ino, st.st_size
+        logger.info("compacted history from %d to %d events: %s", n, len(es), self.path)
+
+    def _apply(self, e):
+        ss = self.sessions.setdefault(e["user_id"], [])
+        match e["event"]:
+            case "start":
+                if "user_login" in e:
+                    self.logins[e["user_id"]] = e["user_login"]
+                ss.append(Session(
+                    stream_id = e["stream_id"],
+                    started_at = datetime.fromisoformat(e["at"]),
+                ))
+            case "stop":
+                for s in reversed(ss):
+                    if s.stream_id == e["stream_id"]:
+                        s.ended_at = datetime.fromisoformat(e["at"])
+                        break
+            case ev:
+                logger.warning("unexpected history event: %s", ev)
+
+    def open_session(self, user_id: str) -> Session | None:
+        ss = self.sessions.get(user_id)
+        if ss and ss[-1].ended_at is None:
+            return ss[-1]
+
+    def open_users(self) -> list[User]:
+        return [ User(id=k, login=self.logins.get(k)) for k in self.sessions if self.open_session(k) is not None ]
+
+    def observe(self, polled: Iterable[User], streams: Iterable[Stream], now: datetime):
+        live = { s.user.id: s for s in streams }
+        with self._locked():
+            self._catch_up()
+            es = []
+            for u in polled:
+                s = live.get(u.id)
+                o = self.open_session(u.id)
+                if o is not None and (s is None or s.id != o.stream_id):
+                    es.append({ "event": "stop", "user_id": u.id, "stream_id": o.stream_id, "at": now.isoformat() })
+                if s is not None and (o is None or s.id != o.stream_id):
+                    es.append({ "event": "start", "user_id": u.id, "user_login": s.user.login, "stream_id": s.id, "at": s.started_at.isoformat() })
+                self.polled[u.id] = now
+
+            if es:
+                logger.debug("appending %d events to history: %s", len(es), self.path)
+                with open(self.path, "ab") as f:
+                    if self.inode is None:
+                        self.inode = os.fstat(f.fileno()).st_ino
+                    for e in es:
+                        self._apply(e)
+                        f.write(json.dumps(e).encode("UTF-8") + b"\n")
+                    self.offset = f.tell()
+                self.events += len(es)
+        self.expire(now)
+
+        with util.write_atomically(self.polled_path) as f:
+            json.dump({ k: v.isoformat() for k, v in self.polled.items() }, f)
+
+    # weighted fraction of the previous days on which the user was live
+    # during the upcoming horizon (at the same time of day)
+    def likelihood(self, user_id: str, now: datetime, horizon=timedelta(minutes=30), days=DAYS, decay=0.9) -> float:
+        if self.open_session(user_id) is not None:
+            return 1.0
+
+        day = timedelta(days=1)
+        hits = set()
+        for s in self.sessions.get(user_id, []):
+            # the window [now - d, now - d + horizon) overlaps the session iff
+            # (now - ended_at) < d < (now + horizon - started_at), in days
+            lo = math.floor((now - (s.ended_at or now)) / day) + 1
+            hi = math.ceil((now + horizon - s.started_at) / day) - 1
+            hits.update(range(max(lo, 1), min(hi, days) + 1))
+
+        if not hits:
+            return 0.0
+
+        total = sum(decay ** (d - 1) for d in range(1, days + 1))
+        return sum(decay ** (d - 1) for d in hits) / total
+
+class Scheduler:
+    def __init__(self, history: History, max_period=timedelta(hours=1)):
+        self.history = history
+        self.max_period = max_period
+
+    def period(self, user_id: str, now: datetime) -> timedelta:
+        p = self.history.likelihood(user_id, now)
+        return self.max_period * (1 - p) ** 2
+
+    def due(self, users: Iterable[User], now: datetime) -> list[User]:
+        ds = []
+        for u in users:
+            t = self.history.polled.get(u.id)
+            if t is None or now - t >= self.period(u.id, now):
+                ds.append(u)
+        return ds
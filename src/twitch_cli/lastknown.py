@@ -0,0 +1,120 @@
+import os
+import pickle
+import subprocess
+import sys
+import threading
+from datetime import datetime, timedelta, UTC
+from typing import Any, Callable
+
+import requests
+
+from . import env, env_prefix, util
+from .model import *
+
+import logging
+logger = logging.getLogger(__name__)
+
+# the last known answers to queries, and when they were fetched, so that
+# commands can answer without (or before) talking to Helix
+class LastKnown:
+    def __init__(self, name: str, path=None, max_age=timedelta(days=30)):
+        self.path = path or util.state_path("lastknown", f"{name}.pickle")
+        self.max_age = max_age
+        self._entries: dict[str, tuple[Any, datetime]] | None = None
+        self.dirty: dict[str, tuple[Any, datetime]] = {}
+        # as a sink, it's called from the server's handler threads
+        self.lock = threading.Lock()
+
+    # only read when first asked for: most invocations that remember things
+    # never look anything up
+    @property
+    def entries(self) -> dict[str, tuple[Any, datetime]]:
+        if self._entries is None:
+            self._entries = self._load()
+        return self._entries
+
+    def _load(self) -> dict[str, tuple[Any, datetime]]:
+        try:
+            with open(self.path, "rb") as f:
+                return pickle.load(f)
+        except FileNotFoundError:
+            return {}
+        except Exception as e:
+            logger.debug("ignoring unreadable last known data (%s): %s", e, self.path)
+            return {}
+
+    def get(self, key: str) -> tuple[Any, datetime] | None:
+        e = self.dirty.get(key)
+        return e if e is not None else self.entries.get(key)
+
+    def put(self, key: str, value, at: datetime | None = None):
+        with self.lock:
+            self.dirty[key] = (value, at or datetime.now(UTC))
+
+    # as a sink: remember decoded videos by id
+    def __call__(self, x: Stream | Video):
+        if isinstance(x, Video):
+            self.put(x.id, x)
+
+    # merge with what concurrent invocations have saved since we loaded
+    def save(self):
+        with self.lock:
+            dirty, self.dirty = self.dirty, {}
+        if not dirty:
+            return
+        now = datetime.now(UTC)
+        es = self._load()
+        for k, e in dirty.items():
+            if k not in es or es[k][1] <= e[1]:
+                es[k] = e
+        es = { k: e for k, e in es.items() if now - e[1] < self.max_age }
+        with util.write_atomically(self.path, "wb") as f:
+            pickle.dump(es, f, protocol=pickle.HIGHEST_PROTOCOL)
+        self._entries = es
+
+# set in the environment of a background revalidation
+def revalidating() -> bool:
+    return env("REVALIDATE") is not None
+
+def revalidate():
+    logger.info("revalidating in the background: %s", sys.argv)
+    subprocess.Popen(
+        [ sys.executable, *sys.argv ],
+        env = os.environ | { f"{env_prefix}REVALIDATE": "1" },
+        stdin = subprocess.DEVNULL, stdout = subprocess.DEVNULL,
+        start_new_session = True,
+    )
+
+# fetch and remember, unless asked to answer from the last known data:
+# --offline never fetches and --stale-while-revalidate answers from data
+# younger than the given age while a background invocation fetches. When
+# Helix can't be reached the last known data is used as well. Returns the
+# value and, if it wasn't just fetched, when it was.
+def last_known[A](args, known: tuple[A, datetime] | None, fetch: Callable[[], A], remember: Callable[[A], None]) -> tuple[A | None, datetime | None]:
+    if args.offline:
+        return known or (None, None)
+
+    swr = args.stale_while_revalidate
+    if known is not None and swr and not revalidating() and datetime.now(UTC) - known[1] < swr:
+        revalidate()
+        return known
+
+    try:
+        v = fetch()
+    except (requests.exceptions.ConnectionError, requests.exceptions.Timeout) as e:
+        if known is None:
+            raise
+        logger.warning("unable to reach Helix; using data from %s: %s", known[1], e)
+        return known
+
+    remember(v)
+    return v, None
+
+def staleness(args, at: datetime | None, now: datetime) -> str | None:
+    if args.offline and at is None:
+        return "(offline: nothing known)"
+    if at is None:
+        return None
+    age = util.render_duration(now - at, short=True) or "0s"
+    what = "offline" if args.offline else "stale"
+    return f"({what}: as of {age} ago)"
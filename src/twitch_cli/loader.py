@@ -0,0 +1,100 @@
+import concurrent.futures
+import contextvars
+import threading
+from typing import Callable, Hashable, Iterable
+
+from .tracing import span
+
+import logging
+logger = logging.getLogger(__name__)
+
+# collapses concurrent lookups of the same key into one, and gathers the
+# keys requested within a short window into batches
+# (in the spirit of https://github.com/graphql/dataloader)
+class Loader[K: Hashable, V]:
+    def __init__(self, batch: Callable[[list[K]], dict[K, V]], max_batch=100, window=0.005, name=None):
+        self.batch = batch
+        self.max_batch = max_batch
+        self.window = window
+        self.name = name or getattr(batch, "__name__", "loader")
+
+        self.lock = threading.Lock()
+        self.inflight: dict[K, concurrent.futures.Future[V | None]] = {}
+        self.pending: list[K] = []
+        self.timer: threading.Timer | None = None
+
+        self.stats = { "loads": 0, "coalesced": 0, "batches": 0 }
+
+    def load(self, key: K) -> concurrent.futures.Future[V | None]:
+        with self.lock:
+            self.stats["loads"] += 1
+            f = self.inflight.get(key)
+            if f is not None:
+                self.stats["coalesced"] += 1
+                return f
+
+            f = self.inflight[key] = concurrent.futures.Future()
+            self.pending.append(key)
+            if len(self.pending) >= self.max_batch:
+                ks = self._take()
+            else:
+                ks = None
+                if self.timer is None:
+                    # batches are sent in the context (e.g. with the
+                    # priority) of the load that started them
+                    self.timer = threading.Timer(self.window, contextvars.copy_context().run, args=(self.flush,))
+                    self.timer.daemon = True
+                    self.timer.start()
+
+        if ks:
+            threading.Thread(target=contextvars.copy_context().run, args=(self._dispatch, ks), daemon=True).start()
+        return f
+
+    def _take(self) -> list[K]:
+        ks, self.pending = self.pending[:self.max_batch], self.pending[self.max_batch:]
+        if not self.pending and self.timer is not None:
+            self.timer.cancel()
+            self.timer = None
+        return ks
+
+    # dispatch everything pending in the calling thread
+    def flush(self):
+        while True:
+            with self.lock:
+                if self.timer is not None and threading.current_thread() is self.timer:
+                    self.timer = None
+                ks = self._take()
+            if not ks:
+                return
+            self._dispatch(ks)
+
+    def _dispatch(self, ks: list[K]):
+        logger.debug("%s: dispatching batch of %d", self.name, len(ks))
+        with self.lock:
+            self.stats["batches"] += 1
+            fs = [ self.inflight[k] for k in ks ]
+
+        try:
+            with span(self.name, "batch", keys=len(ks)):
+                r = self.batch(ks)
+        except BaseException as e:
+            rs, exc = {}, e
+        else:
+            rs, exc = r, None
+
+        with self.lock:
+            for k in ks:
+                del self.inflight[k]
+
+        for k, f in zip(ks, fs):
+            if exc is not None:
+                f.set_exception(exc)
+            else:
+                f.set_result(rs.get(k))
+
+    # load and wait for all keys, without waiting for the window to close
+    def load_many(self, keys: Iterable[K]) -> dict[K, concurrent.futures.Future[V | None]]:
+        fs = { k: self.load(k) for k in dict.fromkeys(keys) }
+        self.flush()
+        concurrent.futures.wait(fs.values())
+        return fs
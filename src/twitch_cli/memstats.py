@@ -0,0 +1,78 @@
+import os
+import resource
+import signal
+import sys
+import tracemalloc
+from datetime import datetime, UTC
+
+from . import util
+
+import logging
+logger = logging.getLogger(__name__)
+
+SIGNAL = signal.SIGUSR2
+
+# resident set size in bytes: current when /proc is around, peak otherwise
+def rss() -> int:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        r = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return r if sys.platform == "darwin" else r * 1024
+
+def mib(n: float) -> str:
+    return f"{n / 1024 / 1024:.1f}MiB"
+
+# allocations traced since a baseline snapshot: what grew the most, by the
+# line that allocated it
+class MemStats:
+    def __init__(self, frames=1):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(frames)
+        self.baseline = self.snapshot()
+        self.started_at = datetime.now(UTC)
+
+    @staticmethod
+    def snapshot() -> tracemalloc.Snapshot:
+        return tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap*>"),
+        ])
+
+    def growth(self, snapshot: tracemalloc.Snapshot | None = None, baseline: tracemalloc.Snapshot | None = None) -> list[tracemalloc.StatisticDiff]:
+        snapshot = snapshot or self.snapshot()
+        return snapshot.compare_to(baseline or self.baseline, "lineno")
+
+    def report(self, limit=10, snapshot: tracemalloc.Snapshot | None = None, baseline: tracemalloc.Snapshot | None = None) -> str:
+        current, peak = tracemalloc.get_traced_memory()
+        ls = [
+            f"since {self.started_at.isoformat(timespec='seconds')}: rss {mib(rss())}, traced {mib(current)} (peak {mib(peak)})",
+            "top growing allocation sites:",
+        ]
+        # compare_to orders by the size of the difference, shrinking included
+        grown = [ d for d in self.growth(snapshot, baseline) if d.size_diff > 0 ]
+        for d in grown[:limit]:
+            f = d.traceback[0]
+            ls.append(f"  {d.size_diff / 1024:+10.1f}KiB {d.count_diff:+8} blocks  {f.filename}:{f.lineno}")
+        return "\n".join(ls) + "\n"
+
+    # the path the report is written to when the process is signalled
+    @staticmethod
+    def path() -> str:
+        return util.state_path("memstats", f"{os.getpid()}.txt")
+
+    def dump(self):
+        p = self.path()
+        with util.write_atomically(p) as f:
+            f.write(self.report())
+        logger.warning("memory stats written to: %s", p)
+
+memstats: MemStats | None = None
+
+# trace allocations from now on, and dump a report when signalled
+def enable():
+    global memstats
+    memstats = MemStats()
+    signal.signal(SIGNAL, lambda *_: memstats and memstats.dump())
+    logger.info("kill -%s %d to write memory stats to: %s", SIGNAL.name, os.getpid(), MemStats.path())
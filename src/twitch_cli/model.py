@@ -44,6 +44,19 @@ class Video:
            published_at = datetime.fromisoformat(j["published_at"]),
        )
 
+    def to_twitch_json(self):
+        return {
+            "id": self.id,
+            "title": self.title,
+            "user_id": self.user.id,
+            "user_login": self.user.login,
+            "user_name": self.user.name,
+            "url": self.url,
+            "duration": util.render_duration(self.duration) or "0s",
+            "created_at": self.created_at.isoformat(),
+            "published_at": self.published_at.isoformat(),
+        }
+
 @dataclass(unsafe_hash=True)
 class Game:
     id: str
@@ -60,6 +73,35 @@ class Stream:
     started_at: datetime = field(compare=False)
     game: Game = field(compare=False)
 
+    @classmethod
+    def from_twitch_json(cls, j):
+        return cls(
+            id = j["id"],
+            title = j["title"],
+            user = User(
+                id = j["user_id"],
+                login = j["user_login"],
+                name = j["user_name"],
+            ),
+            started_at = datetime.fromisoformat(j["started_at"]),
+            game = Game(
+                id = j["game_id"],
+                name = j["game_name"],
+            ),
+        )
+
+    def to_twitch_json(self):
+        return {
+            "id": self.id,
+            "title": self.title,
+            "user_id": self.user.id,
+            "user_login": self.user.login,
+            "user_name": self.user.name,
+            "started_at": self.started_at.isoformat(),
+            "game_id": self.game.id,
+            "game_name": self.game.name,
+        }
+
     @property
     def url(self) -> str:
         assert self.user.login is not None
@@ -0,0 +1,37 @@
+import math
+from datetime import timedelta
+
+DEFAULT_PAGE_SIZE = 10
+MAX_PAGE_SIZE = 100
+
+# how much an observation moves a channel's estimated publication rate
+RATE_ALPHA = 0.5
+# room for bursts above the estimated rate
+SLACK = 1.5
+
+# the narrowest /videos period covering window, if any: videos created
+# before it are not even listed
+PERIODS = [ ("day", timedelta(days=1)), ("week", timedelta(days=7)), ("month", timedelta(days=30)) ]
+
+def period(window: timedelta) -> str | None:
+    for p, d in PERIODS:
+        if window <= d:
+            return p
+    return None
+
+# a page expected to hold the videos published within window by a channel
+# publishing rate videos a day, and one more: seeing a video older than the
+# window (or the end of the list) is what ends the pagination
+def page_size(rate: float | None, window: timedelta) -> int:
+    if rate is None:
+        return DEFAULT_PAGE_SIZE
+    expected = rate * window / timedelta(days=1)
+    return max(1, min(MAX_PAGE_SIZE, math.ceil(expected * SLACK) + 1))
+
+# the publication rate (videos a day) given a previous estimate and the
+# number of videos observed within window
+def rate(previous: float | None, n: int, window: timedelta) -> float:
+    r = n / max(window / timedelta(days=1), 1 / 24)
+    if previous is None:
+        return r
+    return RATE_ALPHA * r + (1 - RATE_ALPHA) * previous
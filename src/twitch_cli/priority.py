@@ -0,0 +1,88 @@
+import contextlib
+import contextvars
+import enum
+import heapq
+import itertools
+import threading
+
+import logging
+logger = logging.getLogger(__name__)
+
+class Priority(enum.IntEnum):
+    # someone is waiting for the answer
+    INTERACTIVE = 0
+    # sweeps, refreshes and backfills
+    BACKGROUND = 1
+
+    def __str__(self):
+        return self.name.lower()
+
+# the priority of the requests sent by the current thread (or task), when
+# it differs from the Helix's
+current: contextvars.ContextVar[Priority | None] = contextvars.ContextVar("priority", default=None)
+
+@contextlib.contextmanager
+def prioritized(p: Priority):
+    t = current.set(p)
+    try:
+        yield
+    finally:
+        current.reset(t)
+
+# a limited number of slots, handed out by priority and then in order of
+# arrival: interactive requests overtake background requests already
+# waiting, but never preempt one that holds a slot
+class Admission:
+    def __init__(self, slots: int):
+        self.slots = slots
+        self.busy = 0
+        self.waiting: list[tuple[Priority, int]] = []
+        self.seq = itertools.count()
+        self.cond = threading.Condition()
+
+    # False if no slot was available within timeout
+    def acquire(self, p: Priority, timeout: float | None = None) -> bool:
+        with self.cond:
+            if self.busy < self.slots and not self.waiting:
+                self.busy += 1
+                return True
+
+            me = (p, next(self.seq))
+            heapq.heappush(self.waiting, me)
+            ok = self.cond.wait_for(lambda: self.busy < self.slots and self.waiting[0] == me, timeout)
+            if ok:
+                heapq.heappop(self.waiting)
+                self.busy += 1
+            else:
+                self.waiting.remove(me)
+                heapq.heapify(self.waiting)
+            # whoever is next might fit as well
+            self.cond.notify_all()
+            return ok
+
+    def release(self):
+        with self.cond:
+            self.busy -= 1
+            self.cond.notify_all()
+
+# how long the requests of each priority waited to be sent: for a slot, and
+# for the rate limit budget
+class Waits:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.n: dict[Priority, int] = {}
+        self.total: dict[Priority, float] = {}
+        self.max: dict[Priority, float] = {}
+
+    def add(self, p: Priority, secs: float):
+        with self.lock:
+            self.n[p] = self.n.get(p, 0) + 1
+            self.total[p] = self.total.get(p, 0) + secs
+            self.max[p] = max(self.max.get(p, 0), secs)
+
+    def summary(self) -> dict[str, str]:
+        with self.lock:
+            return {
+                str(p): f"n={n} mean={self.total[p] / n * 1000:.1f}ms max={self.max[p] * 1000:.1f}ms"
+                for p, n in sorted(self.n.items())
+            }
@@ -0,0 +1,175 @@
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, UTC
+
+from . import util
+from .app import App, render_table_of_streams, render_table_of_videos
+from .client import notify
+from .config import Configurable, Filter, Lists, Profiles
+from .history import History
+from .server import Cached
+from .table import Table
+from .model import *
+
+import logging
+logger = logging.getLogger(__name__)
+
+# a configuration rendered by a runner: which channels (the ones selected
+# by its lists and channels, or the followed ones that pass its filter),
+# and where and how to render them
+@dataclass(eq=False)
+class Profile:
+    name: str
+    output: str
+    lists: Lists
+    filter: Filter | None = None
+    selected: list[str] = field(default_factory=list)
+    channels: list[str] = field(default_factory=list)
+    title_width: int | None = None
+    since: timedelta = timedelta(days=3)
+    # distinguishes the files of profiles sharing an output directory
+    suffix: str = ""
+
+    # configurations shared by several profiles are loaded (and watched) once
+    @classmethod
+    def from_config(cls, name: str, c: dict, configs: dict[tuple[type, str | None], Configurable]) -> "Profile":
+        def load[A: Configurable](k: type[A], path: str | None) -> A:
+            path = os.path.expanduser(path) if path else None
+            if (k, path) not in configs:
+                configs[(k, path)] = k(path=path).watch()
+            return configs[(k, path)]
+
+        return cls(
+            name = name,
+            output = os.path.expanduser(c.get("output") or util.state_path("profiles", name)),
+            lists = load(Lists, c.get("lists")),
+            filter = None if c.get("no_filter") else load(Filter, c.get("filter")),
+            selected = c.get("list") or [],
+            channels = c.get("channel") or [],
+            title_width = c.get("title_width"),
+            since = util.parse_duration(c["since"]) if c.get("since") else cls.since,
+        )
+
+    # whether the profile renders the followed channels, rather than the
+    # channels it selects (which may well be none)
+    def following(self) -> bool:
+        return not self.selected and not self.channels
+
+    # the explicitly selected channels
+    def logins(self) -> set[str]:
+        ls = { c.lower() for c in self.channels }
+        for l in self.selected:
+            ls |= { c.lower() for c in self.lists[l] }
+        return ls
+
+    def write(self, kind: str, table: Table):
+        path = os.path.join(self.output, f"{kind}{self.suffix}.twitch")
+        with util.write_atomically(path) as f:
+            table.write(f)
+            os.fchmod(f.fileno(), 0o444)
+        notify(path)
+        logger.debug("wrote %s: %s", self.name, path)
+
+def load_profiles(path=None) -> list[Profile]:
+    configs = {}
+    return [ Profile.from_config(k, c, configs) for k, c in Profiles(path=path).items() ]
+
+# renders the live streams and recent videos of several profiles from one
+# sweep of the union of their channels: the requests made scale with the
+# distinct channels, not with the profiles
+class Runner:
+    def __init__(self, app: App, profiles: list[Profile]):
+        self.app = app
+        self.profiles = profiles
+        self.following: Cached[set[User]] | None = None
+        # loaded once: every tick only reads what was appended since
+        self.history = History()
+
+    def _following(self) -> set[User]:
+        if self.following is None or not self.following.fresh(timedelta(hours=1)):
+            self.following = Cached(self.app.following(self.app.me))
+        return self.following.value
+
+    # the channels /streams/followed answered for: the ones it returned and,
+    # once the followed channels have been fetched (for the videos), the
+    # ones that aren't live; the follows aren't paged through just for this
+    def _answered(self, followed: set[Stream]) -> set[str]:
+        ls = { (s.user.login or "").lower() for s in followed }
+        if self.following is not None and self.following.fresh(timedelta(hours=1)):
+            ls |= { u.login.lower() for u in self.following.value if u.login }
+        return ls
+
+    def live(self):
+        app, now = self.app, datetime.now(UTC)
+        app.missing.clear()
+        logins = { p: p.logins() for p in self.profiles }
+        wanted = set().union(*logins.values())
+
+        followed: set[Stream] = set()
+        if any(p.following() for p in self.profiles):
+            followed = app.streams_followed()
+            self.history.observe([ s.user for s in followed ] + self.history.open_users(), followed, now)
+            wanted -= self._answered(followed)
+        ss = followed | (app.streams_by_login(wanted) if wanted else set())
+        logger.info("live: %d streams of %d profiles", len(ss), len(self.profiles))
+
+        live = { (s.user.login or "").lower(): s for s in ss }
+        missing_by_login = { (u.login or "").lower(): u for u in app.missing }
+        for p, ls in logins.items():
+            if p.following():
+                xs = { s for s in followed if p.filter is None or p.filter.user(s.user) }
+                missing = set()
+            else:
+                xs = { live[l] for l in ls if l in live }
+                missing = { missing_by_login[l] for l in ls if l in missing_by_login }
+            if p.filter is not None:
+                xs = filter(p.filter.stream, xs)
+            xs = sorted(xs, key=lambda s: s.started_at, reverse=True)
+            p.write("live", render_table_of_streams(xs, missing, width=p.title_width, now=now))
+        app.flush()
+
+    def videos(self):
+        app, now = self.app, datetime.now(UTC)
+        app.missing.clear()
+        logins = { p: p.logins() for p in self.profiles }
+        wanted = set().union(*logins.values())
+        resolved = { (u.login or "").lower(): u for u in app.users(logins=wanted) } if wanted else {}
+
+        users: dict[Profile, set[User]] = {}
+        for p, ls in logins.items():
+            if p.following():
+                users[p] = { u for u in self._following() if p.filter is None or p.filter.user(u) }
+            else:
+                users[p] = { resolved[l] for l in ls if l in resolved }
+
+        since: dict[User, datetime] = {}
+        for p, us in users.items():
+            for u in us:
+                since[u] = min(since.get(u, now), now - p.since)
+        logger.info("videos: %d channels of %d profiles", len(since), len(self.profiles))
+        vs = { u: app.videos_by_user(u, since=s) for u, s in since.items() }
+
+        for p, us in users.items():
+            xs = { v for u in us for v in vs[u] if v.published_at >= now - p.since }
+            if p.filter is not None:
+                xs = { v for v in xs if p.filter.video(v) }
+            ys: list[Video | User] = sorted(xs, key=lambda v: v.published_at, reverse=True)
+            # including the channels that couldn't be resolved
+            ys += sorted({ u for u in app.missing if u in us or (u.login or "").lower() in logins[p] }, key=str)
+            p.write("videos", render_table_of_videos(ys, width=p.title_width))
+        app.flush()
+
+    def run_forever(self, live_period: timedelta, videos_period: timedelta):
+        tasks = [ (self.live, live_period), (self.videos, videos_period) ]
+        due = [ time.monotonic() ] * len(tasks)
+        while True:
+            for i, (f, period) in enumerate(tasks):
+                if due[i] > time.monotonic():
+                    continue
+                try:
+                    f()
+                except Exception:
+                    logger.exception("unable to refresh: %s", f.__name__)
+                due[i] = time.monotonic() + period.total_seconds()
+            time.sleep(max(0, min(due) - time.monotonic()))
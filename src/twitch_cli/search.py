@@ -0,0 +1,179 @@
+import array
+import hashlib
+import json
+import os
+import pickle
+import threading
+from dataclasses import dataclass
+from datetime import datetime, UTC
+
+from . import util
+from .model import *
+from .seen import Seen
+
+import logging
+logger = logging.getLogger(__name__)
+
+@dataclass
+class Doc:
+    kind: str
+    id: str
+    title: str
+    user: str
+    at: datetime
+    url: str
+
+    @property
+    def key(self) -> str:
+        return f"{self.kind}:{self.id}"
+
+    @classmethod
+    def of(cls, x: Stream | Video) -> "Doc":
+        match x:
+            case Stream():
+                return cls(kind="stream", id=x.id, title=x.title, user=str(x.user), at=x.started_at, url=x.url)
+            case Video():
+                return cls(kind="video", id=x.id, title=x.title, user=str(x.user), at=x.published_at, url=x.url)
+            case _:
+                raise TypeError(x)
+
+    def to_dict(self):
+        return { "kind": self.kind, "id": self.id, "title": self.title, "user": self.user, "at": self.at.isoformat(), "url": self.url }
+
+    @classmethod
+    def from_dict(cls, d):
+        return cls(**{ **d, "at": datetime.fromisoformat(d["at"]) })
+
+def log_path():
+    return util.state_path("titles.ndjson")
+
+# collects the titles of decoded streams and videos and appends the ones
+# not seen before to the log the index is built from
+class Indexer:
+    def __init__(self, path=None):
+        self.path = path or log_path()
+        self.pending: dict[str, Doc] = {}
+        # sinks are called from the server's handler threads
+        self.lock = threading.Lock()
+
+    def __call__(self, x: Stream | Video):
+        d = Doc.of(x)
+        with self.lock:
+            self.pending[d.key] = d
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, {}
+        if not pending:
+            return
+
+        def digest(d):
+            h = hashlib.blake2b(d.title.encode("UTF-8"), digest_size=8).hexdigest()
+            return f"{d.key}:{h}"
+
+        seen = Seen(self.path + ".seen")
+        new = [ d for d in pending.values() if digest(d) not in seen ]
+        if not new:
+            return
+
+        logger.debug("indexing %d titles: %s", len(new), self.path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a") as f:
+            for d in new:
+                f.write(json.dumps(d.to_dict()) + "\n")
+        seen.add(digest(d) for d in new)
+
+def trigrams(s: str) -> set[str]:
+    return { s[i:i+3] for i in range(len(s) - 2) }
+
+# trigram index over the log, snapshotted to the cache dir and brought up to
+# date by replaying what has been appended to the log since
+class Index:
+    snapshot_every = 1000
+
+    def __init__(self, path=None, snapshot_path=None):
+        self.path = path or log_path()
+        self.snapshot_path = snapshot_path or util.cache_path("titles.index.pickle")
+
+        # documents are kept as (kind, id, title, user, timestamp, url) tuples,
+        # which are much cheaper to unpickle than Doc:s
+        self.offset = 0
+        self.docs: list[tuple | None] = []
+        self._keys: dict[str, int] | None = None
+        self.postings: dict[str, array.array] = {}
+
+        try:
+            with open(self.snapshot_path, "rb") as f:
+                self.offset, self.docs, self.postings = pickle.load(f)
+        except FileNotFoundError:
+            pass
+        except Exception as e:
+            logger.debug("ignoring unreadable snapshot (%s): %s", e, self.snapshot_path)
+
+        n = 0
+        try:
+            with open(self.path, "rb") as f:
+                f.seek(self.offset)
+                for l in f:
+                    self._add(Doc.from_dict(json.loads(l)))
+                    n += 1
+                self.offset = f.tell()
+        except FileNotFoundError:
+            pass
+
+        if n >= self.snapshot_every or (n > 0 and not os.path.exists(self.snapshot_path)):
+            self.snapshot()
+
+    def snapshot(self):
+        logger.debug("snapshotting index of %d titles: %s", len(self.keys), self.snapshot_path)
+        with util.write_atomically(self.snapshot_path, "wb") as f:
+            pickle.dump((self.offset, self.docs, self.postings), f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @property
+    def keys(self) -> dict[str, int]:
+        if self._keys is None:
+            self._keys = { f"{d[0]}:{d[1]}": i for i, d in enumerate(self.docs) if d is not None }
+        return self._keys
+
+    def _add(self, d: Doc):
+        i = self.keys.get(d.key)
+        if i is not None:
+            self.docs[i] = None
+        i = len(self.docs)
+        self.docs.append((d.kind, d.id, d.title, d.user, d.at.timestamp(), d.url))
+        self.keys[d.key] = i
+        for t in trigrams(d.title.lower()):
+            p = self.postings.get(t)
+            if p is None:
+                p = self.postings[t] = array.array("I")
+            p.append(i)
+
+    def search(self, query: str, limit: int | None = None) -> list[Doc]:
+        terms = query.lower().split()
+        ts = set()
+        for t in terms:
+            ts |= trigrams(t)
+
+        if ts:
+            ps = sorted((self.postings.get(t, ()) for t in ts), key=len)
+            candidates = set(ps[0])
+            for p in ps[1:]:
+                candidates.intersection_update(p)
+                if not candidates:
+                    break
+        else:
+            candidates = range(len(self.docs))
+
+        ds = []
+        for i in candidates:
+            d = self.docs[i]
+            if d is None:
+                continue
+            title = d[2].lower()
+            if all(t in title for t in terms):
+                ds.append(d)
+
+        ds.sort(key=lambda d: d[4], reverse=True)
+        if limit:
+            ds = ds[:limit]
+        return [ Doc(*d[:4], at=datetime.fromtimestamp(d[4], UTC), url=d[5]) for d in ds ]
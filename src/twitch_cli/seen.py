@@ -0,0 +1,122 @@
+import hashlib
+import math
+import os
+import struct
+from typing import Iterable
+
+from . import util
+
+import logging
+logger = logging.getLogger(__name__)
+
+class BloomFilter:
+    header = struct.Struct("<QQQQ")
+
+    def __init__(self, capacity: int, error_rate: float = 0.01, bits: bytearray | None = None, k: int | None = None, count: int = 0):
+        self.capacity = capacity
+        self.m = max(8, math.ceil(-capacity * math.log(error_rate) / math.log(2) ** 2))
+        self.k = k or max(1, round(self.m / capacity * math.log(2)))
+        self.bits = bits if bits is not None else bytearray((self.m + 7) // 8)
+        self.m = len(self.bits) * 8
+        self.count = count
+
+    def _indices(self, key: str):
+        d = hashlib.blake2b(key.encode("UTF-8"), digest_size=16).digest()
+        h1, h2 = struct.unpack("<QQ", d)
+        for i in range(self.k):
+            yield (h1 + i * h2) % self.m
+
+    def add(self, key: str):
+        for i in self._indices(key):
+            self.bits[i >> 3] |= 1 << (i & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        return all(self.bits[i >> 3] & (1 << (i & 7)) for i in self._indices(key))
+
+    def dump(self, f, offset: int):
+        f.write(self.header.pack(self.capacity, self.k, self.count, offset))
+        f.write(self.bits)
+
+    @classmethod
+    def load(cls, f) -> tuple["BloomFilter", int]:
+        capacity, k, count, offset = cls.header.unpack(f.read(cls.header.size))
+        return cls(capacity, bits=bytearray(f.read()), k=k, count=count), offset
+
+# ids of videos that have been shown or marked as watched: an append-only
+# file of ids with a Bloom filter in front of it, so that the ids only need
+# to be read when checking a (probably) seen video
+class Seen:
+    def __init__(self, path=None, capacity=10000):
+        self.path = path or util.state_path("seen.txt")
+        self.bloom_path = self.path + ".bloom"
+        self._ids: set[str] | None = None
+
+        try:
+            with open(self.bloom_path, "rb") as f:
+                self.bloom, offset = BloomFilter.load(f)
+        except (FileNotFoundError, struct.error):
+            self.bloom, offset = BloomFilter(capacity), 0
+
+        # catch up with ids appended since the filter was saved
+        try:
+            with open(self.path) as f:
+                f.seek(offset)
+                tail = f.read().split()
+        except FileNotFoundError:
+            tail = []
+
+        if self.bloom.count + len(tail) > self.bloom.capacity:
+            self._rebuild(max(capacity, 2 * (self.bloom.count + len(tail))))
+        elif tail:
+            for i in tail:
+                self.bloom.add(i)
+            self._save()
+
+    def _read(self) -> list[str]:
+        try:
+            with open(self.path) as f:
+                return f.read().split()
+        except FileNotFoundError:
+            return []
+
+    def _rebuild(self, capacity):
+        logger.debug("rebuilding seen filter with capacity %d: %s", capacity, self.bloom_path)
+        self.bloom = BloomFilter(capacity)
+        for i in self._read():
+            self.bloom.add(i)
+        self._save()
+
+    def _save(self):
+        offset = os.path.getsize(self.path) if os.path.exists(self.path) else 0
+        with util.write_atomically(self.bloom_path, "wb") as f:
+            self.bloom.dump(f, offset)
+
+    @property
+    def ids(self) -> set[str]:
+        if self._ids is None:
+            self._ids = set(self._read())
+        return self._ids
+
+    def __contains__(self, vid: str) -> bool:
+        return vid in self.bloom and vid in self.ids
+
+    def add(self, vids: Iterable[str]):
+        new = [ v for v in dict.fromkeys(vids) if v not in self ]
+        if not new:
+            return
+
+        logger.debug("marking %d videos as seen: %s", len(new), self.path)
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        with open(self.path, "a") as f:
+            for v in new:
+                f.write(v + "\n")
+        if self._ids is not None:
+            self._ids.update(new)
+
+        if self.bloom.count + len(new) > self.bloom.capacity:
+            self._rebuild(2 * (self.bloom.count + len(new)))
+        else:
+            for v in new:
+                self.bloom.add(v)
+            self._save()
@@ -0,0 +1,222 @@
+import json
+import os
+import queue
+import socketserver
+import threading
+import time
+from datetime import datetime, timedelta, UTC
+
+from .app import App
+from .client import Client, socket_path
+from .history import History
+from .priority import Priority, prioritized
+from .model import *
+
+import logging
+logger = logging.getLogger(__name__)
+
+# a value and when it was fetched
+class Cached[A]:
+    def __init__(self, value: A):
+        self.value = value
+        self.at = time.monotonic()
+
+    def fresh(self, ttl: timedelta) -> bool:
+        return time.monotonic() - self.at < ttl.total_seconds()
+
+class Server:
+    def __init__(self, app: App, path=None, period=timedelta(minutes=1), ttl=timedelta(minutes=5)):
+        self.app = app
+        self.path = path or socket_path()
+        self.period = period
+        self.ttl = ttl
+
+        # serializes everything that talks to Helix
+        self.lock = threading.Lock()
+
+        self.snapshot: Cached[set[Stream]] | None = None
+        self.snapshot_at: datetime | None = None
+        self.following: Cached[set[User]] | None = None
+        self.videos: dict[str, Cached[tuple[datetime | None, set[Video]]]] = {}
+        self.videos_by_id: dict[str, Cached[Video]] = {}
+        self.users: dict[str, Cached[User]] = {}
+        # loaded once: every refresh only reads what was appended since
+        self.history = History()
+
+        self.subscribers: set[queue.Queue] = set()
+        self.subscribers_lock = threading.Lock()
+
+        self.srv: socketserver.BaseServer | None = None
+
+    def publish(self, event: dict):
+        logger.debug("publishing: %s", event)
+        with self.subscribers_lock:
+            for q in self.subscribers:
+                q.put(event)
+
+    def refresh(self):
+        with self.lock:
+            now = datetime.now(UTC)
+            ss = self.app.streams_followed()
+            self.history.observe([ s.user for s in ss ] + self.history.open_users(), ss, now)
+            self.snapshot, self.snapshot_at = Cached(ss), now
+            self.app.flush()
+        logger.info("refreshed snapshot: %d live streams", len(ss))
+        self.publish({ "event": "snapshot", "at": now.isoformat() })
+
+    def _following(self) -> set[User]:
+        if self.following is None or not self.following.fresh(timedelta(hours=1)):
+            self.following = Cached(self.app.following(self.app.me))
+        return self.following.value
+
+    def _users(self, logins: list[str]) -> set[User]:
+        logins = [ l.lower() for l in logins ]
+        missing = [ l for l in logins if l not in self.users or not self.users[l].fresh(timedelta(days=1)) ]
+        if missing:
+            for u in self.app.users(logins=missing):
+                if u.login is not None:
+                    self.users[u.login.lower()] = Cached(u)
+        return { self.users[l].value for l in logins if l in self.users }
+
+    def _channels(self, channels: list[str] | None) -> set[User]:
+        return self._users(channels) if channels else self._following()
+
+    def do_live(self, channels: list[str] | None = None):
+        if self.snapshot is None or not self.snapshot.fresh(self.period):
+            self.refresh()
+        assert self.snapshot is not None
+
+        with self.lock:
+            if not channels:
+                ss = self.snapshot.value
+            else:
+                logins = { c.lower() for c in channels }
+                followed = { u.login for u in self._following() if u.login }
+                if logins <= followed:
+                    ss = { s for s in self.snapshot.value if s.user.login in logins }
+                else:
+                    ss = self.app.streams_by_login(logins)
+
+        return {
+            "at": self.snapshot_at.isoformat() if self.snapshot_at else None,
+            "streams": [ s.to_twitch_json() for s in ss ],
+        }
+
+    def do_videos(self, since: float | None = None, channels: list[str] | None = None):
+        s = datetime.now(UTC) - timedelta(seconds=since) if since is not None else None
+        vs = []
+        with self.lock:
+            for u in self._channels(channels):
+                c = self.videos.get(u.id)
+                if c is None or not c.fresh(self.ttl) or (c.value[0] is not None and (s is None or s < c.value[0])):
+                    c = self.videos[u.id] = Cached((s, self.app.videos_by_user(u, since=s)))
+                vs += [ v for v in c.value[1] if s is None or v.published_at >= s ]
+        return [ v.to_twitch_json() for v in vs ]
+
+    # concurrent lookups are coalesced and batched by the App's loaders, so
+    # these don't need to hold the lock
+    def do_videos_by_id(self, ids: list[str]):
+        missing = [ i for i in ids if i not in self.videos_by_id or not self.videos_by_id[i].fresh(self.ttl) ]
+        for v in self.app.videos_by_vid(*missing).values():
+            self.videos_by_id[v.id] = Cached(v)
+        return { i: self.videos_by_id[i].value.to_twitch_json() for i in ids if i in self.videos_by_id }
+
+    def do_channels(self, channels: list[str] | None = None):
+        if channels:
+            us = self._users(channels)
+        else:
+            with self.lock:
+                us = self._following()
+        return [ { "id": u.id, "login": u.login, "display_name": u.name } for u in us ]
+
+    def do_notify(self, paths: list[str]):
+        for p in paths:
+            self.publish({ "event": "updated", "path": p })
+
+    def handler(self):
+        this = self
+        class Handler(socketserver.StreamRequestHandler):
+            def reply(self, r):
+                self.wfile.write(json.dumps(r).encode("UTF-8") + b"\n")
+                self.wfile.flush()
+
+            def subscribe(self):
+                q = queue.Queue()
+                with this.subscribers_lock:
+                    this.subscribers.add(q)
+                try:
+                    self.reply({ "result": None })
+                    while True:
+                        self.reply(q.get())
+                except (BrokenPipeError, ConnectionResetError):
+                    pass
+                finally:
+                    with this.subscribers_lock:
+                        this.subscribers.discard(q)
+
+            def handle(self):
+                for l in self.rfile:
+                    try:
+                        r = json.loads(l)
+                        method, params = r["method"], r.get("params", {})
+                    except (ValueError, KeyError, TypeError, AttributeError) as e:
+                        logger.warning("malformed request: %r: %s", l, e)
+                        self.reply({ "error": f"malformed request: {e}" })
+                        continue
+                    logger.debug("request: %s %s", method, params)
+                    if method == "subscribe":
+                        return self.subscribe()
+
+                    f = getattr(this, f"do_{method.replace('-', '_')}", None)
+                    if f is None:
+                        self.reply({ "error": f"unknown method: {method}" })
+                        continue
+                    try:
+                        # someone is waiting for the answer, unlike the refreshes
+                        with prioritized(Priority.INTERACTIVE):
+                            r = f(**params)
+                        self.reply({ "result": r })
+                    except Exception as e:
+                        logger.exception("request failed: %s %s", method, params)
+                        self.reply({ "error": str(e) })
+                    finally:
+                        this.app.flush()
+        return Handler
+
+    def refresher(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception:
+                logger.exception("unable to refresh snapshot")
+            time.sleep(self.period.total_seconds())
+
+    def serve_forever(self):
+        if os.path.exists(self.path):
+            # whether or not clients are told to ignore servers
+            s = Client.open(self.path, timeout=1)
+            if s is not None:
+                s.close()
+                raise RuntimeError(f"server already running: {self.path}")
+            os.unlink(self.path)
+
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        # the socket is only ever accessible to the user
+        umask = os.umask(0o177)
+        try:
+            srv = socketserver.ThreadingUnixStreamServer(self.path, self.handler())
+        finally:
+            os.umask(umask)
+        with srv:
+            srv.daemon_threads = True
+            self.srv = srv
+            logger.info("listening on: %s", self.path)
+            threading.Thread(target=self.refresher, daemon=True).start()
+            try:
+                srv.serve_forever()
+            finally:
+                os.unlink(self.path)
+
+    def shutdown(self):
+        if self.srv is not None:
+            self.srv.shutdown()
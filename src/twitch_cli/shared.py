@@ -0,0 +1,124 @@
+import contextlib
+import fcntl
+import json
+import math
+import os
+from dataclasses import asdict, dataclass
+from datetime import datetime, UTC
+
+from . import util
+from .oauth import Token
+from .priority import Priority
+
+import logging
+logger = logging.getLogger(__name__)
+
+# the share of the rate limit budget only interactive requests may spend
+BACKGROUND_RESERVE = 0.1
+# how long background requests from any invocation hold back after an
+# interactive request
+INTERACTIVE_GRACE = 0.5
+
+# https://dev.twitch.tv/docs/api/guide/#twitch-rate-limits
+@dataclass
+class RateLimit:
+    limit: int
+    remaining: int
+    reset: float
+
+    @classmethod
+    def from_headers(cls, hdr) -> "RateLimit | None":
+        try:
+            return cls(
+                limit = int(hdr["Ratelimit-Limit"]),
+                remaining = int(hdr["Ratelimit-Remaining"]),
+                reset = float(hdr["Ratelimit-Reset"]),
+            )
+        except (KeyError, ValueError):
+            return None
+
+    # claim one request from the budget: returns how many seconds to wait
+    # before trying again, or 0 if the request may be sent. Background
+    # requests leave the last part of the budget to interactive ones. The
+    # remaining points are only known as of the last response, so whoever
+    # ran out waits for the reset, when the bucket is known to be full.
+    def acquire(self, now: float, p=Priority.INTERACTIVE) -> float:
+        if self.reset <= now:
+            return 0
+        reserve = math.ceil(self.limit * BACKGROUND_RESERVE) if p is Priority.BACKGROUND else 0
+        if self.remaining > reserve:
+            self.remaining -= 1
+            return 0
+        return self.reset - now
+
+# state shared between concurrent invocations, kept in a small json file
+# protected by flock(2)
+class SharedState:
+    def __init__(self, path=None):
+        self.path = path or util.state_path("shared.json")
+
+    @contextlib.contextmanager
+    def _locked(self, exclusive):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o600)
+        with open(fd, "r+") as f:
+            fcntl.flock(f, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                d = json.loads(f.read() or "{}")
+            except json.JSONDecodeError:
+                logger.warning("ignoring corrupt shared state: %s", self.path)
+                d = {}
+            yield f, d
+
+    def read(self) -> dict:
+        with self._locked(exclusive=False) as (_, d):
+            return d
+
+    @contextlib.contextmanager
+    def update(self):
+        with self._locked(exclusive=True) as (f, d):
+            yield d
+            f.seek(0)
+            f.truncate()
+            json.dump(d, f)
+            f.flush()
+
+    # claims a request from the shared budget, after recording the rate limit
+    # last observed in a response (if any), under the same lock
+    def acquire(self, now: float, p=Priority.INTERACTIVE, observed: RateLimit | None = None) -> float:
+        with self.update() as d:
+            if observed is not None:
+                d["ratelimit"] = asdict(observed)
+            if p is Priority.INTERACTIVE:
+                d["interactive"] = now + INTERACTIVE_GRACE
+            elif d.get("interactive", 0) > now:
+                return d["interactive"] - now
+
+            r = d.get("ratelimit")
+            if r is None:
+                return 0
+            r = RateLimit(**r)
+            wait = r.acquire(now, p)
+            d["ratelimit"] = asdict(r)
+            return wait
+
+    def ratelimit(self) -> RateLimit | None:
+        r = self.read().get("ratelimit")
+        return RateLimit(**r) if r is not None else None
+
+    def set_ratelimit(self, r: RateLimit):
+        with self.update() as d:
+            d["ratelimit"] = asdict(r)
+
+    def token(self) -> Token | None:
+        t = self.read().get("token")
+        if t is None:
+            return None
+        t = Token.from_dict(t)
+        if datetime.now(UTC) >= t.expires:
+            return None
+        return t
+
+    def set_token(self, t: Token):
+        with self.update() as d:
+            d["token"] = t.to_dict()
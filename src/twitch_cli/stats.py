@@ -0,0 +1,318 @@
+import array
+import bisect
+import collections
+import contextlib
+import fcntl
+import itertools
+import json
+import mmap
+import os
+import statistics
+import threading
+from dataclasses import dataclass
+from datetime import datetime, UTC
+from typing import Callable, Iterable
+
+from . import util
+from .model import *
+
+import logging
+logger = logging.getLogger(__name__)
+
+# an append-only dictionary of strings (user and game ids) encoded as the
+# index of their first occurrence, kept as json lines of [key, *attributes]
+# where later lines for the same key update its attributes
+class Dictionary:
+    def __init__(self, path):
+        self.path = path
+        self.keys: list[str] = []
+        self.attrs: list[list] = []
+        self.codes: dict[str, int] = {}
+        self.pending: list[list] = []
+
+        try:
+            with open(path) as f:
+                for l in f:
+                    self._apply(json.loads(l))
+        except FileNotFoundError:
+            pass
+
+    def _apply(self, l: list) -> int:
+        k, *attrs = l
+        i = self.codes.get(k)
+        if i is None:
+            i = self.codes[k] = len(self.keys)
+            self.keys.append(k)
+            self.attrs.append(attrs)
+        else:
+            self.attrs[i] = attrs
+        return i
+
+    def code(self, key: str, *attrs) -> int:
+        i = self.codes.get(key)
+        if i is None or self.attrs[i] != list(attrs):
+            self.pending.append([ key, *attrs ])
+            i = self._apply([ key, *attrs ])
+        return i
+
+    def flush(self):
+        if not self.pending:
+            return
+        with open(self.path, "a") as f:
+            for l in self.pending:
+                f.write(json.dumps(l) + "\n")
+        self.pending = []
+
+# a table is a directory with one file per column of fixed-width values (in
+# native byte order), so that it can be memory-mapped and aggregated column
+# by column without decoding rows into dataclasses
+class Table:
+    # column name -> array typecode
+    columns: dict[str, str] = {}
+    # how to combine the stored and the observed value of an existing row
+    merge: dict[str, Callable[[int, int], int]] = {}
+    # how many rows appended since the index was written are scanned, rather
+    # than sorted into it (and at least a quarter of the indexed ones)
+    reindex = 1024
+
+    def __init__(self, path):
+        self.path = path
+
+    def column_path(self, c: str) -> str:
+        return os.path.join(self.path, c)
+
+    def index_path(self) -> str:
+        return os.path.join(self.path, "index")
+
+    # finds the row of an id: the index is the ids of the first rows and
+    # their rows, as pairs sorted by id, so that finding the few ids seen by
+    # a run doesn't take a pass over every row ever written
+    def _finder(self, ids: memoryview) -> Callable[[int], int | None]:
+        n = len(ids)
+        try:
+            with open(self.index_path(), "rb") as f:
+                index = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)).cast("q")
+        except (FileNotFoundError, ValueError):
+            index = memoryview(array.array("q"))
+        indexed = len(index) // 2
+
+        # rows are only ever appended, or cut back to rows that were never
+        # indexed
+        if indexed > n or n - indexed > max(self.reindex, indexed // 4):
+            logger.debug("indexing %d rows: %s", n, self.path)
+            a = array.array("q", itertools.chain.from_iterable(sorted(zip(ids, range(n)))))
+            with util.write_atomically(self.index_path(), "wb") as f:
+                a.tofile(f)
+            index, indexed = memoryview(a), n
+
+        keys = index[::2]
+        tail = { ids[i]: i for i in range(indexed, n) }
+        def find(k: int) -> int | None:
+            i = tail.get(k)
+            if i is not None:
+                return i
+            j = bisect.bisect_left(keys, k)
+            return index[2 * j + 1] if j < indexed and keys[j] == k else None
+        return find
+
+    def _rows(self) -> int:
+        n = None
+        for c, t in self.columns.items():
+            try:
+                m = os.path.getsize(self.column_path(c)) // array.array(t).itemsize
+            except FileNotFoundError:
+                m = 0
+            n = m if n is None else min(n, m)
+        return n or 0
+
+    # columns that were only partially appended to are cut to the length of
+    # the shortest column
+    def read(self) -> dict[str, memoryview]:
+        n = self._rows()
+        cs = {}
+        for c, t in self.columns.items():
+            if n == 0:
+                cs[c] = memoryview(array.array(t))
+                continue
+            with open(self.column_path(c), "rb") as f:
+                m = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            cs[c] = memoryview(m).cast("B")[:n * array.array(t).itemsize].cast(t)
+        return cs
+
+    def upsert(self, rows: dict[int, dict[str, int]]):
+        os.makedirs(self.path, exist_ok=True)
+        n = self._rows()
+        cs = self.read()
+        find = self._finder(cs["id"])
+
+        new = []
+        for k, r in rows.items():
+            i = find(k)
+            if i is None:
+                new.append(r | { "id": k })
+                continue
+            for c, f in self.merge.items():
+                v = f(cs[c][i], r[c])
+                if v != cs[c][i]:
+                    t = self.columns[c]
+                    with open(self.column_path(c), "r+b") as h:
+                        h.seek(i * array.array(t).itemsize)
+                        h.write(array.array(t, [ v ]).tobytes())
+        del cs, find
+
+        if not new:
+            return
+        logger.debug("appending %d rows: %s", len(new), self.path)
+        for c, t in self.columns.items():
+            with open(self.column_path(c), "ab") as h:
+                h.truncate(n * array.array(t).itemsize)
+                h.write(array.array(t, [ r[c] for r in new ]).tobytes())
+
+class Videos(Table):
+    columns = { "id": "q", "user": "I", "published_at": "q", "duration": "I" }
+    # the duration of the video of an ongoing stream keeps growing
+    merge = { "duration": max }
+
+class Streams(Table):
+    columns = { "id": "q", "user": "I", "game": "I", "started_at": "q", "last_seen": "q" }
+    merge = { "game": lambda _, new: new, "last_seen": max }
+
+@dataclass
+class Group:
+    key: tuple[str, ...]
+    count: int
+    total: int
+    mean: float
+    median: float
+    max: int
+
+# columnar history of the streams and videos that have been decoded: how
+# long a stream lasted is approximated by when it was last seen live
+class Store:
+    def __init__(self, path=None):
+        self.path = path or util.state_path("stats")
+        self.users = Dictionary(os.path.join(self.path, "users.ndjson"))
+        self.games = Dictionary(os.path.join(self.path, "games.ndjson"))
+        self.videos = Videos(os.path.join(self.path, "videos"))
+        self.streams = Streams(os.path.join(self.path, "streams"))
+
+    @contextlib.contextmanager
+    def locked(self):
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, "lock"), "w") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            yield
+
+    def add(self, xs: Iterable[tuple[Stream | Video, datetime]]):
+        with self.locked():
+            # pick up what concurrent writers have added to the dictionaries
+            self.users = Dictionary(self.users.path)
+            self.games = Dictionary(self.games.path)
+
+            vs, ss = {}, {}
+            for x, at in xs:
+                try:
+                    i = int(x.id)
+                except ValueError:
+                    logger.debug("ignoring non-numeric id: %s", x.id)
+                    continue
+                u = self.users.code(x.user.id, x.user.login, x.user.name)
+                match x:
+                    case Video():
+                        vs[i] = {
+                            "user": u,
+                            "published_at": int(x.published_at.timestamp()),
+                            "duration": int(x.duration.total_seconds()),
+                        }
+                    case Stream():
+                        ss[i] = {
+                            "user": u,
+                            "game": self.games.code(x.game.id, x.game.name),
+                            "started_at": int(x.started_at.timestamp()),
+                            "last_seen": int(at.timestamp()),
+                        }
+
+            # rows only refer to dictionary entries that are already written
+            self.users.flush()
+            self.games.flush()
+            self.videos.upsert(vs)
+            self.streams.upsert(ss)
+
+    def aggregate(self, table: str, by: list[str], since: datetime | None = None, logins: set[str] | None = None) -> list[Group]:
+        match table:
+            case "videos":
+                cs = self.videos.read()
+                at, values = cs["published_at"], cs["duration"]
+            case "streams":
+                cs = self.streams.read()
+                at = cs["started_at"]
+                values = array.array("q", map(int.__sub__, cs["last_seen"], at))
+            case _:
+                raise ValueError(f"unknown table: {table}")
+
+        dims = { "channel": ("user", self.users), "game": ("game", self.games) }
+        for b in by:
+            if b not in dims or dims[b][0] not in cs:
+                raise ValueError(f"unable to group {table} by: {b}")
+
+        # filters and keys are computed a column at a time; rows are only
+        # visited once, when gathering the values of each group
+        keys = [ cs[dims[b][0]] for b in by ]
+        keep = None
+        if since is not None:
+            t = since.timestamp()
+            keep = [ a >= t for a in at ]
+        if logins is not None:
+            ls = { l.lower() for l in logins }
+            us = { i for i, a in enumerate(self.users.attrs) if (a[0] or "").lower() in ls }
+            ks = [ u in us for u in cs["user"] ]
+            keep = ks if keep is None else list(map(bool.__and__, keep, ks))
+        if keep is not None:
+            keys = [ list(itertools.compress(k, keep)) for k in keys ]
+            values = list(itertools.compress(values, keep))
+
+        groups: dict[tuple[int, ...], list[int]] = collections.defaultdict(list)
+        match keys:
+            case []:
+                if values:
+                    groups[()] = list(values)
+            case [k]:
+                for i, v in zip(k, values):
+                    groups[i].append(v)
+                groups = { (i,): vs for i, vs in groups.items() }
+            case _:
+                for k, v in zip(zip(*keys), values):
+                    groups[k].append(v)
+
+        def label(b, i):
+            _, d = dims[b]
+            return next((a for a in reversed(d.attrs[i]) if a), None) or d.keys[i]
+
+        return [
+            Group(
+                key = tuple(label(b, i) for b, i in zip(by, k)),
+                count = len(vs),
+                total = sum(vs),
+                mean = statistics.fmean(vs),
+                median = statistics.median(vs),
+                max = max(vs),
+            ) for k, vs in groups.items()
+        ]
+
+# collects decoded streams and videos, noting when they were seen
+class Recorder:
+    def __init__(self, store: Store | None = None):
+        self.store = store
+        self.pending: list[tuple[Stream | Video, datetime]] = []
+        self.lock = threading.Lock()
+
+    def __call__(self, x: Stream | Video):
+        with self.lock:
+            self.pending.append((x, datetime.now(UTC)))
+
+    def flush(self):
+        with self.lock:
+            pending, self.pending = self.pending, []
+        if not pending:
+            return
+        (self.store or Store()).add(pending)
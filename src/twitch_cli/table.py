@@ -0,0 +1,70 @@
+import string
+
+import wcwidth
+
+# renders what PrettyTable renders in its default style with left-aligned
+# columns, for tables that need nothing more: each cell is measured once
+# when added and the table is joined into a single string
+class Table:
+    def __init__(self, field_names: list[str]):
+        self.field_names = field_names
+        self.rows: list[list[str]] = []
+        self.widths: list[list[int]] = []
+        self.multiline = False
+
+    def add_row(self, row):
+        cs = [ str(c).expandtabs() for c in row ]
+        self.rows.append(cs)
+        self.widths.append([ width(c) for c in cs ])
+        self.multiline = self.multiline or any("\n" in c for c in cs)
+
+    def get_string(self) -> str:
+        ws = [ width(f) for f in self.field_names ]
+        for cws in self.widths:
+            ws = list(map(max, ws, cws))
+
+        hrule = "+" + "+".join("-" * (w + 2) for w in ws) + "+"
+        header = "| " + " | ".join(f + " " * (w - width(f)) for f, w in zip(self.field_names, ws)) + " |"
+        ls = [ hrule, header, hrule ]
+
+        if not self.multiline:
+            ls += [
+                "| " + " | ".join(c + " " * (w - cw) for c, cw, w in zip(cs, cws, ws)) + " |"
+                for cs, cws in zip(self.rows, self.widths)
+            ]
+        else:
+            for cs in self.rows:
+                ls += render_lines(cs, ws)
+
+        ls.append(hrule)
+        return "\n".join(ls)
+
+    def write(self, o):
+        o.write(self.get_string() + "\n")
+
+# cells spanning several lines are padded at the bottom with empty lines
+def render_lines(cs: list[str], ws: list[int]) -> list[str]:
+    cls = [ c.split("\n") for c in cs ]
+    h = max(len(l) for l in cls)
+    return [
+        "| " + " | ".join(l + " " * (w - width(l)) for l, w in zip(ls, ws)) + " |"
+        for ls in zip(*(l + [ "" ] * (h - len(l)) for l in cls))
+    ]
+
+# display width as measured by PrettyTable, without calling out to wcwidth
+# for the common case
+def width(s: str) -> int:
+    if s.isascii() and s.isprintable():
+        return len(s)
+    return max(wcwidth.width(l) for l in s.split("\n"))
+
+# str.translate table keeping only the characters in string.printable
+class _Printable(dict):
+    def __init__(self):
+        super().__init__((ord(c), ord(c)) for c in string.printable)
+
+    def __missing__(self, c):
+        self[c] = None
+        return None
+
+printable = _Printable()
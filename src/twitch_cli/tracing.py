@@ -0,0 +1,82 @@
+import atexit
+import contextlib
+import functools
+import json
+import os
+import threading
+import time
+
+from . import util
+
+import logging
+logger = logging.getLogger(__name__)
+
+# spans recorded as complete ("X") events in the Chrome trace event format,
+# which Perfetto (https://ui.perfetto.dev) and about:tracing open directly:
+# https://docs.google.com/document/d/1CvAClvFfyA5R-PhYUmn5OOQtYMH4h6I0nSsKchNAySU
+class Tracer:
+    def __init__(self):
+        self.pid = os.getpid()
+        self.t0 = time.perf_counter_ns()
+        self.events: list[dict] = []
+        self.threads: dict[int, str] = {}
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def span(self, name: str, cat: str, **args):
+        t = threading.current_thread()
+        tid = threading.get_native_id()
+        start = time.perf_counter_ns()
+        try:
+            yield args
+        finally:
+            end = time.perf_counter_ns()
+            e = {
+                "name": name, "cat": cat, "ph": "X",
+                "ts": (start - self.t0) / 1000, "dur": (end - start) / 1000,
+                "pid": self.pid, "tid": tid,
+            }
+            if args:
+                e["args"] = args
+            with self.lock:
+                self.events.append(e)
+                self.threads.setdefault(tid, t.name)
+
+    def dump(self, path: str):
+        with self.lock:
+            es = [
+                { "name": "thread_name", "ph": "M", "pid": self.pid, "tid": tid, "args": { "name": n } }
+                for tid, n in self.threads.items()
+            ] + self.events
+        logger.info("writing %d trace events: %s", len(es), path)
+        with util.write_atomically(path) as f:
+            json.dump({ "traceEvents": es, "displayTimeUnit": "ms" }, f)
+
+tracer: Tracer | None = None
+_disabled = contextlib.nullcontext({})
+
+# the context yields the span's args, which may be added to before it closes
+def span(name: str, cat: str = "", **args):
+    t = tracer
+    if t is None:
+        return _disabled
+    return t.span(name, cat, **args)
+
+def traced(cat: str):
+    def decorator(f):
+        name = f.__qualname__
+        @functools.wraps(f)
+        def wrapper(*args, **kwargs):
+            t = tracer
+            if t is None:
+                return f(*args, **kwargs)
+            with t.span(name, cat):
+                return f(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def enable(path: str) -> Tracer:
+    global tracer
+    tracer = Tracer()
+    atexit.register(tracer.dump, path)
+    return tracer
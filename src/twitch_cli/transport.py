@@ -0,0 +1,154 @@
+import collections
+import json
+import threading
+from abc import ABC, abstractmethod
+from typing import Callable
+
+import requests
+import requests.adapters
+import requests.structures
+
+import logging
+logger = logging.getLogger(__name__)
+
+DEFAULT_POOL_SIZE = 32
+
+# how Helix puts prepared requests on the wire
+class Transport(ABC):
+    def __init__(self):
+        self.counts = collections.Counter()
+        self.lock = threading.Lock()
+
+    def count(self, what: str, n=1):
+        with self.lock:
+            self.counts[what] += n
+
+    @abstractmethod
+    def send(self, preq: requests.PreparedRequest, timeout: float) -> requests.Response:
+        pass
+
+    # how many requests were sent over how many connections
+    def stats(self) -> dict[str, int]:
+        return dict(self.counts)
+
+    def close(self):
+        pass
+
+# connections are pooled per host by urllib3: with the default pool of 10,
+# connections opened by more concurrent requests than that are closed
+# instead of reused (blocking on the pool instead would ignore deadlines)
+class RequestsTransport(Transport):
+    def __init__(self, session: requests.Session | None = None, pool_size=DEFAULT_POOL_SIZE, keep_alive=True):
+        super().__init__()
+        self.session = session or requests.Session()
+        self.adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=pool_size)
+        self.session.mount("https://", self.adapter)
+        self.session.mount("http://", self.adapter)
+        if not keep_alive:
+            self.session.headers["Connection"] = "close"
+
+    def send(self, preq, timeout):
+        self.count("requests")
+        return self.session.send(preq, timeout=timeout)
+
+    def stats(self):
+        pm = self.adapter.poolmanager
+        ps = [ pm.pools[k] for k in pm.pools.keys() ]
+        return dict(self.counts) | {
+            "connections": sum(p.num_connections for p in ps),
+        }
+
+    def close(self):
+        self.session.close()
+
+# HTTP/2 multiplexes concurrent requests over a single connection per host:
+# needs the optional httpx[http2] dependency
+class HTTP2Transport(Transport):
+    def __init__(self, pool_size=DEFAULT_POOL_SIZE, keep_alive=True):
+        super().__init__()
+        import httpx
+        self.httpx = httpx
+        limits = httpx.Limits(
+            max_connections = pool_size,
+            max_keepalive_connections = pool_size if keep_alive else 0,
+        )
+        self.client = httpx.Client(http2=True, limits=limits)
+
+    def trace(self, event: str, info):
+        if event == "connection.connect_tcp.complete":
+            self.count("connections")
+
+    def send(self, preq, timeout):
+        httpx = self.httpx
+        self.count("requests")
+        try:
+            r = self.client.request(
+                preq.method, preq.url,
+                headers = dict(preq.headers),
+                content = preq.body,
+                timeout = timeout,
+                extensions = { "trace": self.trace },
+            )
+        except httpx.TimeoutException as e:
+            raise requests.exceptions.Timeout(e) from e
+        except httpx.TransportError as e:
+            raise requests.exceptions.ConnectionError(e) from e
+
+        if r.http_version == "HTTP/2":
+            self.count("http2")
+
+        rsp = requests.Response()
+        rsp.status_code = r.status_code
+        rsp.reason = r.reason_phrase
+        rsp.headers = requests.structures.CaseInsensitiveDict(r.headers)
+        rsp._content = r.content
+        rsp.encoding = r.encoding
+        rsp.url = str(r.url)
+        rsp.request = preq
+        return rsp
+
+    def close(self):
+        self.client.close()
+
+# answers requests by calling handler, which returns a Response, a json
+# body (to be returned with status 200) or an exception to raise
+class MemoryTransport(Transport):
+    def __init__(self, handler: Callable[[requests.PreparedRequest], requests.Response | dict | Exception]):
+        super().__init__()
+        self.handler = handler
+        self.requests: list[requests.PreparedRequest] = []
+
+    @staticmethod
+    def response(status: int, j=None, headers=None) -> requests.Response:
+        rsp = requests.Response()
+        rsp.status_code = status
+        rsp.headers = requests.structures.CaseInsensitiveDict(headers or {})
+        rsp._content = json.dumps(j if j is not None else {}).encode("UTF-8")
+        return rsp
+
+    def send(self, preq, timeout):
+        self.count("requests")
+        with self.lock:
+            self.requests.append(preq)
+        r = self.handler(preq)
+        if isinstance(r, Exception):
+            raise r
+        if isinstance(r, requests.Response):
+            r.request = preq
+            return r
+        rsp = self.response(200, r)
+        rsp.request = preq
+        return rsp
+
+def build(name: str | None, session: requests.Session, pool_size=DEFAULT_POOL_SIZE) -> Transport:
+    match name:
+        case None | "requests":
+            return RequestsTransport(session, pool_size=pool_size)
+        case "http2":
+            try:
+                return HTTP2Transport(pool_size=pool_size)
+            except ImportError as e:
+                logger.warning("HTTP/2 needs httpx[http2] (%s): falling back to requests", e)
+                return RequestsTransport(session, pool_size=pool_size)
+        case _:
+            raise ValueError(f"unknown transport: {name}")
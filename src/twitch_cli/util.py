@@ -1,14 +1,16 @@
 import collections
+import contextlib
 import datetime
+import functools
 import logging
 import math
 import os
-import random
-import shutil
-import string
-import subprocess
 import sys
-import tempfile
+
+import xdg_base_dirs
+
+# random, shutil, subprocess and tempfile are imported where they're used:
+# this module is imported by every shell completion
 
 from . import env, package_name, whoami
 
@@ -31,10 +33,13 @@ def eprint(*args, **kwargs):
     print(*args, file=sys.stderr, **kwargs)
 
 def fresh_salt(n=5):
+    import random
+    import string
     alphabeth = string.ascii_letters + string.digits
     return ''.join(random.choices(alphabeth, k=n))
 
 def find_editor():
+    import shutil
     e = env("EDITOR")
     if e is not None:
         return e
@@ -51,6 +56,7 @@ def find_editor():
     raise RuntimeError("unable to find an editor")
 
 def run_with_tty(*cmdline, check=None):
+    import subprocess
     if check is None:
         check = True
     logger.debug(f"running with tty: {cmdline}")
@@ -59,11 +65,32 @@ def run_with_tty(*cmdline, check=None):
     return p.returncode == 0
 
 def temporary_directory():
+    import tempfile
     return tempfile.TemporaryDirectory(prefix=f"{whoami}-")
 
 def now():
     return datetime.datetime.now().astimezone()
 
+def state_path(*f) -> str:
+    return os.path.join(xdg_base_dirs.xdg_state_home(), whoami, *f)
+
+def cache_path(*f) -> str:
+    return os.path.join(xdg_base_dirs.xdg_cache_home(), whoami, *f)
+
+@contextlib.contextmanager
+def write_atomically(path, mode="w"):
+    import tempfile
+    d = os.path.dirname(path) or "."
+    os.makedirs(d, exist_ok=True)
+    fd, tmp = tempfile.mkstemp(dir=d, prefix=f".{os.path.basename(path)}.")
+    try:
+        with open(fd, mode) as f:
+            yield f
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
 def wait_indefinitely():
     import threading
     forever = threading.Event()
@@ -102,7 +129,11 @@ def load_module_from_path(path):
 def render_duration(secs: float | int | datetime.timedelta, short=False) -> str:
     if isinstance(secs, datetime.timedelta):
         secs = math.floor(secs.total_seconds())
+    return _render_duration(secs, short)
 
+# tables render the same few durations over and over
+@functools.lru_cache(maxsize=4096, typed=True)
+def _render_duration(secs: float | int, short) -> str:
     if short is True:
         short = 2
     else:
@@ -0,0 +1,119 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import threading
+import time
+from typing import Callable
+
+import logging
+logger = logging.getLogger(__name__)
+
+# inotify(7)
+IN_MODIFY = 0x002
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_CLOEXEC = 0o2000000
+EVENT = struct.Struct("iIII")
+
+# editors tend to write files in several steps
+SETTLE = 0.05
+
+def _libc():
+    name = ctypes.util.find_library("c")
+    if name is None:
+        return None
+    try:
+        libc = ctypes.CDLL(name, use_errno=True)
+    except OSError:
+        return None
+    if not hasattr(libc, "inotify_init1"):
+        return None
+    return libc
+
+# calls changed (from its own thread) whenever the file at path is written
+# or replaced: through inotify when available, by polling its mtime otherwise
+class Watcher(threading.Thread):
+    def __init__(self, path: str, changed: Callable[[], None], period=1.0, inotify=True):
+        super().__init__(name=f"watch {os.path.basename(path)}", daemon=True)
+        self.path = os.path.abspath(path)
+        self.changed = changed
+        self.period = period
+        self.inotify = inotify
+        self.stopped = threading.Event()
+
+    def stop(self):
+        self.stopped.set()
+
+    def run(self):
+        fd = self._inotify() if self.inotify else None
+        if fd is None:
+            logger.debug("polling for changes every %ss: %s", self.period, self.path)
+            return self._poll()
+        logger.debug("watching for changes through inotify: %s", self.path)
+        try:
+            self._watch(fd)
+        finally:
+            os.close(fd)
+
+    def _fire(self):
+        try:
+            self.changed()
+        except Exception:
+            logger.exception("unable to handle a change of: %s", self.path)
+
+    # the directory is watched since editors usually replace files by
+    # renaming over them
+    def _inotify(self) -> int | None:
+        libc = _libc()
+        if libc is None:
+            return None
+        fd = libc.inotify_init1(IN_CLOEXEC)
+        if fd < 0:
+            logger.debug("inotify_init1: %s", os.strerror(ctypes.get_errno()))
+            return None
+        d = os.path.dirname(self.path).encode()
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(fd, d, mask) < 0:
+            logger.debug("inotify_add_watch: %s", os.strerror(ctypes.get_errno()))
+            os.close(fd)
+            return None
+        return fd
+
+    def _events(self, fd: int) -> bool:
+        name = os.path.basename(self.path).encode()
+        buf = os.read(fd, 64 * 1024)
+        hit, i = False, 0
+        while i < len(buf):
+            _, _, _, n = EVENT.unpack_from(buf, i)
+            i += EVENT.size
+            hit = hit or buf[i:i + n].rstrip(b"\0") == name
+            i += n
+        return hit
+
+    def _watch(self, fd: int):
+        while not self.stopped.is_set():
+            r, _, _ = select.select([fd], [], [], self.period)
+            if not r or not self._events(fd):
+                continue
+            while select.select([fd], [], [], SETTLE)[0]:
+                self._events(fd)
+            self._fire()
+
+    def _stat(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return st.st_ino, st.st_mtime_ns, st.st_size
+
+    def _poll(self):
+        last = self._stat()
+        while not self.stopped.wait(self.period):
+            s = self._stat()
+            if s != last:
+                time.sleep(SETTLE)
+                last = self._stat()
+                self._fire()
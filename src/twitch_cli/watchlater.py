@@ -0,0 +1,77 @@
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from typing import Iterable
+
+from .lastknown import LastKnown
+from .model import *
+
+import logging
+logger = logging.getLogger(__name__)
+
+# titles are mostly edited while (or shortly after) streaming
+EDIT_WINDOW = timedelta(days=2)
+EDIT_PERIOD = timedelta(hours=1)
+
+# VODs are deleted when they reach the end of the retention window of the
+# channel, which depends on what kind of channel it is:
+# https://help.twitch.tv/s/article/video-on-demand
+RETENTION = [ timedelta(days=7), timedelta(days=14), timedelta(days=60) ]
+
+# ...or whenever the streamer feels like it
+MAX_PERIOD = timedelta(days=7)
+
+# a video that has been deleted or has expired, and what was last known about it
+@dataclass
+class Gone:
+    id: str
+    video: Video | None = None
+
+# when a video checked at checked could next have changed
+def next_check(v: Video, checked: datetime) -> datetime:
+    if checked - v.created_at < EDIT_WINDOW:
+        return checked + EDIT_PERIOD
+    t = checked + MAX_PERIOD
+    for r in RETENTION:
+        if v.created_at + r > checked:
+            return min(t, v.created_at + r)
+    return t
+
+# schedules the re-checking of videos remembered by id: the ones fetched
+# are kept up to date by the App, the ones Helix no longer knows about are
+# remembered as gone
+class Revalidator:
+    def __init__(self, known: LastKnown | None = None, gone: LastKnown | None = None):
+        self.known = known or LastKnown("videos")
+        self.gone = gone or LastKnown("gone", max_age=timedelta(days=365))
+
+    def due(self, ids: Iterable[str], now: datetime) -> list[str]:
+        ds = []
+        for i in dict.fromkeys(ids):
+            if self.gone.get(i) is not None:
+                continue
+            e = self.known.get(i)
+            if e is None or next_check(e[0], e[1]) <= now:
+                ds.append(i)
+        return ds
+
+    def lookup(self, ids: Iterable[str]) -> dict[str, Video | Gone]:
+        ws = {}
+        for i in ids:
+            g = self.gone.get(i)
+            if g is not None:
+                ws[i] = g[0]
+                continue
+            e = self.known.get(i)
+            if e is not None:
+                ws[i] = e[0]
+        return ws
+
+    # ids asked for that Helix didn't return are gone
+    def checked(self, ids: Iterable[str], found: dict[str, Video]):
+        for i in ids:
+            if i in found:
+                continue
+            e = self.known.get(i)
+            logger.info("video is gone: %s", i)
+            self.gone.put(i, Gone(id=i, video=e[0] if e else None))
+        self.gone.save()
@@ -0,0 +1,68 @@
+import collections
+import os
+import tempfile
+import unittest
+import urllib.parse
+from datetime import datetime, timedelta, UTC
+from unittest import mock
+
+import requests
+
+from twitch_cli.app import App
+from twitch_cli.helix import Helix
+from twitch_cli.oauth import Token
+from twitch_cli.transport import MemoryTransport
+
+FOLLOWED = [ "u1", "u2", "u3" ]
+
+# the Helix json of the channel with the login l, whose id is l without its
+# first letter
+def user(l):
+    return { "user_id": l[1:], "user_login": l, "user_name": l.upper() }
+
+def stream(l, game="1"):
+    return { "id": f"s{l}", "title": f"{l} title", "started_at": "2025-01-01T00:00:00Z", "game_id": game, "game_name": f"Game {game}", **user(l) }
+
+def video(l, id=None):
+    t = (datetime.now(UTC) - timedelta(hours=1)).isoformat()
+    id = id or f"v{l}"
+    return { "id": id, "title": f"{id} video", "url": f"https://www.twitch.tv/videos/{id}", "duration": "1h", "created_at": t, "published_at": t, **user(l) }
+
+def followed(ls):
+    return [ { "broadcaster_id": l[1:], "broadcaster_login": l, "broadcaster_name": l.upper() } for l in ls ]
+
+def users(ls):
+    return [ { "id": l[1:], "login": l, "display_name": l.upper() } for l in ls ]
+
+# runs with the XDG directories in a temporary one, and an App whose Helix
+# requests are answered by self.handler
+class AppTestCase(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(self.tmp.cleanup)
+        self.patch_env({ f"XDG_{k}": os.path.join(self.tmp.name, k.lower()) for k in [ "STATE_HOME", "CACHE_HOME", "CONFIG_HOME", "RUNTIME_DIR" ] })
+
+        # by path
+        self.requests = collections.Counter()
+        self.app = self.new_app()
+
+    def patch_env(self, env: dict[str, str]):
+        p = mock.patch.dict(os.environ, env)
+        p.start()
+        self.addCleanup(p.stop)
+
+    def new_app(self, **kwargs) -> App:
+        token = Token(value="token", expires=datetime.now(UTC) + timedelta(hours=1), meta={ "user_id": "0", "login": "me" })
+        return App(Helix(token=token, transport=MemoryTransport(self._handle), **kwargs))
+
+    def _handle(self, preq: requests.PreparedRequest):
+        u = urllib.parse.urlsplit(preq.url)
+        path = u.path.removeprefix("/helix")
+        self.requests[path] += 1
+        r = self.handler(path, urllib.parse.parse_qs(u.query))
+        return { "data": r, "pagination": {} } if isinstance(r, list) else r
+
+    # answers a request, with the data of its (only) page, or its json or
+    # response
+    def handler(self, path: str, qs: dict[str, list[str]]) -> dict | list | requests.Response:
+        raise AssertionError(path)
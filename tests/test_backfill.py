@@ -0,0 +1,84 @@
+import glob
+import gzip
+import json
+import os
+import tempfile
+import unittest
+import urllib.parse
+
+import requests
+
+from twitch_cli.backfill import Backfill
+from twitch_cli.helix import Helix, RetryPolicy
+from twitch_cli.model import User
+from twitch_cli.transport import MemoryTransport
+
+def video(u: str, i: int):
+    return {
+        "id": f"{u}-{i}",
+        "title": f"video {i}",
+        "user_id": u,
+        "user_login": f"user{u}",
+        "user_name": f"User{u}",
+        "url": f"https://www.twitch.tv/videos/{u}{i}",
+        "duration": "1h2m3s",
+        "created_at": "2025-01-01T00:00:00+00:00",
+        "published_at": "2025-01-01T00:00:00+00:00",
+    }
+
+class BackfillTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.users = [ User(id=str(i), login=f"user{i}") for i in range(5) ]
+        self.videos = { u.id: 250 * int(u.id) for u in self.users }
+        self.broken: set[tuple[str, int]] = set()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def handler(self, preq):
+        qs = dict(urllib.parse.parse_qsl(urllib.parse.urlsplit(preq.url).query))
+        u, first, after = qs["user_id"], int(qs["first"]), int(qs.get("after", 0))
+        if (u, after) in self.broken:
+            return requests.exceptions.ConnectionError("broken")
+        n = min(first, self.videos[u] - after)
+        j = { "data": [ video(u, i) for i in range(after, after + n) ], "pagination": {} }
+        if after + n < self.videos[u]:
+            j["pagination"]["cursor"] = str(after + n)
+        return j
+
+    def backfill(self):
+        h = Helix(token="token", retry=RetryPolicy(attempts=1), transport=MemoryTransport(self.handler))
+        return Backfill(h, self.tmp.name, jobs=3, shard_size=8 * 1024)
+
+    def backfilled(self) -> list[str]:
+        ids = []
+        for p in sorted(glob.glob(os.path.join(self.tmp.name, "*.ndjson.gz"))):
+            with gzip.open(p) as f:
+                ids += [ json.loads(l)["id"] for l in f ]
+        return ids
+
+    def test_backfill(self):
+        b = self.backfill()
+        assert b.run(self.users) == sum(self.videos.values())
+        assert sorted(self.backfilled()) == sorted(f"{u}-{i}" for u, n in self.videos.items() for i in range(n))
+        assert len(glob.glob(os.path.join(self.tmp.name, "*.ndjson.gz"))) > 1
+        assert all(p.done for p in b.checkpoint.channels.values())
+
+        # nothing left to do
+        assert self.backfill().run(self.users) == 0
+
+    def test_resume(self):
+        self.broken = { ("3", 200), ("4", 0) }
+        b = self.backfill()
+        assert b.run(self.users) == 0 + 250 + 500 + 200
+        assert [ p.done for p in b.checkpoint.channels.values() ] == [ True, True, True, False, False ]
+
+        # written after the last checkpoint
+        with open(b.shards.shard_path(b.checkpoint.shard), "ab") as f:
+            f.write(gzip.compress(b'{"id": "torn"}\n')[:10])
+
+        self.broken = set()
+        assert self.backfill().run(self.users) == 550 + 1000
+        ids = self.backfilled()
+        assert len(ids) == len(set(ids)) == sum(self.videos.values())
@@ -0,0 +1,56 @@
+import gzip
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, UTC
+
+import requests
+
+from twitch_cli.cassette import ReplayTransport
+from twitch_cli.helix import Helix, RetryPolicy
+from twitch_cli.oauth import Token
+from twitch_cli.transport import MemoryTransport
+
+class CassetteTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "cassette.gz")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def record(self):
+        n = iter(range(100))
+        def handler(preq):
+            if "after" in preq.url:
+                return { "data": [ "日本語 🎉", next(n) ], "access_token": "secret-token" }
+            return { "data": [ "1h2m3s" ], "pagination": { "cursor": "c" } }
+        token = Token(value="secret-token", expires=datetime.now(UTC) + timedelta(hours=1), meta={ "user_id": "7", "login": "me", "scopes": [] })
+        h = Helix(token=token, transport=MemoryTransport(handler), record=self.path)
+        h.session.headers.update(Helix.build_headers("secret-token"))
+        assert list(h.paginate("/foo", params={ "b": "2", "a": "1" })) == [ "1h2m3s", "日本語 🎉", 0 ]
+        assert list(h.paginate("/foo", params={ "b": "2", "a": "1" })) == [ "1h2m3s", "日本語 🎉", 1 ]
+        h.transport.close()
+
+    def test_scrubbed(self):
+        self.record()
+        with gzip.open(self.path) as f:
+            assert b"secret-token" not in f.read()
+
+    def test_replay(self):
+        self.record()
+        slept = []
+        t = ReplayTransport(self.path, scale=2, sleep=slept.append)
+        h = Helix(token=t.token(), transport=t)
+        assert h.token.meta == { "user_id": "7", "login": "me" }
+
+        # in order, regardless of the order of the parameters, and the last
+        # response once they run out
+        for i in [ 0, 1, 1 ]:
+            assert list(h.paginate("/foo", params={ "a": "1", "b": "2" })) == [ "1h2m3s", "日本語 🎉", i ]
+        assert len(slept) == 6 and all(s >= 0 for s in slept)
+
+        h = Helix(token=t.token(), transport=t, retry=RetryPolicy(attempts=1))
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            h.req("GET", "/bar")
+        assert t.stats()["misses"] == 1
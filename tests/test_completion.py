@@ -0,0 +1,49 @@
+import argparse
+import importlib.metadata
+import os
+import tempfile
+import unittest
+from unittest import mock
+
+import twitch_cli
+from twitch_cli.cli import CompletionFinder
+from twitch_cli.completion import complete_channels, complete_lists, remember_following
+
+class CompletionTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        env = { f"XDG_{k}": os.path.join(self.tmp.name, k.lower()) for k in [ "CACHE_HOME", "CONFIG_HOME" ] }
+        p = mock.patch.dict(os.environ, env)
+        p.start()
+        self.addCleanup(p.stop)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    # the name isn't looked up at runtime, that's too slow for completion
+    def test_whoami(self):
+        assert twitch_cli.whoami == importlib.metadata.metadata(twitch_cli.package_name)["name"]
+
+    def test_channels(self):
+        assert complete_channels("") == []
+        remember_following([ "foo", "bar", "foobar" ])
+        assert complete_channels("FO") == [ "foo", "foobar" ]
+        assert complete_channels("") == [ "bar", "foo", "foobar" ]
+
+    def test_lists(self):
+        ns = argparse.Namespace(lists=None)
+        assert complete_lists("", parsed_args=ns) == []
+
+        path = os.path.join(self.tmp.name, "lists.yaml")
+        with open(path, "w") as f:
+            f.write("friends: [ a ]\nfoes: [ b ]\nothers: [ c ]\n")
+        assert sorted(complete_lists("f", parsed_args=argparse.Namespace(lists=path))) == [ "foes", "friends" ]
+
+    def test_finder(self):
+        f = CompletionFinder()
+        f.exclude = [ "b" ]
+        assert f.filter_completions([ "a", "b", "a", "c" ]) == [ "a", "c" ]
+        f._display_completions = {}
+        with mock.patch.dict(os.environ, { "_ARGCOMPLETE_SHELL": "bash" }):
+            assert f.quote_completions([ "a_1", "b.2" ], "", None) == [ "a_1", "b.2" ]
+            assert f.quote_completions([ "a b", "c" ], "", None) == [ "a\\ b", "c" ]
@@ -0,0 +1,69 @@
+import io
+import time
+from datetime import timedelta
+
+from twitch_cli.app import MISSING, render_table_of_streams, render_table_of_videos
+from twitch_cli.completion import remember_following
+from twitch_cli.helix import Deadline, DeadlineExceeded
+
+from .helpers import AppTestCase, followed, stream, users
+
+def render(t):
+    o = io.StringIO()
+    t.write(o)
+    return o.getvalue()
+
+class DeadlineTests(AppTestCase):
+    def setUp(self):
+        # expires after the given number of requests
+        self.budget = 1
+        self.deadline = Deadline(timedelta(minutes=1))
+        super().setUp()
+
+    def new_app(self, **kwargs):
+        return super().new_app(deadline=self.deadline, **kwargs)
+
+    def handler(self, path, qs):
+        self.budget -= 1
+        if self.budget <= 0:
+            self.deadline.at = time.monotonic()
+
+        match path:
+            case "/channels/followed":
+                return { "data": followed([ "u1" ]), "pagination": { "cursor": "1" } }
+            case "/streams":
+                return [ stream(l) for l in qs["user_login"] if l in { "l001", "l120" } ]
+            case "/users":
+                return users(qs.get("login", []))
+            case _:
+                raise AssertionError(path)
+
+    def test_deadline(self):
+        d = Deadline(timedelta(0))
+        assert d.expired
+        with self.assertRaises(DeadlineExceeded):
+            d.timeout(1)
+        assert Deadline(timedelta(minutes=1)).timeout(1) == 1
+
+    def test_streams(self):
+        logins = [ f"l{i:03}" for i in range(150) ]
+        ss = self.app.streams_by_login(logins)
+        # the first chunk of a hundred is answered, the rest is missing
+        assert { s.user.login for s in ss } == { "l001" }
+        assert { u.login for u in self.app.missing } == set(logins[100:])
+
+        t = render(render_table_of_streams(ss, self.app.missing))
+        assert "L001" in t
+        assert t.count(MISSING) == 50
+
+    def test_users(self):
+        self.deadline.at = time.monotonic()
+        assert self.app.users(logins=[ "Foo", "bar" ], ids=[ "42" ]) == set()
+        assert { (u.id, u.login) for u in self.app.missing } == { ("foo", "foo"), ("bar", "bar"), ("42", None) }
+        t = render(render_table_of_videos(sorted(self.app.missing, key=str)))
+        assert t.count(MISSING) == 3
+
+    def test_following(self):
+        remember_following([ "u1", "u2", "u3" ])
+        assert { u.login for u in self.app.following(self.app.me) } == { "u1" }
+        assert { u.login for u in self.app.missing } == { "u2", "u3" }
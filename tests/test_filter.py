@@ -1,6 +1,12 @@
+import os
+import tempfile
+import textwrap
+import threading
+import time
 import unittest
 
-from twitch_cli.config import Filter
+from twitch_cli.config import Filter, Lists
+from twitch_cli.model import Game, Stream, User
 
 class FilterTests(unittest.TestCase):
     def test_none(self):
@@ -26,3 +32,97 @@ class FilterTests(unittest.TestCase):
 
         assert Filter._match("/c$", "abc") == True
         assert Filter._match("/b$", "abc") == False
+
+class CompiledFilterTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "filter.yaml")
+        with open(self.path, "w") as f:
+            f.write(textwrap.dedent("""
+                include:
+                  user: [ friend, 1234 ]
+                  title: [ /(?i)speedrun ]
+                exclude:
+                  user: [ "42", /^bot ]
+                  game: [ Just Chatting ]
+                  title: [ /(?i)rerun ]
+            """))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def check(self, f):
+        assert f.user(User(id="1", login="friend")) == True
+        assert f.user(User(id="2", login="1234")) == True
+        assert f.user(User(id="42", login="foo")) == False
+        assert f.user(User(id="3", login="bot_thing")) == False
+        assert f.user(User(id="4", login="other")) == True
+
+        chatting = Game(id="509658", name="Just Chatting")
+        other = Game(id="1", name="Other")
+        def stream(title, game):
+            return Stream(id="s", title=title, user=User(id="5", login="other"), started_at=None, game=game)
+        assert f.stream(stream("hello", chatting)) == False
+        assert f.stream(stream("SPEEDRUN", chatting)) == False
+        assert f.stream(stream("Rerun", other)) == False
+        assert f.stream(stream("Speedrun rerun", other)) == True
+        assert f.stream(stream("hello", other)) == True
+
+    def test_cached(self):
+        self.check(Filter(path=self.path))
+        assert os.path.exists(os.path.join(self.tmp.name, ".filter.yaml.pickle"))
+        self.check(Filter(path=self.path))
+
+    def test_invalidated(self):
+        Filter(path=self.path)
+        with open(self.path, "a") as f:
+            f.write("  user: [ foo ]\n")
+        f = Filter(path=self.path)
+        assert f.user(User(id="42", login="bar")) == True
+        assert f.user(User(id="3", login="foo")) == False
+
+class ReloadTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "lists.yaml")
+        self.write("friends: [ a ]\n")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, s):
+        # replaced by renaming over it, as editors do
+        with open(self.path + ".tmp", "w") as f:
+            f.write(s)
+        os.replace(self.path + ".tmp", self.path)
+
+    def watched(self, inotify):
+        ls = Lists(path=self.path)
+        reloaded = threading.Event()
+        ls.listeners.append(lambda _: reloaded.set())
+        ls.watch(period=0.01, inotify=inotify)
+        self.addCleanup(ls.watcher.stop)
+        time.sleep(0.05)
+        return ls, reloaded
+
+    def check(self, inotify):
+        ls, reloaded = self.watched(inotify)
+        assert ls["friends"] == { "a" }
+
+        self.write("friends: [ a, b ]\nfoes: [ c ]\n")
+        assert reloaded.wait(5)
+        assert ls["friends"] == { "a", "b" }
+        assert "foes" in ls
+
+        reloaded.clear()
+        with self.assertLogs("twitch_cli.config", "WARNING"):
+            self.write("friends: [ a\n")
+            time.sleep(0.5)
+        assert not reloaded.is_set()
+        assert ls["friends"] == { "a", "b" }
+
+    def test_inotify(self):
+        self.check(inotify=True)
+
+    def test_polling(self):
+        self.check(inotify=False)
@@ -0,0 +1,133 @@
+import json
+import os
+import tempfile
+import threading
+import time
+import unittest
+
+import requests
+
+from twitch_cli.helix import Helix, RetryPolicy
+from twitch_cli.priority import Priority
+from twitch_cli.shared import SharedState
+from twitch_cli.transport import MemoryTransport
+
+def response(status, j=None):
+    r = requests.Response()
+    r.status_code = status
+    r._content = json.dumps(j or {}).encode("UTF-8")
+    return r
+
+class RetryTests(unittest.TestCase):
+    def helix(self, *rs, attempts=3):
+        h = Helix(token="token", retry=RetryPolicy(attempts=attempts, base=0))
+        rs = list(rs)
+        def send(preq, timeout):
+            r = rs.pop(0)
+            if isinstance(r, Exception):
+                raise r
+            return r
+        h.session.send = send
+        return h
+
+    def test_transient(self):
+        h = self.helix(
+            requests.exceptions.ConnectionError(),
+            response(503),
+            response(200, { "data": [ 1, 2 ] }),
+        )
+        assert list(h.paginate("/foo", params={})) == [ 1, 2 ]
+        assert h.stats["retries"] == 2
+        assert h.stats["requests"] == 3
+        # every attempt queued
+        assert h.waits.n == { Priority.INTERACTIVE: 3 }
+
+    def test_give_up(self):
+        h = self.helix(response(503), response(503), attempts=2)
+        with self.assertRaises(requests.exceptions.HTTPError):
+            list(h.paginate("/foo", params={}))
+        assert h.stats["retries"] == 1
+
+    def test_throttled(self):
+        # always throttled, until a reset that is always just ahead
+        def throttled(preq, timeout):
+            r = response(429)
+            r.headers.update({ "Ratelimit-Limit": "800", "Ratelimit-Remaining": "0", "Ratelimit-Reset": str(time.time() + 0.01) })
+            return r
+        h = self.helix()
+        h.session.send = throttled
+        with self.assertRaises(requests.exceptions.HTTPError):
+            list(h.paginate("/foo", params={}))
+        assert h.stats["requests"] == 3
+        assert h.stats["throttled"] >= 1
+
+    def test_shared_once(self):
+        with tempfile.TemporaryDirectory() as d:
+            shared = SharedState(os.path.join(d, "shared.json"))
+            updates = 0
+            update = shared.update
+            def counted():
+                nonlocal updates
+                updates += 1
+                return update()
+            shared.update = counted
+
+            rsp = lambda: MemoryTransport.response(200, { "data": [ 1 ] }, headers={ "Ratelimit-Limit": "800", "Ratelimit-Remaining": "700", "Ratelimit-Reset": str(time.time() + 60) })
+            h = Helix(token="token", shared=shared, transport=MemoryTransport(lambda preq: rsp()))
+            for _ in range(3):
+                list(h.paginate("/foo", params={}))
+            # one locked update per request, the last rate limit is shared on exit
+            assert updates == 3
+            assert shared.ratelimit().remaining == 699
+            h.share_ratelimit()
+            assert updates == 4
+            assert shared.ratelimit().remaining == 700
+
+    def test_client_error(self):
+        h = self.helix(response(400))
+        with self.assertRaises(requests.exceptions.HTTPError):
+            list(h.paginate("/foo", params={}))
+        assert h.stats["retries"] == 0
+
+class HedgeTests(unittest.TestCase):
+    # the first request takes delays[0], its hedge delays[1]
+    def helix(self, *delays):
+        self.closed = [ threading.Event() for _ in delays ]
+        delays = list(delays)
+        lock = threading.Lock()
+        def handler(preq):
+            with lock:
+                i = len(self.closed) - len(delays)
+                d = delays.pop(0)
+            r = MemoryTransport.response(200, { "data": [ i ] })
+            r.close = self.closed[i].set
+            time.sleep(d)
+            return r
+        h = Helix(token="token", hedge=True, transport=MemoryTransport(handler))
+        # a p95 of 10ms
+        h.latencies.extend([ 0.01 ] * 20)
+        return h
+
+    def test_hedge_wins(self):
+        h = self.helix(0.5, 0)
+        assert list(h.paginate("/foo", params={})) == [ 1 ]
+        assert h.stats["requests"] == 2
+        assert h.stats["hedges"] == 1
+        assert h.stats["hedge_wins"] == 1
+        # the response that lost is closed once it arrives
+        assert self.closed[0].wait(timeout=5)
+        assert not self.closed[1].is_set()
+
+    def test_hedge_loses(self):
+        h = self.helix(0.05, 0.5)
+        assert list(h.paginate("/foo", params={})) == [ 0 ]
+        assert h.stats["hedges"] == 1
+        assert h.stats["hedge_wins"] == 0
+        assert self.closed[1].wait(timeout=5)
+        assert not self.closed[0].is_set()
+
+    def test_fast(self):
+        h = self.helix(0)
+        assert list(h.paginate("/foo", params={})) == [ 0 ]
+        assert h.stats["requests"] == 1
+        assert h.stats["hedges"] == 0
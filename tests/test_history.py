@@ -0,0 +1,118 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, UTC
+
+from twitch_cli.history import DAYS, History, Scheduler
+from twitch_cli.model import Game, Stream, User
+
+class HistoryTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "history.ndjson")
+        self.polled_path = os.path.join(self.tmp.name, "polled.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def history(self, now=None):
+        return History(path=self.path, polled_path=self.polled_path, now=now)
+
+    def stream(self, u, id, started_at):
+        return Stream(id=id, title="", user=u, started_at=started_at, game=Game(id="0"))
+
+    def test_sessions(self):
+        u = User(id="1")
+        t0 = datetime(2025, 1, 1, 20, tzinfo=UTC)
+
+        h = self.history()
+        h.observe([u], [self.stream(u, "a", t0)], t0 + timedelta(minutes=1))
+        assert h.open_session("1") is not None
+        h.observe([u], [], t0 + timedelta(hours=2))
+        assert h.open_session("1") is None
+
+        h = self.history(now=t0 + timedelta(hours=3))
+        assert len(h.sessions["1"]) == 1
+        s = h.sessions["1"][0]
+        assert s.started_at == t0
+        assert s.ended_at == t0 + timedelta(hours=2)
+        assert h.polled["1"] == t0 + timedelta(hours=2)
+
+    def test_likelihood(self):
+        u, v = User(id="1"), User(id="2")
+        h = self.history()
+        now = datetime(2025, 2, 1, 19, 45, tzinfo=UTC)
+        for d in range(1, 8):
+            t = now - timedelta(days=d) + timedelta(minutes=15)
+            h.observe([u], [self.stream(u, str(d), t)], t)
+            h.observe([u], [], t + timedelta(hours=3))
+
+        assert h.likelihood("1", now, days=7) == 1.0
+        assert 0 < h.likelihood("1", now, days=28) < 1.0
+        assert h.likelihood("1", now + timedelta(hours=12), days=7) == 0.0
+        assert h.likelihood("2", now) == 0.0
+
+        s = Scheduler(h, max_period=timedelta(hours=1))
+        assert s.due([u, v], now) == [u, v]
+
+        h.observe([u, v], [], now)
+        assert s.due([u, v], now + timedelta(minutes=5)) == []
+        assert s.due([u, v], now + timedelta(minutes=15)) == [u]
+        assert s.due([u, v], now + timedelta(hours=1)) == [u, v]
+
+    def test_concurrent(self):
+        u, v = User(id="1", login="a"), User(id="2", login="b")
+        t0 = datetime(2025, 1, 1, 20, tzinfo=UTC)
+
+        # a long-lived instance sees what another one appended
+        h, other = self.history(now=t0), self.history(now=t0)
+        h.observe([u], [self.stream(u, "a", t0)], t0)
+        other.observe([v], [self.stream(v, "b", t0)], t0)
+        h.observe([u], [self.stream(u, "a", t0)], t0 + timedelta(minutes=1))
+        assert { x.id for x in h.open_users() } == { "1", "2" }
+        # ... and doesn't start a session that was already started
+        other.observe([u], [self.stream(u, "a", t0)], t0 + timedelta(minutes=1))
+        with open(self.path) as f:
+            assert len(f.readlines()) == 2
+
+        # ... or what another one rewrote
+        other.observe([v], [], t0 + timedelta(hours=1))
+        other.compact(t0 + timedelta(days=DAYS, hours=1))
+        h.observe([u], [], t0 + timedelta(days=DAYS, hours=2))
+        assert "2" not in h.sessions
+        assert h.open_users() == []
+        with open(self.path) as f:
+            assert len(f.readlines()) == 2
+
+    def test_compact(self):
+        u, v = User(id="1", login="a"), User(id="2", login="b")
+        t0 = datetime(2025, 1, 1, 20, tzinfo=UTC)
+
+        h = self.history(now=t0)
+        for d in range(10):
+            t = t0 + timedelta(days=d)
+            h.observe([u], [self.stream(u, str(d), t)], t)
+            h.observe([u], [], t + timedelta(hours=1))
+        h.observe([v], [self.stream(v, "v", t0)], t0)
+        with open(self.path) as f:
+            assert len(f.readlines()) == 21
+
+        # the first of u's sessions is too old to matter, but not yet worth
+        # rewriting the log for
+        now = t0 + timedelta(days=29)
+        h = self.history(now=now)
+        assert len(h.sessions["1"]) == 9
+        with open(self.path) as f:
+            assert len(f.readlines()) == 21
+
+        # v's session is still open
+        now = t0 + timedelta(days=35)
+        h = self.history(now=now)
+        assert len(h.sessions["1"]) == 3
+        assert h.open_users() == [v]
+        with open(self.path) as f:
+            assert len(f.readlines()) == 7
+
+        h = self.history(now=now)
+        assert len(h.sessions["1"]) == 3
+        assert h.logins == { "1": "a", "2": "b" }
@@ -0,0 +1,70 @@
+import argparse
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, UTC
+from unittest import mock
+
+import requests
+
+from twitch_cli import lastknown
+from twitch_cli.lastknown import LastKnown, last_known
+
+class LastKnownTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "live.pickle")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def args(self, offline=False, swr=None):
+        return argparse.Namespace(offline=offline, stale_while_revalidate=swr)
+
+    def test_merge(self):
+        a, b = LastKnown("a", path=self.path), LastKnown("b", path=self.path)
+        a.put("x", 1)
+        a.save()
+        b.put("y", 2)
+        b.put("old", 3, at=datetime.now(UTC) - timedelta(days=31))
+        b.save()
+        assert { k: v for k, (v, _) in LastKnown("c", path=self.path).entries.items() } == { "x": 1, "y": 2 }
+
+    def test_lazy(self):
+        a = LastKnown("a", path=self.path)
+        a.put("x", 1)
+        a.save()
+
+        b = LastKnown("b", path=self.path)
+        with mock.patch.object(b, "_load", wraps=b._load) as load:
+            b.put("y", 2)
+            assert b.get("y")[0] == 2
+            assert load.call_count == 0
+            assert b.get("x")[0] == 1
+            assert b.get("z") is None
+            assert load.call_count == 1
+
+    def test_offline(self):
+        def fetch():
+            raise AssertionError("fetched while offline")
+        assert last_known(self.args(offline=True), None, fetch, print) == (None, None)
+        at = datetime.now(UTC)
+        assert last_known(self.args(offline=True), (1, at), fetch, print) == (1, at)
+
+    def test_unreachable(self):
+        def fetch():
+            raise requests.exceptions.ConnectionError()
+        at = datetime.now(UTC)
+        assert last_known(self.args(), (1, at), fetch, print) == (1, at)
+        with self.assertRaises(requests.exceptions.ConnectionError):
+            last_known(self.args(), None, fetch, print)
+
+    def test_stale_while_revalidate(self):
+        at = datetime.now(UTC) - timedelta(minutes=5)
+        remembered = []
+        with mock.patch.object(lastknown, "revalidate") as revalidate:
+            assert last_known(self.args(swr=timedelta(hours=1)), (1, at), lambda: 2, remembered.append) == (1, at)
+            revalidate.assert_called_once()
+
+            assert last_known(self.args(swr=timedelta(minutes=1)), (1, at), lambda: 2, remembered.append) == (2, None)
+            assert remembered == [ 2 ]
@@ -0,0 +1,43 @@
+import threading
+import unittest
+
+from twitch_cli.loader import Loader
+
+class LoaderTests(unittest.TestCase):
+    def test_batches(self):
+        calls = []
+        def batch(ks):
+            calls.append(list(ks))
+            return { k: k * 2 for k in ks }
+        l = Loader(batch, max_batch=100)
+        fs = l.load_many(range(250))
+        assert { k: f.result() for k, f in fs.items() } == { k: k * 2 for k in range(250) }
+        assert sorted(len(c) for c in calls) == [ 50, 100, 100 ]
+
+    def test_coalesce(self):
+        release = threading.Event()
+        calls = []
+        def batch(ks):
+            calls.append(list(ks))
+            release.wait()
+            return { k: k for k in ks }
+        l = Loader(batch, window=0)
+        f = l.load("a")
+        while not calls:
+            release.wait(0.001)
+        assert l.load("a") is f
+        release.set()
+        assert f.result() == "a"
+        assert calls == [ [ "a" ] ]
+        assert l.stats["coalesced"] == 1
+
+    def test_missing_and_errors(self):
+        l = Loader(lambda ks: {})
+        assert l.load_many([ "a" ])["a"].result() is None
+
+        def fail(ks):
+            raise RuntimeError("boom")
+        l = Loader(fail)
+        fs = l.load_many([ "a", "b" ])
+        for f in fs.values():
+            assert isinstance(f.exception(), RuntimeError)
@@ -0,0 +1,30 @@
+import tracemalloc
+import unittest
+
+from twitch_cli.memstats import MemStats, rss
+
+def allocate():
+    return [ bytearray(1024) for _ in range(1000) ]
+
+class MemStatsTests(unittest.TestCase):
+    def test_report(self):
+        ms = MemStats()
+        self.addCleanup(tracemalloc.stop)
+        held = [ bytearray(1024) for _ in range(1000) ]
+        r = ms.report()
+        assert "top growing allocation sites:" in r
+        assert __file__ in r
+        assert rss() > 0
+        del held
+
+    def test_shrunk(self):
+        tracemalloc.start()
+        self.addCleanup(tracemalloc.stop)
+        freed = allocate()
+        ms = MemStats()
+        del freed
+        held = [ bytearray(1024) for _ in range(100) ]
+        r = ms.report()
+        assert f"{__file__}:{allocate.__code__.co_firstlineno + 1}" not in r
+        assert __file__ in r
+        del held
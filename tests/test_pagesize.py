@@ -0,0 +1,25 @@
+import unittest
+from datetime import timedelta
+
+from twitch_cli import pagesize
+
+class PageSizeTests(unittest.TestCase):
+    def test_period(self):
+        assert pagesize.period(timedelta(hours=12)) == "day"
+        assert pagesize.period(timedelta(days=3)) == "week"
+        assert pagesize.period(timedelta(days=7)) == "week"
+        assert pagesize.period(timedelta(days=8)) == "month"
+        assert pagesize.period(timedelta(days=90)) is None
+
+    def test_page_size(self):
+        w = timedelta(days=3)
+        assert pagesize.page_size(None, w) == pagesize.DEFAULT_PAGE_SIZE
+        assert pagesize.page_size(0, w) == 1
+        assert pagesize.page_size(1, w) == 6
+        assert pagesize.page_size(1000, w) == pagesize.MAX_PAGE_SIZE
+
+    def test_rate(self):
+        w = timedelta(days=2)
+        assert pagesize.rate(None, 4, w) == 2
+        assert pagesize.rate(2, 0, w) == 1
+        assert pagesize.rate(None, 1, timedelta(0)) == 24
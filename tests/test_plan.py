@@ -0,0 +1,100 @@
+import os
+from datetime import datetime, UTC
+from unittest import mock
+
+from twitch_cli.app import live_plans, plan_live
+from twitch_cli.cli import check_args, main_parser
+from twitch_cli.completion import remember_following
+from twitch_cli.config import Filter
+from twitch_cli.history import History
+
+from .helpers import FOLLOWED, AppTestCase, followed, stream
+
+# the live channels, and their games
+LIVE = { "u1": "1", "u3": "2", "u9": "1" }
+
+class PlanTests(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.now = datetime.now(UTC)
+
+    def handler(self, path, qs):
+        match path:
+            case "/channels/followed":
+                return followed(FOLLOWED)
+            case "/streams/followed":
+                return [ stream(l, LIVE[l]) for l in LIVE if l in FOLLOWED ]
+            case "/streams" if "game_id" in qs and "user_login" not in qs:
+                return [ stream(l, g) for l, g in LIVE.items() if g in qs["game_id"] ]
+            case "/streams":
+                return [ stream(l, LIVE[l]) for l in LIVE if l in qs.get("user_login", []) or l[1:] in qs.get("user_id", []) ]
+            case "/games":
+                return [ { "id": n.removeprefix("Game "), "name": n } for n in qs["name"] ]
+            case _:
+                raise AssertionError(path)
+
+    def plan(self, *argv):
+        args = main_parser().parse_args([ "live", "-F", *argv ])
+        return plan_live(self.app, args, Filter(), History(), self.now)
+
+    def test_following(self):
+        p = self.plan()
+        assert p.shape == "streams/followed"
+        assert p.cost == 1
+        ss, polled = p.fetch()
+        assert { s.user.login for s in ss } == { "u1", "u3" }
+        assert self.requests == { "/streams/followed": 1 }
+
+    def test_numeric_logins(self):
+        path = os.path.join(self.tmp.name, "lists.yaml")
+        with open(path, "w") as f:
+            f.write("friends: [ 1234, u9 ]\n")
+        p = self.plan("--lists", path, "-l", "friends")
+        assert p.shape == "streams?user_login"
+        ss, _ = p.fetch()
+        assert { s.user.login for s in ss } == { "u9" }
+
+    def test_logins(self):
+        p = self.plan(*[ f"x{i}" for i in range(150) ], "u9")
+        assert p.shape == "streams?user_login"
+        assert p.cost == 2
+        ss, _ = p.fetch()
+        assert { s.user.login for s in ss } == { "u9" }
+        assert self.requests == { "/streams": 2 }
+
+    def test_adaptive(self):
+        # asked for, even though it's more expensive
+        p = self.plan("--adaptive")
+        assert p.shape == "channels/followed+streams?user_id"
+        assert p.cost > self.plan().cost
+        ss, polled = p.fetch()
+        assert { s.user.login for s in ss } == { "u1", "u3" }
+        assert { u.login for u in polled } == set(FOLLOWED)
+        assert self.requests == { "/channels/followed": 1, "/streams": 1 }
+
+    def test_adaptive_channels(self):
+        parser = main_parser()
+        with mock.patch("sys.stderr"), self.assertRaises(SystemExit):
+            check_args(parser, parser.parse_args([ "live", "--adaptive", "u1" ]))
+
+    def test_game_logins(self):
+        logins = [ f"x{i}" for i in range(250) ] + [ "u1", "u3" ]
+        p = self.plan("--game", "Game 1", *logins)
+        assert p.shape == "streams?game_id"
+        ss, _ = p.fetch()
+        assert { s.user.login for s in ss } == { "u1" }
+        assert self.requests == { "/games": 1, "/streams": 1 }
+
+    def test_game_following(self):
+        # the followed channels must be paged through, cached or not, which
+        # makes following cheaper
+        assert self.plan("--game", "Game 1").shape == "streams/followed"
+        remember_following([ "u2" ])
+        assert self.plan("--game", "Game 1").shape == "streams/followed"
+
+        # a stale cache doesn't lose the channels followed since
+        args = main_parser().parse_args([ "live", "-F", "--game", "Game 1" ])
+        p, = [ p for p in live_plans(self.app, args, Filter(), History(), self.now) if p.shape == "streams?game_id" ]
+        ss, _ = p.fetch()
+        assert { s.user.login for s in ss } == { "u1" }
+        assert self.requests["/channels/followed"] == 1
@@ -0,0 +1,45 @@
+import threading
+import time
+import unittest
+
+from twitch_cli.helix import Helix
+from twitch_cli.priority import Admission, Priority, prioritized
+from twitch_cli.transport import MemoryTransport
+
+class AdmissionTests(unittest.TestCase):
+    def test_order(self):
+        a = Admission(1)
+        assert a.acquire(Priority.BACKGROUND)
+
+        order = []
+        def wait(p, i):
+            assert a.acquire(p)
+            order.append((p, i))
+            a.release()
+        ts = []
+        for p, i in [ (Priority.BACKGROUND, 0), (Priority.BACKGROUND, 1), (Priority.INTERACTIVE, 2) ]:
+            ts.append(threading.Thread(target=wait, args=(p, i)))
+            ts[-1].start()
+            while len(a.waiting) < len(ts):
+                time.sleep(0.001)
+
+        a.release()
+        for t in ts:
+            t.join()
+        assert order == [ (Priority.INTERACTIVE, 2), (Priority.BACKGROUND, 0), (Priority.BACKGROUND, 1) ]
+
+    def test_timeout(self):
+        a = Admission(1)
+        assert a.acquire(Priority.INTERACTIVE)
+        assert not a.acquire(Priority.INTERACTIVE, timeout=0.01)
+        assert a.waiting == []
+
+class PriorityTests(unittest.TestCase):
+    def test_waits(self):
+        h = Helix(token="token", transport=MemoryTransport(lambda preq: { "data": [] }), priority=Priority.BACKGROUND)
+        h.req("GET", "/foo")
+        with prioritized(Priority.INTERACTIVE):
+            assert h.priority is Priority.INTERACTIVE
+            h.req("GET", "/foo")
+        assert h.priority is Priority.BACKGROUND
+        assert list(h.waits.summary()) == [ "interactive", "background" ]
@@ -0,0 +1,121 @@
+import os
+import textwrap
+from unittest import mock
+
+from twitch_cli import app
+from twitch_cli.app import App
+from twitch_cli.cli import check_args, main_parser
+from twitch_cli.completion import remember_following
+from twitch_cli.runner import Runner, load_profiles
+
+from .helpers import FOLLOWED, AppTestCase, followed, stream, users, video
+
+LIVE = [ "u1", "u3", "u9" ]
+
+class RunnerTests(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.write("filter.yaml", "exclude:\n  user: [ u3 ]\n")
+        self.write("lists.yaml", "friends: [ u1, u2 ]\nothers: [ u2, u9 ]\nall: [ u1, u2, u3, u9 ]\n")
+        self.write("profiles.yaml", f"""
+            following:
+              output: {self.tmp.name}/following
+            friends:
+              output: {self.tmp.name}/friends
+              lists: {self.tmp.name}/lists.yaml
+              list: [ friends ]
+            unfiltered:
+              output: {self.tmp.name}/unfiltered
+              filter: {self.tmp.name}/filter.yaml
+              channel: [ u3, u9 ]
+              no_filter: true
+            filtered:
+              output: {self.tmp.name}/filtered
+              filter: {self.tmp.name}/filter.yaml
+        """)
+        self.runner = Runner(self.app, load_profiles(os.path.join(self.tmp.name, "profiles.yaml")))
+
+    def write(self, name, s):
+        with open(os.path.join(self.tmp.name, name), "w") as f:
+            f.write(textwrap.dedent(s))
+
+    def read(self, profile, name):
+        with open(os.path.join(self.tmp.name, profile, name)) as f:
+            return f.read()
+
+    def handler(self, path, qs):
+        match path:
+            case "/channels/followed":
+                return followed(FOLLOWED)
+            case "/streams/followed":
+                return [ stream(l) for l in LIVE if l in FOLLOWED ]
+            case "/streams":
+                self.queried = sorted(qs["user_login"])
+                return [ stream(l) for l in qs["user_login"] if l in LIVE ]
+            case "/users":
+                return users(qs["login"])
+            case "/videos":
+                return [ video("u" + qs["user_id"][0]) ]
+            case _:
+                raise AssertionError(path)
+
+    def test_live(self):
+        self.runner.live()
+        assert self.requests == { "/streams/followed": 1, "/streams": 1 }
+
+        # once fetched for the videos, the followed channels aren't asked
+        # about by login
+        self.runner.videos()
+        self.requests.clear()
+        self.runner.live()
+        assert self.requests == { "/streams/followed": 1, "/streams": 1 }
+        assert self.queried == [ "u9" ]
+
+        assert "U1" in self.read("following", "live.twitch")
+        assert "U3" in self.read("following", "live.twitch")
+        assert "U1" in self.read("friends", "live.twitch")
+        assert "U3" not in self.read("friends", "live.twitch")
+        assert "U3" in self.read("unfiltered", "live.twitch")
+        assert "U9" in self.read("unfiltered", "live.twitch")
+        assert "U1" in self.read("filtered", "live.twitch")
+        assert "U3" not in self.read("filtered", "live.twitch")
+
+    def test_videos(self):
+        self.runner.videos()
+        # u1, u2 and u3 are followed, u9 isn't
+        assert self.requests["/videos"] == 4
+
+        assert all(f"U{i}" in self.read("following", "videos.twitch") for i in [ 1, 2, 3 ])
+        assert "U3" not in self.read("filtered", "videos.twitch")
+        assert "U9" in self.read("unfiltered", "videos.twitch")
+        assert "U9" not in self.read("friends", "videos.twitch")
+
+    def test_views_args(self):
+        parser = main_parser()
+        for a in [ [ "--game", "Game" ], [ "--adaptive" ], [ "--offline" ], [ "--stale-while-revalidate", "1m" ] ]:
+            with mock.patch("sys.stderr"), self.assertRaises(SystemExit):
+                check_args(parser, parser.parse_args([ "live", "--views", self.tmp.name, *a ]))
+
+    def test_views(self):
+        args = main_parser().parse_args([ "live", "--views", self.tmp.name, "--lists", os.path.join(self.tmp.name, "lists.yaml"), "u3" ])
+        with mock.patch.object(App, "from_args", lambda args: self.app):
+            app.do_live(args)
+        assert self.requests == { "/streams/followed": 1, "/streams": 1 }
+
+        views = { n: self.read(".", n) for n in [ "live.twitch", "live-friends.twitch", "live-others.twitch", "live-all.twitch", "live-channels.twitch" ] }
+        assert [ l for l in [ "U1", "U3", "U9" ] if l in views["live-all.twitch"] ] == [ "U1", "U3", "U9" ]
+        assert [ l for l in [ "U1", "U3", "U9" ] if l in views["live-others.twitch"] ] == [ "U9" ]
+        assert [ l for l in [ "U1", "U3", "U9" ] if l in views["live-channels.twitch"] ] == [ "U3" ]
+
+    def test_views_stale(self):
+        # u9 was followed when completion last remembered the follows
+        remember_following([ "u1", "u9" ])
+        self.write("lists.yaml", "friends: [ u9 ]\nempty: []\n")
+        args = main_parser().parse_args([ "live", "--views", self.tmp.name, "--lists", os.path.join(self.tmp.name, "lists.yaml") ])
+        with mock.patch.object(App, "from_args", lambda args: self.app):
+            app.do_live(args)
+
+        assert "U9" in self.read(".", "live-friends.twitch")
+        assert "U1" in self.read(".", "live.twitch")
+        # an empty list isn't the follows
+        assert "U1" not in self.read(".", "live-empty.twitch")
@@ -0,0 +1,48 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, UTC
+
+from twitch_cli.model import User, Video
+from twitch_cli.search import Index, Indexer
+
+class SearchTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "titles.ndjson")
+        self.snapshot_path = os.path.join(self.tmp.name, "titles.index.pickle")
+        self.t0 = datetime(2025, 1, 1, tzinfo=UTC)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def video(self, id, title, days=0):
+        t = self.t0 + timedelta(days=days)
+        return Video(id=id, title=title, user=User(id="1", login="foo"), url=f"https://www.twitch.tv/videos/{id}",
+                     duration=timedelta(hours=1), created_at=t, published_at=t)
+
+    def index(self, *vs):
+        i = Indexer(self.path)
+        for v in vs:
+            i(v)
+        i.flush()
+        return Index(self.path, snapshot_path=self.snapshot_path)
+
+    def test_search(self):
+        ix = self.index(
+            self.video("1", "Any% Speedrun attempts", days=0),
+            self.video("2", "chill stream", days=1),
+            self.video("3", "speedrun practice", days=2),
+        )
+        assert [ d.id for d in ix.search("speedrun") ] == [ "3", "1" ]
+        assert [ d.id for d in ix.search("SPEEDRUN any") ] == [ "1" ]
+        assert [ d.id for d in ix.search("ch") ] == [ "2" ]
+        assert ix.search("marathon") == []
+
+    def test_incremental(self):
+        self.index(self.video("1", "speedrun"))
+        ix = self.index(self.video("1", "speedrun"), self.video("1", "marathon"), self.video("2", "speedrun"))
+        assert [ d.id for d in ix.search("speedrun") ] == [ "2" ]
+        assert [ d.id for d in ix.search("marathon") ] == [ "1" ]
+        with open(self.path) as f:
+            assert len(f.readlines()) == 3
@@ -0,0 +1,53 @@
+import os
+import tempfile
+import unittest
+
+from twitch_cli.seen import BloomFilter, Seen
+
+class BloomFilterTests(unittest.TestCase):
+    def test_no_false_negatives(self):
+        b = BloomFilter(1000)
+        for i in range(1000):
+            b.add(str(i))
+        assert all(str(i) in b for i in range(1000))
+
+    def test_error_rate(self):
+        b = BloomFilter(1000, error_rate=0.01)
+        for i in range(1000):
+            b.add(str(i))
+        fp = sum(str(i) in b for i in range(1000, 11000))
+        assert fp < 300
+
+class SeenTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "seen.txt")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_persisted(self):
+        s = Seen(self.path)
+        assert "1" not in s
+        s.add([ "1", "2", "1" ])
+        assert "1" in s and "2" in s and "3" not in s
+
+        t = Seen(self.path)
+        assert "1" in t and "2" in t and "3" not in t
+        with open(self.path) as f:
+            assert f.read().split() == [ "1", "2" ]
+
+    def test_catch_up(self):
+        Seen(self.path).add([ "1" ])
+        with open(self.path, "a") as f:
+            f.write("2\n")
+        s = Seen(self.path)
+        assert "2" in s.bloom
+        assert "2" in s
+
+    def test_grow(self):
+        s = Seen(self.path, capacity=10)
+        s.add(str(i) for i in range(100))
+        assert s.bloom.capacity >= 100
+        t = Seen(self.path, capacity=10)
+        assert all(str(i) in t for i in range(100))
@@ -0,0 +1,130 @@
+import argparse
+import json
+import os
+import socket
+import stat
+import threading
+import time
+from datetime import timedelta
+from unittest import mock
+
+from twitch_cli.app import call_server
+from twitch_cli.client import Client, notify
+from twitch_cli.lastknown import LastKnown
+from twitch_cli.server import Server
+from twitch_cli.stats import Store
+
+from .helpers import AppTestCase, followed, stream, users, video
+
+class ServerTests(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.path = os.path.join(self.tmp.name, "run", "twitch.sock")
+        self.patch_env({ "TWITCH_CLI_SOCKET": self.path })
+
+    def handler(self, path, qs):
+        match path:
+            case "/streams/followed":
+                return [ stream("u1") ]
+            case "/channels/followed":
+                return followed([ "u1" ])
+            case "/users":
+                return users(qs.get("login", []))
+            case "/videos":
+                return [ video("u1", id=i) for i in qs["id"] ]
+            case _:
+                raise AssertionError(path)
+
+    def args(self, **kwargs):
+        return argparse.Namespace(**{ "no_server": False, "replay": None, "deadline": None, **kwargs })
+
+    def serve(self) -> Server:
+        server = Server(self.app, path=self.path, period=timedelta(hours=1))
+        t = threading.Thread(target=server.serve_forever, daemon=True)
+        t.start()
+        def stop():
+            server.shutdown()
+            t.join(timeout=5)
+        self.addCleanup(stop)
+        for _ in range(500):
+            if server.srv is not None:
+                break
+            time.sleep(0.01)
+        return server
+
+    def test_call(self):
+        self.serve()
+        with Client.connect() as c:
+            assert [ s["user_login"] for s in c.call("live")["streams"] ] == [ "u1" ]
+            assert c.call("channels", channels=[ "U2" ]) == [ { "id": "2", "login": "u2", "display_name": "U2" } ]
+        assert call_server(self.args(), "channels") == [ { "id": "1", "login": "u1", "display_name": "U1" } ]
+
+    # like handler threads do, each flushing after its request
+    def test_flush(self):
+        server = Server(self.app, path=self.path)
+        def request(t):
+            for n in range(0, 1000, 250):
+                server.do_videos_by_id([ str(t * 1000 + i) for i in range(n, n + 250) ])
+                server.app.flush()
+        ts = [ threading.Thread(target=request, args=(t,)) for t in range(8) ]
+        for t in ts:
+            t.start()
+        for t in ts:
+            t.join()
+        server.app.flush()
+        assert len(LastKnown("videos").entries) == 8 * 1000
+        assert len(Store().videos.read()["id"]) == 8 * 1000
+
+    def test_malformed(self):
+        self.serve()
+        s = Client.open(self.path)
+        assert s is not None
+        with Client(s) as c:
+            for l in [ b"nope\n", b"[]\n", b"{}\n" ]:
+                c.f.write(l)
+                c.f.flush()
+                assert "malformed request" in json.loads(c.f.readline())["error"]
+            # the connection is still good
+            assert c.call("channels", channels=[ "u2" ])[0]["login"] == "u2"
+
+    def test_subscribe(self):
+        server = self.serve()
+        # once subscribed, which is on the first event asked for
+        def notifier():
+            while not server.subscribers:
+                time.sleep(0.01)
+            notify("foo")
+        threading.Thread(target=notifier, daemon=True).start()
+        with Client.connect() as c:
+            events = c.events()
+            # skipping the snapshots the refresher publishes
+            e = next(e for e in events if e["event"] == "updated")
+            assert e["path"] == os.path.abspath("foo")
+
+    def test_fallback(self):
+        # nothing is listening
+        assert Client.connect() is None
+        assert call_server(self.args(), "channels") is None
+
+        self.serve()
+        assert call_server(self.args(no_server=True), "channels") is None
+        with mock.patch.dict(os.environ, { "TWITCH_CLI_NO_SERVER": "1" }):
+            assert Client.connect() is None
+            assert call_server(self.args(), "channels") is None
+
+    def test_socket(self):
+        # left behind by a server that died
+        os.makedirs(os.path.dirname(self.path))
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as s:
+            s.bind(self.path)
+
+        self.serve()
+        assert stat.S_IMODE(os.stat(self.path).st_mode) == 0o600
+        # a running server isn't replaced, even if clients are told to
+        # ignore it
+        with mock.patch.dict(os.environ, { "TWITCH_CLI_NO_SERVER": "1" }):
+            with self.assertRaises(RuntimeError):
+                Server(self.new_app(), path=self.path).serve_forever()
+        c = Client.connect()
+        assert c is not None
+        c.close()
@@ -0,0 +1,52 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, UTC
+
+from twitch_cli.oauth import Token
+from twitch_cli.priority import Priority
+from twitch_cli.shared import RateLimit, SharedState
+
+class SharedStateTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "shared.json")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def test_ratelimit(self):
+        a, b = SharedState(self.path), SharedState(self.path)
+        assert a.acquire(now=100) == 0
+
+        a.set_ratelimit(RateLimit(limit=800, remaining=2, reset=160))
+        assert a.acquire(now=100) == 0
+        assert b.acquire(now=100) == 0
+        assert a.acquire(now=100) == 60
+        assert b.ratelimit() == RateLimit(limit=800, remaining=0, reset=160)
+        assert b.acquire(now=160) == 0
+
+    def test_background(self):
+        a, b = SharedState(self.path), SharedState(self.path)
+        a.set_ratelimit(RateLimit(limit=800, remaining=81, reset=160))
+        assert a.acquire(now=100, p=Priority.BACKGROUND) == 0
+        # the rest is reserved for interactive requests
+        assert a.acquire(now=100, p=Priority.BACKGROUND) == 60
+        assert b.acquire(now=100) == 0
+
+        # which hold back background requests for a while
+        self.assertAlmostEqual(a.acquire(now=100.1, p=Priority.BACKGROUND), 0.4)
+        a.set_ratelimit(RateLimit(limit=800, remaining=800, reset=160))
+        assert a.acquire(now=101, p=Priority.BACKGROUND) == 0
+
+    def test_token(self):
+        a, b = SharedState(self.path), SharedState(self.path)
+        assert b.token() is None
+
+        now = datetime.now(UTC).replace(microsecond=0)
+        t = Token(value="foo", expires=now + timedelta(hours=1), created=now, meta={ "login": "bar" })
+        a.set_token(t)
+        assert b.token() == t
+
+        a.set_token(Token(value="foo", expires=now - timedelta(hours=1)))
+        assert b.token() is None
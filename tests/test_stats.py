@@ -0,0 +1,97 @@
+import os
+import tempfile
+import unittest
+from datetime import datetime, timedelta, UTC
+from unittest import mock
+
+from twitch_cli.cli import check_args, main_parser
+from twitch_cli.model import Game, Stream, User, Video
+from twitch_cli.stats import Recorder, Store
+
+class StatsTests(unittest.TestCase):
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, "stats")
+        self.t0 = datetime(2025, 1, 1, tzinfo=UTC)
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def video(self, id, user, hours, days=0):
+        t = self.t0 + timedelta(days=days)
+        return Video(id=id, title="", user=User(id=user, login=f"u{user}", name=f"U{user}"), url="",
+                     duration=timedelta(hours=hours), created_at=t, published_at=t)
+
+    def stream(self, id, user, game):
+        return Stream(id=id, title="", user=User(id=user, login=f"u{user}", name=f"U{user}"),
+                      started_at=self.t0, game=Game(id=game, name=f"G{game}"))
+
+    def groups(self, *args, **kwargs):
+        return { g.key: g for g in Store(self.path).aggregate(*args, **kwargs) }
+
+    def test_videos(self):
+        r = Recorder(Store(self.path))
+        for v in [ self.video("1", "1", 1), self.video("2", "1", 3, days=10), self.video("3", "2", 2) ]:
+            r(v)
+        r.flush()
+
+        # a growing video is updated in place
+        r(self.video("3", "2", 4))
+        r.flush()
+
+        gs = self.groups("videos", by=[ "channel" ])
+        assert gs.keys() == { ("U1",), ("U2",) }
+        assert gs[("U1",)].count == 2
+        assert gs[("U1",)].total == 4 * 3600
+        assert gs[("U1",)].median == 2 * 3600
+        assert gs[("U2",)].max == 4 * 3600
+
+        gs = self.groups("videos", by=[], since=self.t0 + timedelta(days=1))
+        assert gs[()].count == 1
+
+        gs = self.groups("videos", by=[ "channel" ], logins={ "U2" })
+        assert gs.keys() == { ("U2",) }
+
+        with self.assertRaises(ValueError):
+            self.groups("videos", by=[ "game" ])
+
+    def test_streams(self):
+        s = Store(self.path)
+        s.add([ (self.stream("1", "1", "7"), self.t0 + timedelta(minutes=10)) ])
+        s.add([ (self.stream("1", "1", "7"), self.t0 + timedelta(minutes=30)) ])
+        s.add([ (self.stream("2", "2", "8"), self.t0 + timedelta(hours=1)) ])
+
+        gs = self.groups("streams", by=[ "game", "channel" ])
+        assert gs.keys() == { ("G7", "U1"), ("G8", "U2") }
+        assert gs[("G7", "U1")].total == 30 * 60
+        assert gs[("G8", "U2")].total == 3600
+
+    def test_partial_append(self):
+        s = Store(self.path)
+        s.add([ (self.video("1", "1", 1), self.t0) ])
+        with open(s.videos.column_path("id"), "ab") as f:
+            f.write(b"\0" * 8)
+
+        assert self.groups("videos", by=[])[()].count == 1
+        s.add([ (self.video("2", "1", 1), self.t0) ])
+        assert self.groups("videos", by=[])[()].count == 2
+
+    def test_index(self):
+        s = Store(self.path)
+        s.videos.reindex = 4
+        for d in range(10):
+            s.add([ (self.video(str(d * 3 + i), "1", 1, days=d), self.t0) for i in range(3) ])
+            # what's indexed, and what was appended since
+            s.add([ (self.video("0", "1", d + 2), self.t0), (self.video(str(d * 3), "1", 2), self.t0) ])
+        assert os.path.exists(s.videos.index_path())
+
+        gs = self.groups("videos", by=[])
+        assert gs[()].count == 30
+        assert gs[()].max == 11 * 3600
+        assert gs[()].total == (11 + 9 * 2 + 20) * 3600
+
+    def test_videos_by_game(self):
+        parser = main_parser()
+        with mock.patch("sys.stderr"), self.assertRaises(SystemExit):
+            check_args(parser, parser.parse_args([ "stats", "-b", "game", "videos" ]))
+        check_args(parser, parser.parse_args([ "stats", "-b", "game", "streams" ]))
@@ -0,0 +1,63 @@
+import random
+import unittest
+
+from prettytable import PrettyTable
+
+from twitch_cli.app import clean
+from twitch_cli.table import Table
+
+def pretty(field_names, rows):
+    t = PrettyTable()
+    t.field_names = field_names
+    t.align = "l"
+    for r in rows:
+        t.add_row(r)
+    return t.get_string()
+
+def ours(field_names, rows):
+    t = Table(field_names)
+    for r in rows:
+        t.add_row(r)
+    return t.get_string()
+
+class TableTests(unittest.TestCase):
+    fields = [ "When", "User", "Title", "Duration", "URL" ]
+
+    def check(self, rows, fields=None):
+        fields = fields or self.fields
+        assert ours(fields, rows) == pretty(fields, [ list(r) for r in rows ])
+
+    def test_empty(self):
+        self.check([])
+
+    def test_plain(self):
+        self.check([
+            [ "1d2h", "foo", "a title", "3h", "https://twitch.tv/videos/1" ],
+            [ "", "a much longer user name", "", "", "https://twitch.tv/videos/2" ],
+        ])
+
+    def test_wide_and_control(self):
+        self.check([
+            [ "1h", "日本語の名前", "Pokémon\tspeedrun", 3, "x" ],
+            [ "", "é", "a\rb\x0bc", None, "\x1b[31mred\x1b[0m" ],
+        ])
+
+    def test_multiline(self):
+        self.check([
+            [ "1h", "foo", "first\nsecond\nthird", "", "x" ],
+            [ "2h", "bar\nbaz", "", "", "y" ],
+        ])
+
+    def test_random(self):
+        rng = random.Random(0)
+        alphabet = "abc XYZ 123 -_!\t\n日本éß́\x0c"
+        for _ in range(50):
+            rows = [
+                [ "".join(rng.choices(alphabet, k=rng.randint(0, 20))) for _ in self.fields ]
+                for _ in range(rng.randint(0, 5))
+            ]
+            self.check(rows)
+
+    def test_clean(self):
+        assert clean("  café \x00speedrun\n ") == "caf speedrun"
+        assert clean("https://www.twitch.tv/foo") == "https://twitch.tv/foo"
@@ -0,0 +1,41 @@
+import json
+import os
+import tempfile
+import threading
+import unittest
+
+from twitch_cli import tracing
+
+class TracingTests(unittest.TestCase):
+    def tearDown(self):
+        tracing.tracer = None
+
+    def test_disabled(self):
+        with tracing.span("foo", "bar") as args:
+            args["ignored"] = 1
+        assert tracing.tracer is None
+
+    def test_spans(self):
+        t = tracing.tracer = tracing.Tracer()
+
+        @tracing.traced("test")
+        def f():
+            with tracing.span("inner", "test", n=1) as args:
+                args["m"] = 2
+
+        f()
+        th = threading.Thread(target=f, name="worker")
+        th.start()
+        th.join()
+
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "trace.json")
+            t.dump(path)
+            with open(path) as h:
+                es = json.load(h)["traceEvents"]
+
+        xs = [ e for e in es if e["ph"] == "X" ]
+        assert [ e["name"] for e in xs ] == [ "inner", "TracingTests.test_spans.<locals>.f" ] * 2
+        assert xs[0]["args"] == { "n": 1, "m": 2 }
+        assert xs[0]["ts"] >= xs[1]["ts"] and xs[0]["dur"] <= xs[1]["dur"]
+        assert "worker" in { e["args"]["name"] for e in es if e["ph"] == "M" }
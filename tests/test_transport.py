@@ -0,0 +1,50 @@
+import concurrent.futures
+import json
+import threading
+import unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from twitch_cli.helix import Helix
+from twitch_cli.transport import MemoryTransport, RequestsTransport
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self):
+        b = json.dumps({ "data": [ self.path ] }).encode("UTF-8")
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(b)))
+        self.end_headers()
+        self.wfile.write(b)
+
+    def log_message(self, *args):
+        pass
+
+class TransportTests(unittest.TestCase):
+    def test_memory(self):
+        def handler(preq):
+            if "after" in preq.url:
+                return { "data": [ 2 ] }
+            return { "data": [ 1 ], "pagination": { "cursor": "c" } }
+        t = MemoryTransport(handler)
+        h = Helix(token="token", transport=t)
+        assert list(h.paginate("/foo", params={})) == [ 1, 2 ]
+        assert [ r.path_url for r in t.requests ] == [ "/helix/foo", "/helix/foo?after=c" ]
+
+    def test_pool_reuse(self):
+        srv = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        threading.Thread(target=srv.serve_forever, daemon=True).start()
+        try:
+            t = RequestsTransport(pool_size=4)
+            url = f"http://127.0.0.1:{srv.server_port}/"
+            def get(i):
+                preq = t.session.prepare_request(requests.Request("GET", url + str(i)))
+                return t.send(preq, timeout=5).json()["data"]
+            with concurrent.futures.ThreadPoolExecutor(4) as ex:
+                assert list(ex.map(get, range(100))) == [ [ f"/{i}" ] for i in range(100) ]
+            assert t.stats() == { "requests": 100, "connections": 4 }
+        finally:
+            srv.shutdown()
+            srv.server_close()
@@ -0,0 +1,66 @@
+import os
+from datetime import datetime, timedelta, UTC
+from unittest import mock
+
+from twitch_cli import app
+from twitch_cli.app import EXPIRED, App
+from twitch_cli.cli import main_parser
+from twitch_cli.lastknown import LastKnown
+from twitch_cli.transport import MemoryTransport
+from twitch_cli.model import User, Video
+from twitch_cli.watchlater import Gone, Revalidator, next_check
+
+from .helpers import AppTestCase
+
+class WatchLaterTests(AppTestCase):
+    def setUp(self):
+        super().setUp()
+        self.t0 = datetime(2025, 1, 1, tzinfo=UTC)
+
+    def handler(self, path, qs):
+        match path:
+            # none of the videos asked for exist
+            case "/videos":
+                return MemoryTransport.response(404, { "error": "Not Found" })
+            case _:
+                raise AssertionError(path)
+
+    def video(self, id):
+        return Video(id=id, title="", user=User(id="1"), url="", duration=timedelta(hours=1),
+                     created_at=self.t0, published_at=self.t0)
+
+    def test_next_check(self):
+        v = self.video("1")
+        h, d = timedelta(hours=1), timedelta(days=1)
+        assert next_check(v, self.t0 + h) == self.t0 + 2 * h
+        assert next_check(v, self.t0 + 3 * d) == self.t0 + 7 * d
+        assert next_check(v, self.t0 + 8 * d) == self.t0 + 14 * d
+        assert next_check(v, self.t0 + 20 * d) == self.t0 + 27 * d
+        assert next_check(v, self.t0 + 58 * d) == self.t0 + 60 * d
+        assert next_check(v, self.t0 + 61 * d) == self.t0 + 68 * d
+
+    def test_revalidator(self):
+        known = LastKnown("videos", path=os.path.join(self.tmp.name, "videos.pickle"))
+        gone = LastKnown("gone", path=os.path.join(self.tmp.name, "gone.pickle"))
+        rv = Revalidator(known, gone)
+
+        now = self.t0 + timedelta(days=3)
+        assert rv.due([ "1", "2", "1" ], now) == [ "1", "2" ]
+
+        known.put("1", self.video("1"), at=now)
+        rv.checked([ "1", "2" ], { "1": self.video("1") })
+        assert rv.due([ "1", "2" ], now + timedelta(days=1)) == []
+        assert rv.due([ "1", "2" ], now + timedelta(days=4)) == [ "1" ]
+        assert rv.lookup([ "1", "2", "3" ]) == { "1": self.video("1"), "2": Gone(id="2") }
+
+    def test_expired(self):
+        path = os.path.join(self.tmp.name, "later.txt")
+        with open(path, "w") as f:
+            f.write("https://www.twitch.tv/videos/123\n")
+        args = main_parser().parse_args([ "videos-file", "--no-server", "-i", path ])
+        with mock.patch.object(App, "from_args", lambda args: self.app), mock.patch.object(app, "notify"):
+            app.do_videos_file(args)
+
+        with open(path) as f:
+            assert EXPIRED in f.read()
+        assert Revalidator().gone.get("123") is not None